@@ -0,0 +1,249 @@
+"""
+Job store for long-running API work (batch executions, async /api/execute runs).
+Jobs run in the background; clients poll the job or stream its progress events.
+
+Jobs run on a bounded pool (JOB_MAX_WORKERS) with a bounded queue (JOB_MAX_QUEUE): when the
+queue is full, enqueue() raises QueueFull instead of accepting work it cannot start soon. Each job records
+its queue wait and execution time separately. When the shared state spans processes, every job snapshot
+is mirrored there so any worker can answer status and stream requests.
+"""
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from utils.config import JOB_RESULT_TTL_SECONDS, JOB_MAX_WORKERS, JOB_MAX_QUEUE
+from utils.instrumentation import add_gauge, inc, observe
+from utils.shared_state import get_shared_state
+
+TERMINAL_STATUSES = ("done", "error")
+SHARED_POLL_SECONDS = 0.5  # how often a worker that does not run a job re-reads it from the shared state
+
+_jobs = {}
+_cond = threading.Condition()
+_pool = {"queued": 0, "running": 0, "mean_execution_s": None}
+_executor = ThreadPoolExecutor(max_workers=JOB_MAX_WORKERS, thread_name_prefix="job")
+
+
+class QueueFull(RuntimeError):
+    """The job queue is at JOB_MAX_QUEUE; retry_after is a hint in seconds."""
+
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Job queue is full ({depth} waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+def _purge_expired():
+    now = time.time()
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job["status"] in TERMINAL_STATUSES and now - (job["finished_at"] or now) > JOB_RESULT_TTL_SECONDS
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def _with_timings(job: dict) -> dict:
+    """Add queue_wait_ms (created -> started) and execution_ms (started -> finished), so far for unfinished jobs."""
+    now = time.time()
+    started, finished = job.get("started_at"), job.get("finished_at")
+    job["queue_wait_ms"] = round(((started or finished or now) - job["created_at"]) * 1000, 1)
+    job["execution_ms"] = round(((finished or now) - started) * 1000, 1) if started else None
+    return job
+
+
+def _shared():
+    state = get_shared_state()
+    return state if state.shared else None
+
+
+def _publish(job_id: str):
+    """Mirror a job (with its events) into the shared state for the other workers."""
+    state = _shared()
+    if state is None:
+        return
+    with _cond:
+        job = _jobs.get(job_id)
+        if not job:
+            return
+        snapshot = {**job, "events": list(job["events"])}
+    if snapshot.get("error") is not None:
+        snapshot["error"] = str(snapshot["error"])
+    try:
+        state.set_json("job:" + job_id, snapshot, ttl=JOB_RESULT_TTL_SECONDS)
+    except Exception:
+        pass  # this worker still serves the job; others report it as unknown
+
+
+def _shared_job(job_id: str) -> Optional[dict]:
+    state = _shared()
+    if state is None:
+        return None
+    try:
+        return state.get_json("job:" + job_id)
+    except Exception:
+        return None
+
+
+def create_job(kind: str, total: int) -> str:
+    """Register a new queued job and return its ID."""
+    job_id = uuid.uuid4().hex
+    with _cond:
+        _purge_expired()
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "total": total,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {},
+            "events": [],
+            "results": None,
+            "error": None,
+        }
+    _publish(job_id)
+    return job_id
+
+
+def add_progress(job_id: str, stage: str, completed: int, total: int, **detail):
+    """Record a progress event (plus optional detail fields) and wake up streaming clients."""
+    with _cond:
+        job = _jobs.get(job_id)
+        if not job:
+            return
+        event = {"seq": len(job["events"]) + 1, "stage": stage, "completed": completed, "total": total, **detail}
+        job["progress"] = event
+        job["events"].append(event)
+        _cond.notify_all()
+    _publish(job_id)
+
+
+def _finish(job_id: str, **fields):
+    with _cond:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields, finished_at=time.time())
+        _cond.notify_all()
+    _publish(job_id)
+
+
+def get_job(job_id: str, include_events: bool = False) -> Optional[dict]:
+    """Snapshot of a job (without the full event list unless requested), or None if unknown/expired."""
+    with _cond:
+        _purge_expired()
+        job = _jobs.get(job_id)
+        if job:
+            snapshot = {k: v for k, v in job.items() if k != "events"}
+            if include_events:
+                snapshot["events"] = list(job["events"])
+            return _with_timings(snapshot)
+    job = _shared_job(job_id)  # running on another worker
+    if not job:
+        return None
+    if not include_events:
+        job.pop("events", None)
+    return _with_timings(job)
+
+
+def wait_for_events(job_id: str, after_seq: int, timeout: float = 15.0):
+    """
+    Block until the job has events newer than after_seq or reaches a terminal status.
+    Returns (new_events, status) or (None, None) if the job is unknown.
+    """
+    deadline = time.time() + timeout
+    with _cond:
+        while job_id in _jobs:
+            job = _jobs[job_id]
+            new_events = job["events"][after_seq:]
+            if new_events or job["status"] in TERMINAL_STATUSES:
+                return list(new_events), job["status"]
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return [], job["status"]
+            _cond.wait(remaining)
+    # Not run by this worker: poll the shared copy
+    while True:
+        job = _shared_job(job_id)
+        if not job:
+            return None, None
+        new_events = job["events"][after_seq:]
+        if new_events or job["status"] in TERMINAL_STATUSES or time.time() >= deadline:
+            return new_events, job["status"]
+        time.sleep(min(SHARED_POLL_SECONDS, max(0.0, deadline - time.time())))
+
+
+def _run(job_id: str, fn: Callable[[Callable], object]):
+    with _cond:
+        job = _jobs[job_id]
+        job.update(status="running", started_at=time.time())
+        kind = job["kind"]
+        observe("job_queue_wait_ms", (job["started_at"] - job["created_at"]) * 1000, kind=kind)
+    _publish(job_id)
+    start = time.perf_counter()
+    try:
+        results = fn(lambda stage, completed, total, **detail: add_progress(job_id, stage, completed, total, **detail))
+        _finish(job_id, status="done", results=results)
+        inc("jobs_total", kind=kind, status="done")
+    except Exception as e:
+        _finish(job_id, status="error", error=e)
+        inc("jobs_total", kind=kind, status="error")
+    observe("job_execution_ms", (time.perf_counter() - start) * 1000, kind=kind)
+    return time.perf_counter() - start
+
+
+def _retry_after(depth: int) -> int:
+    mean = _pool["mean_execution_s"] or 10.0
+    return max(1, min(300, math.ceil(mean * (depth + 1) / JOB_MAX_WORKERS)))
+
+
+def enqueue(kind: str, fn: Callable[[Callable], object], total: int = 1) -> dict:
+    """
+    Queue fn(progress) on the bounded job pool and store its return value as the job results.
+    progress has the signature progress(stage, completed, total, **detail).
+    Returns {"job_id", "queue_position"} (0 = starts immediately); raises QueueFull when JOB_MAX_QUEUE jobs are waiting.
+    """
+    with _cond:
+        waiting = max(0, _pool["queued"] + _pool["running"] - JOB_MAX_WORKERS)
+        if waiting >= JOB_MAX_QUEUE:
+            inc("jobs_rejected_total", kind=kind)
+            raise QueueFull(waiting, _retry_after(waiting))
+        _pool["queued"] += 1
+    add_gauge("jobs_queued", 1, kind=kind)
+    job_id = create_job(kind, total)
+
+    def pooled():
+        with _cond:
+            _pool["queued"] -= 1
+            _pool["running"] += 1
+        add_gauge("jobs_queued", -1, kind=kind)
+        add_gauge("jobs_running", 1, kind=kind)
+        try:
+            elapsed = _run(job_id, fn)
+            with _cond:
+                mean = _pool["mean_execution_s"]
+                _pool["mean_execution_s"] = elapsed if mean is None else 0.8 * mean + 0.2 * elapsed
+        finally:
+            with _cond:
+                _pool["running"] -= 1
+            add_gauge("jobs_running", -1, kind=kind)
+
+    _executor.submit(pooled)
+    return {"job_id": job_id, "queue_position": waiting}
+
+
+def pool_stats() -> dict:
+    """Current load of the async job pool on this worker."""
+    with _cond:
+        return {
+            "workers": JOB_MAX_WORKERS,
+            "running": _pool["running"],
+            "queued": _pool["queued"],
+            "waiting": max(0, _pool["queued"] + _pool["running"] - JOB_MAX_WORKERS),
+            "max_queue": JOB_MAX_QUEUE,
+            "mean_execution_s": round(_pool["mean_execution_s"], 2) if _pool["mean_execution_s"] is not None else None,
+        }
@@ -1,16 +1,25 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse
+from api import startup  # first: its import time is the start of the startup report
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-import uvicorn
+from typing import List, Optional, Dict, Any, Annotated
 import os
 import json
 import re
+import time
 import logging
+import threading
+from contextlib import asynccontextmanager
 
-from orchestration.supervisor import Supervisor
+from api import jobs, readiness
+from api.rate_limits import limiter_storage_uri
+from orchestration import response_cache
+from utils import data_version
+from utils.config import BATCH_MAX_PROFILES, BATCH_BUDGET_SECONDS, REQUEST_BUDGET_SECONDS, RATE_LIMIT_ENABLED
+from utils.resilience import deadline_scope
+from utils.instrumentation import span, metrics_snapshot, render_prometheus, inc, observe, add_gauge
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -18,10 +27,43 @@ from slowapi.errors import RateLimitExceeded
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-limiter = Limiter(key_func=get_remote_address)
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    readiness.start()
+    startup.start(first_steps={"supervisor": get_agent})
+    yield
+    readiness.stop()
+
+# Counters live in the shared state when it spans worker processes; if it is unreachable, requests are let through
+limiter = Limiter(key_func=get_remote_address, enabled=RATE_LIMIT_ENABLED, storage_uri=limiter_storage_uri(), swallow_errors=True)
+app = FastAPI(lifespan=lifespan)
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+def _route_template(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def _count_rate_limited(request: Request, exc: RateLimitExceeded):
+    inc("rate_limit_rejections_total", endpoint=_route_template(request))
+    return _rate_limit_exceeded_handler(request, exc)
+
+app.add_exception_handler(RateLimitExceeded, _count_rate_limited)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-endpoint request counts, latency histograms and in-flight gauge for /api/metrics."""
+    add_gauge("http_requests_in_flight", 1)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        add_gauge("http_requests_in_flight", -1)
+        endpoint = _route_template(request)
+        observe("http_request_duration_ms", (time.perf_counter() - start) * 1000, endpoint=endpoint)
+        inc("http_requests_total", method=request.method, endpoint=endpoint, status=status)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,18 +73,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-agent = Supervisor()
+_agent = None
+_agent_lock = threading.Lock()
+
+def get_agent():
+    """The shared Supervisor, built on first use (LangGraph and the specialists are imported here, not at startup)."""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                from orchestration.supervisor import Supervisor
+                _agent = Supervisor()
+    return _agent
 
 # --- STRICT SCHEMA DEFINITIONS ---
 PROMPT_MAX_LENGTH = 15000
 
 class ExecuteRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=PROMPT_MAX_LENGTH)
+    top_k: int = Field(5, ge=1, le=10)
+
+class BatchExecuteRequest(BaseModel):
+    prompts: List[Annotated[str, Field(min_length=1, max_length=PROMPT_MAX_LENGTH)]] = Field(..., min_length=1, max_length=BATCH_MAX_PROFILES)
+    top_k: int = Field(5, ge=1, le=10)
 
 class StepLog(BaseModel):
     module: str
     prompt: Dict[str, Any]
     response: Dict[str, Any]
+    duration_ms: Optional[float] = None
+    tokens: Optional[Dict[str, int]] = None
+    retries: Optional[int] = None
+    cache: Optional[Dict[str, int]] = None
+    degraded: Optional[List[str]] = None
 
 class ExecuteResponse(BaseModel):
     status: str
@@ -65,8 +128,9 @@ def health_check():
     ok = True
     issues = []
     try:
-        from utils.config import supabase
-        if not supabase:
+        # Configuration only: creating the client is left to warmup so this answers instantly at boot
+        from utils.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+        if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
             ok = False
             issues.append("Supabase not configured")
     except Exception as e:
@@ -82,6 +146,18 @@ def health_check():
         issues.append(f"Pinecone: {_sanitize_error(e)}")
     return {"status": "ok" if ok else "degraded", "issues": issues}
 
+@app.get("/api/ready")
+def readiness_check():
+    """Readiness from cached background probes (Supabase, Pinecone, LLMOD, shared state). 503 while starting or degraded."""
+    state = readiness.readiness()
+    for check in state["checks"].values():
+        if check.get("error"):
+            check["error"] = _sanitize_error(check["error"])
+    state["warm"] = startup.is_warm()
+    if not state["warm"] and state["status"] != "not_ready":
+        state.update(ready=False, status="starting")
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
 # --- THE 4 REQUIRED ENDPOINTS ---
 
 @app.get("/api/team_info")
@@ -125,36 +201,68 @@ def get_architecture():
             return FileResponse(file_path, media_type="image/png")
     raise HTTPException(status_code=404, detail="Image not found")
 
-@app.post("/api/execute", response_model=ExecuteResponse)
-@limiter.limit("30/minute")
-def execute_agent(request: Request, execute_request: ExecuteRequest):
-    req = execute_request  # avoid shadowing Request
+EXECUTE_STAGES = 3  # filter, rank, analyze
+
+class InvalidPrompt(ValueError):
+    """Unusable input; the message is returned to the client as-is."""
+
+def _check_prompt(prompt: str) -> str:
+    prompt = prompt.strip()
+    if not prompt:
+        raise InvalidPrompt("Prompt cannot be empty")
     try:
-        prompt = req.prompt.strip()
-        if not prompt:
-            return ExecuteResponse(status="error", error="Prompt cannot be empty", response=None, steps=[])
+        parsed = json.loads(prompt)
+    except json.JSONDecodeError:
+        parsed = {}
+    if not isinstance(parsed, dict):
+        raise InvalidPrompt("Prompt must be a JSON object")
+    return prompt
 
-        try:
-            parsed = json.loads(prompt)
-        except json.JSONDecodeError:
-            parsed = {}
+def _run_prompt(prompt: str, top_k: int = 5, progress=None) -> dict:
+    """
+    Profile extraction + one Supervisor run under the request budget, or the cached response for the same
+    profile and top_k. Returns the ExecuteResponse fields plus "cached" and the "data_version" it is based on.
+    """
+    with span("api.execute"), deadline_scope(REQUEST_BUDGET_SECONDS):
+        user_profile = response_cache.get_profile(prompt)
+        if user_profile is None:
+            # Use profile extractor for free-text or minimal input (enables natural language)
+            from orchestration.profile_extractor import extract_profile_from_text
+            user_profile = extract_profile_from_text(prompt)
+            if not user_profile:
+                raise InvalidPrompt("Could not extract profile from input")
+            response_cache.put_profile(prompt, user_profile)
+        if progress:
+            progress("profile", 0, EXECUTE_STAGES)
 
-        if not isinstance(parsed, dict):
-            return ExecuteResponse(status="error", error="Prompt must be a JSON object", response=None, steps=[])
+        # One read for lookup and store: a run that overlaps a re-ingest is stored under the old version
+        version = data_version.current_version()
+        cached = response_cache.get_response(user_profile, top_k, version)
+        if cached is not None:
+            if progress:
+                progress("cached", EXECUTE_STAGES, EXECUTE_STAGES)
+            return {"status": "ok", "error": None, "response": cached["response"], "steps": cached["steps"], "cached": True, "data_version": version}
 
-        # Use profile extractor for free-text or minimal input (enables natural language)
-        from orchestration.profile_extractor import extract_profile_from_text
-        user_profile = extract_profile_from_text(prompt)
-        if not user_profile:
-            return ExecuteResponse(status="error", error="Could not extract profile from input", response=None, steps=[])
+        result = get_agent().run(prompt, user_profile_dict=user_profile, progress=progress, top_k=top_k)
+    analysis, steps = result.get("analysis", ""), result.get("steps", [])
+    if result.get("user_profile") == user_profile and result.get("top_k") == top_k:
+        response_cache.put_response(user_profile, top_k, analysis, steps, version)
+    return {"status": "ok", "error": None, "response": analysis, "steps": steps, "cached": False, "data_version": version}
 
-        result = agent.run(prompt, user_profile_dict=user_profile)
-        return ExecuteResponse(
-            status="ok",
-            error=None,
-            response=result.get("analysis", ""),
-            steps=result.get("steps", [])
-        )
+@app.post("/api/execute", response_model=ExecuteResponse)
+@limiter.limit("30/minute")
+def execute_agent(request: Request, execute_request: ExecuteRequest, response: Response):
+    """
+    Run the agent for one prompt. X-Response-Cache tells whether the answer came from the response cache,
+    X-Data-Version which catalog data it is based on.
+    """
+    try:
+        result = _run_prompt(_check_prompt(execute_request.prompt), top_k=execute_request.top_k)
+        response.headers["X-Response-Cache"] = "hit" if result.pop("cached") else "miss"
+        response.headers["X-Data-Version"] = str(result.pop("data_version"))
+        return ExecuteResponse(**result)
+    except InvalidPrompt as e:
+        return ExecuteResponse(status="error", error=str(e), response=None, steps=[])
     except Exception as e:
         logger.exception("Execute failed")
         return ExecuteResponse(
@@ -164,11 +272,158 @@ def execute_agent(request: Request, execute_request: ExecuteRequest):
             steps=[]
         )
 
+# --- ASYNC AND BATCH JOBS ---
+
+@app.post("/api/execute/async", status_code=202)
+@limiter.limit("30/minute")
+def execute_agent_async(request: Request, execute_request: ExecuteRequest):
+    """
+    Queue one agent run and return its job ID at once; the result (ExecuteResponse fields) is kept for
+    JOB_RESULT_TTL_SECONDS. Poll /api/jobs/{job_id} or stream /api/jobs/{job_id}/stream for per-stage progress.
+    503 with Retry-After when the job queue is full.
+    """
+    try:
+        prompt = _check_prompt(execute_request.prompt)
+    except InvalidPrompt as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        queued = jobs.enqueue("execute", lambda progress: _run_prompt(prompt, execute_request.top_k, progress), total=EXECUTE_STAGES)
+    except jobs.QueueFull as e:
+        return JSONResponse(
+            status_code=503, headers={"Retry-After": str(e.retry_after)},
+            content={"detail": str(e), "retry_after": e.retry_after},
+        )
+    job_id = queued["job_id"]
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "queue_position": queued["queue_position"],
+        "status_url": f"/api/jobs/{job_id}",
+        "stream_url": f"/api/jobs/{job_id}/stream",
+    }
+
+@app.get("/api/jobs")
+def get_job_pool():
+    """Load of this worker's async job pool (running, waiting, capacity, mean execution time)."""
+    return jobs.pool_stats()
+
+def _public_job(job: dict) -> dict:
+    """Job snapshot safe to return to clients (sanitized errors)."""
+    out = dict(job)
+    if out.get("error") is not None:
+        out["error"] = _sanitize_error(out["error"])
+    if isinstance(out.get("results"), list):  # batch: one result per profile
+        out["results"] = [
+            {**r, "error": _sanitize_error(r["error"]) if r.get("error") else None}
+            for r in out["results"]
+        ]
+    return out
+
+@app.post("/api/execute/batch", status_code=202)
+@limiter.limit("5/minute")
+def execute_batch(request: Request, batch_request: BatchExecuteRequest):
+    """
+    Run the agent for many profiles as one job on the async job pool, within BATCH_BUDGET_SECONDS.
+    Poll /api/jobs/{job_id} or stream /api/jobs/{job_id}/stream. 503 with Retry-After when the job queue is full.
+    """
+    from orchestration.batch import run_batch
+    prompts = list(batch_request.prompts)
+
+    def run(progress):
+        with deadline_scope(BATCH_BUDGET_SECONDS):
+            return run_batch(prompts, top_k=batch_request.top_k, progress=progress)
+    try:
+        queued = jobs.enqueue("batch", run, total=len(prompts))
+    except jobs.QueueFull as e:
+        return JSONResponse(
+            status_code=503, headers={"Retry-After": str(e.retry_after)},
+            content={"detail": str(e), "retry_after": e.retry_after},
+        )
+    return {"job_id": queued["job_id"], "status": "queued", "queue_position": queued["queue_position"], "total": len(prompts)}
+
+@app.get("/api/jobs/{job_id}")
+def get_job_status(job_id: str):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return _public_job(job)
+
+@app.get("/api/jobs/{job_id}/stream")
+def stream_job(job_id: str):
+    """Server-sent events: one 'progress' event per update, then a final 'result' event."""
+    if jobs.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    def event_stream():
+        seen = 0
+        while True:
+            events, status = jobs.wait_for_events(job_id, seen)
+            if events is None:
+                return
+            for event in events:
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+            seen += len(events)
+            if status in jobs.TERMINAL_STATUSES:
+                job = jobs.get_job(job_id)
+                if job:
+                    yield f"event: result\ndata: {json.dumps(_public_job(job), default=str)}\n\n"
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text format: HTTP, pipeline node and upstream latencies, error counts, cache hit ratios."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/data-version")
+def get_data_version():
+    """Catalog data version (changes with every ingestion that alters a dataset) and each dataset's digest."""
+    out = data_version.report()
+    if out.get("error"):
+        out["error"] = _sanitize_error(out["error"])
+    return out
+
+@app.get("/api/startup")
+def get_startup_report():
+    """Startup timings (import, serving, warm) in seconds since the app began importing, and warmup step results."""
+    out = startup.report()
+    for step in out["steps"].values():
+        if step.get("error"):
+            step["error"] = _sanitize_error(step["error"])
+    return out
+
+@app.get("/api/stats")
+def get_stats():
+    """Aggregated span latency histograms (ms) and counters since process start."""
+    snapshot = metrics_snapshot()
+    histograms = [
+        {"name": name, "labels": dict(labels), "count": h["count"], "sum_ms": round(h["sum"], 1),
+         "buckets": [{"le": "+Inf" if le == float("inf") else le, "count": c} for le, c in h["buckets"]]}
+        for (name, labels), h in snapshot["histograms"].items()
+    ]
+    counters = [{"name": name, "labels": dict(labels), "value": v} for (name, labels), v in snapshot["counters"].items()]
+    return {"histograms": histograms, "counters": counters}
+
+@app.get("/api/steps/payload/{ref}")
+def get_step_payload(ref: str):
+    """Full text of a step payload referenced by `user_prompt_ref` in the step log."""
+    from orchestration.step_payloads import get_payload
+    payload = get_payload(ref)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Payload not found or expired")
+    return {"ref": ref, "payload": payload}
+
 # Serve minimal UI at / (connects to /api when deployed on same host, e.g. Render)
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "static")
 if os.path.exists(static_dir):
     app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")
 
+startup.mark_imported()
+
 if __name__ == "__main__":
+    import uvicorn
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
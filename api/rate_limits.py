@@ -0,0 +1,57 @@
+"""
+slowapi/limits storage on the shared state, so per-client limits hold across all worker processes.
+Registered with `limits` under the "sharedstate://" scheme (fixed-window strategy, slowapi's default).
+Nothing connects to the backend until the first rate-limited request, so building the Limiter while
+api.main is imported stays cheap (see api/startup.py).
+"""
+import sqlite3
+import time
+
+from limits.storage import Storage
+
+from utils.config import SHARED_STATE_URL
+from utils.shared_state import SharedStateError, get_shared_state, url_is_shared
+
+KEY_PREFIX = "ratelimit:"
+
+
+class SharedStateStorage(Storage):
+    STORAGE_SCHEME = ["sharedstate"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def state(self):
+        return get_shared_state()  # created on first use, not when the Limiter is built
+
+    @property
+    def base_exceptions(self):
+        return (SharedStateError, OSError, sqlite3.Error)
+
+    def incr(self, key, expiry, amount=1):
+        return self.state.incr(KEY_PREFIX + key, amount, ttl=expiry)
+
+    def get(self, key):
+        raw = self.state.get(KEY_PREFIX + key)
+        return int(raw) if raw is not None else 0
+
+    def get_expiry(self, key):
+        return self.state.expires_at(KEY_PREFIX + key) or time.time()
+
+    def check(self):
+        try:
+            return self.state.ping()
+        except Exception:
+            return False
+
+    def reset(self):
+        return None  # counters expire on their own; the backends do not enumerate keys
+
+    def clear(self, key):
+        self.state.delete(KEY_PREFIX + key)
+
+
+def limiter_storage_uri():
+    """Storage URI for the slowapi Limiter: the shared state when it spans processes, else limits' own memory storage."""
+    return "sharedstate://" if url_is_shared(SHARED_STATE_URL) else "memory://"
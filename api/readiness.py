@@ -0,0 +1,146 @@
+"""
+Background readiness probes for upstream dependencies (Supabase, Pinecone, LLMOD, shared state).
+Probes run on an interval and their results are cached, so /api/ready answers instantly
+without adding probe load per request. Every upstream call carries READINESS_PROBE_TIMEOUT_SECONDS, and a
+probe still running from an earlier round is reported as not ready instead of being started again.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+
+from utils.config import READINESS_PROBE_INTERVAL_SECONDS, READINESS_PROBE_TIMEOUT_SECONDS, READINESS_MAX_LATENCY_MS
+from utils.instrumentation import span
+from utils.resilience import deadline_scope
+
+logger = logging.getLogger(__name__)
+
+
+def _probe_supabase():
+    # Plain PostgREST request: the shared supabase-py client has no per-call timeout
+    from utils.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+        raise RuntimeError("Supabase not configured")
+    response = requests.get(
+        f"{SUPABASE_URL.rstrip('/')}/rest/v1/universities_requirements",
+        params={"select": "id", "limit": 1},
+        headers={"apikey": SUPABASE_SERVICE_ROLE_KEY, "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}"},
+        timeout=READINESS_PROBE_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+
+
+def _probe_pinecone():
+    from pinecone_db.pinecone_client import _get_index
+    _get_index().describe_index_stats(timeout=READINESS_PROBE_TIMEOUT_SECONDS)
+
+
+def _probe_llmod():
+    # Embedding of a single token: the cheapest authenticated LLMOD round trip; its HTTP timeout is cut to the probe's
+    from utils.llmod_client import get_embedding
+    with deadline_scope(READINESS_PROBE_TIMEOUT_SECONDS):
+        get_embedding("ping")
+
+
+def _probe_shared_state():
+    from utils.shared_state import get_shared_state
+    if not get_shared_state().ping():
+        raise RuntimeError("Shared state did not answer PING")
+
+
+PROBES = {
+    "supabase": _probe_supabase,
+    "pinecone": _probe_pinecone,
+    "llmod": _probe_llmod,
+    "shared_state": _probe_shared_state,
+}
+
+_results = {}
+_running = {}  # name -> future of the probe's latest run
+_lock = threading.Lock()
+_stop = threading.Event()
+_thread = None
+_executor = ThreadPoolExecutor(max_workers=len(PROBES), thread_name_prefix="probe")
+
+
+def run_probes():
+    """
+    Run all probes concurrently (each bounded by READINESS_PROBE_TIMEOUT_SECONDS) and cache the results.
+    A probe whose previous run has not returned yet is not started again; it is reported as not ready.
+    """
+    def timed(name, probe):
+        with span("probe." + name):
+            start = time.perf_counter()
+            probe()
+            return (time.perf_counter() - start) * 1000
+
+    futures = {}
+    for name, probe in PROBES.items():
+        previous = _running.get(name)
+        if previous is not None and not previous.done():
+            with _lock:
+                _results[name] = {
+                    "ok": False, "latency_ms": None, "error": "previous probe still running", "checked_at": time.time(),
+                }
+            continue
+        futures[name] = _running[name] = _executor.submit(timed, name, probe)
+    for name, future in futures.items():
+        result = {"ok": False, "latency_ms": None, "error": None, "checked_at": time.time()}
+        try:
+            latency_ms = future.result(timeout=READINESS_PROBE_TIMEOUT_SECONDS)
+            result["latency_ms"] = round(latency_ms, 1)
+            result["ok"] = latency_ms <= READINESS_MAX_LATENCY_MS
+            if not result["ok"]:
+                result["error"] = f"slow: {latency_ms:.0f} ms > {READINESS_MAX_LATENCY_MS} ms"
+        except FutureTimeout:
+            result["error"] = f"timeout after {READINESS_PROBE_TIMEOUT_SECONDS}s"
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        with _lock:
+            _results[name] = result
+
+
+def _loop():
+    while not _stop.is_set():
+        try:
+            run_probes()
+        except Exception:
+            logger.exception("Readiness probes failed")
+        _stop.wait(READINESS_PROBE_INTERVAL_SECONDS)
+
+
+def start():
+    """Start the background probe loop (idempotent)."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="readiness-probes", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
+
+
+def readiness() -> dict:
+    """
+    Cached readiness state.
+    Returns:
+        dict: {"ready": bool, "status": "ready"|"starting"|"not_ready", "checks": {name: result}}
+    """
+    with _lock:
+        checks = {name: dict(result) for name, result in _results.items()}
+    stale_after = 3 * READINESS_PROBE_INTERVAL_SECONDS + READINESS_PROBE_TIMEOUT_SECONDS
+    now = time.time()
+    for result in checks.values():
+        result["age_s"] = round(now - result["checked_at"], 1)
+        if result["age_s"] > stale_after:
+            result["ok"] = False
+            result["error"] = result["error"] or "stale probe result"
+    if len(checks) < len(PROBES):
+        return {"ready": False, "status": "starting", "checks": checks}
+    ready = all(result["ok"] for result in checks.values())
+    return {"ready": ready, "status": "ready" if ready else "not_ready", "checks": checks}
@@ -0,0 +1,162 @@
+"""
+Background warmup after the API starts, and a startup-time report.
+The app imports only what it needs to serve /api/health; the Supervisor graph, the upstream clients,
+the lexical index and the fixed sub-query embeddings are built here on a background thread so the
+first /api/execute call does not pay for them.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Start of the app import: api.main imports this module before anything else
+IMPORT_STARTED = time.perf_counter()
+
+_report = {"status": "pending", "import_s": None, "lifespan_s": None, "warm_s": None, "steps": {}}
+_lock = threading.Lock()
+_done = threading.Event()
+_thread = None
+
+
+def _process_age_s():
+    # Seconds since the OS started this process (includes interpreter start-up); None without psutil
+    try:
+        import psutil
+        return round(time.time() - psutil.Process().create_time(), 3)
+    except Exception:
+        return None
+
+
+def _warm_data_version():
+    from utils import data_version
+    return {"version": data_version.current_version()}
+
+
+def _warm_supabase():
+    from orchestration.specialists.filter import load_catalog
+    return {"catalog_rows": len(load_catalog())}
+
+
+def _warm_precomputed_extractions():
+    from orchestration.specialists.analyzer import get_precomputed_logistics, _precomputed
+    get_precomputed_logistics("")
+    return {"rows": len(_precomputed["rows"])}
+
+
+def _warm_pinecone():
+    from pinecone_db.pinecone_client import _get_index
+    _get_index()
+
+
+def _warm_embeddings():
+    from orchestration.specialists.analyzer import RAG_SUB_QUERIES
+    from pinecone_db.pinecone_client import _query_vector
+    for query in RAG_SUB_QUERIES.values():
+        _query_vector(query)
+    return {"queries": len(RAG_SUB_QUERIES)}
+
+
+def _warm_lexical_index():
+    from pinecone_db.lexical_index import get_lexical_index
+    index = get_lexical_index()
+    return {"docs": len(index.docs) if index is not None else 0}
+
+
+def _warm_exchange_rate():
+    from orchestration.cost_model import usd_to_eur_rate
+    rate, source = usd_to_eur_rate()
+    return {"usd_to_eur": rate, "source": source}
+
+
+def _warm_tokenizer():
+    from orchestration.context_packer import count_tokens
+    count_tokens("warmup")
+
+
+# Independent of each other; they run concurrently once the Supervisor (which imports them all) is built
+WARMUP_STEPS = {
+    "data_version": _warm_data_version,
+    "supabase_catalog": _warm_supabase,
+    "precomputed_extractions": _warm_precomputed_extractions,
+    "pinecone_index": _warm_pinecone,
+    "subquery_embeddings": _warm_embeddings,
+    "lexical_index": _warm_lexical_index,
+    "tokenizer": _warm_tokenizer,
+    "exchange_rate": _warm_exchange_rate,
+}
+
+
+def _run_step(name, fn):
+    start = time.perf_counter()
+    result = {"ok": True, "duration_ms": None, "error": None}
+    try:
+        details = fn()
+        if isinstance(details, dict):
+            result.update(details)
+    except Exception as e:
+        result.update(ok=False, error=f"{type(e).__name__}: {e}")
+    result["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    with _lock:
+        _report["steps"][name] = result
+    return result
+
+
+def warmup(first_steps=None, steps=None):
+    """
+    Run the warmup: `first_steps` in order (e.g. building the Supervisor), then `steps` concurrently.
+    A failed step is recorded in the report and never raised; requests then pay for it lazily.
+    """
+    steps = WARMUP_STEPS if steps is None else steps
+    with _lock:
+        _report["status"] = "warming"
+    for name, fn in (first_steps or {}).items():
+        _run_step(name, fn)
+    if steps:
+        with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="warmup") as executor:
+            list(executor.map(lambda item: _run_step(*item), steps.items()))
+    with _lock:
+        _report["status"] = "done"
+        _report["warm_s"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+        failed = [name for name, step in _report["steps"].items() if not step["ok"]]
+    _done.set()
+    logger.info(
+        "Startup: app imported in %.2fs, serving after %.2fs, warm after %.2fs%s",
+        _report["import_s"] or 0.0, _report["lifespan_s"] or 0.0, _report["warm_s"],
+        f" (failed: {', '.join(failed)})" if failed else "",
+    )
+
+
+def mark_imported():
+    """Record how long importing the app took (called at the end of api.main)."""
+    with _lock:
+        _report["import_s"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+
+
+def start(first_steps=None, steps=None):
+    """Record the time to lifespan start and launch the warmup thread (idempotent)."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    with _lock:
+        _report["lifespan_s"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    _done.clear()
+    _thread = threading.Thread(target=warmup, args=(first_steps, steps), name="warmup", daemon=True)
+    _thread.start()
+
+
+def is_warm() -> bool:
+    return _done.is_set()
+
+
+def report() -> dict:
+    """
+    Startup timings (seconds since api.main began importing) and per-step warmup results.
+    Returns:
+        dict: {"status": "pending"|"warming"|"done", "import_s", "lifespan_s", "warm_s", "process_age_s", "steps"}
+    """
+    with _lock:
+        out = {**_report, "steps": {name: dict(step) for name, step in _report["steps"].items()}}
+    out["process_age_s"] = _process_age_s()
+    return out
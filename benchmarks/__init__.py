@@ -0,0 +1 @@
+"""Offline benchmarks: replayed upstream services (replay.py) and the benchmark runner (run.py)."""
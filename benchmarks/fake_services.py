@@ -0,0 +1,408 @@
+"""
+Local stand-in servers for the hosted services, for end-to-end load testing on a laptop.
+
+- LLMOD:     OpenAI-compatible POST /chat/completions and /embeddings (deterministic, from the synthetic fixtures)
+- Pinecone:  data-plane POST /query, /vectors/upsert, /describe_index_stats
+- Supabase:  PostgREST GET/POST /rest/v1/<table> (select, eq/neq/lt/lte/gt/gte/in filters, limit, upsert)
+- Wikipedia: GET /page/summary/<title> (the same server answers the exchange rate API, GET /v4/latest/USD)
+- Redis:     RESP server for the shared state (GET/SET/DEL/INCRBY/PEXPIRE/PTTL/...), in memory
+
+Responses come from benchmarks/fixtures/synthetic.json (hand-written, see replay.py); latency profiles and
+error injection are configurable. The "realistic" profile is replay.DEFAULT_LATENCIES, which are synthetic too.
+
+Usage:
+    python -m benchmarks.fake_services --profile realistic
+then start the API with the environment it prints (LLMOD_BASE_URL, PINECONE_HOST, SUPABASE_URL, ...).
+"""
+import argparse
+import csv
+import json
+import random
+import socketserver
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.replay import (
+    DEFAULT_LATENCIES, FakeIndex, FakeSupabase, Latency, chat_response, load_fixtures, query_rows,
+)
+from orchestration.router import embed_text
+from utils.shared_state import MemoryBackend
+
+LATENCY_PROFILES = {
+    "zero": {name: 0.0 for name in DEFAULT_LATENCIES},
+    "fast": {name: seconds / 10 for name, seconds in DEFAULT_LATENCIES.items()},
+    "realistic": dict(DEFAULT_LATENCIES),
+    "slow": {name: seconds * 3 for name, seconds in DEFAULT_LATENCIES.items()},
+}
+
+DEFAULT_PORTS = {"llmod": 8101, "pinecone": 8102, "supabase": 8103, "wikipedia": 8104, "redis": 8105}
+
+# JWT-shaped placeholder: supabase-py validates the key format but the fake server ignores it
+FAKE_SUPABASE_KEY = "eyJhbGciOiJub25lIn0.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.fake"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw) if raw else None
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _llmod_handler(fixtures, latency, error_rate, rng):
+    usage = fixtures.get("usage") or {}
+
+    class Handler(_Handler):
+        def do_POST(self):
+            body = self._body() or {}
+            if error_rate and rng.random() < error_rate:
+                latency.sleep("llm_chat")
+                return self._send(503, {"error": {"message": "injected upstream error"}}, {"Retry-After": "1"})
+            if self.path.rstrip("/").endswith("/embeddings"):
+                latency.sleep("embedding")
+                inputs = body.get("input")
+                inputs = inputs if isinstance(inputs, list) else [inputs]
+                return self._send(200, {
+                    "object": "list",
+                    "model": body.get("model"),
+                    "data": [{"object": "embedding", "index": i, "embedding": embed_text(str(text))} for i, text in enumerate(inputs)],
+                    "usage": {"prompt_tokens": sum(len(str(t)) // 4 for t in inputs), "total_tokens": sum(len(str(t)) // 4 for t in inputs)},
+                })
+            if self.path.rstrip("/").endswith("/chat/completions"):
+                latency.sleep("llm_chat")
+                messages = body.get("messages") or []
+                system_prompt = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+                user_prompt = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+                return self._send(200, {
+                    "id": f"chatcmpl-fake-{int(time.time() * 1000)}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": chat_response(fixtures, system_prompt, user_prompt)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                })
+            self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    return Handler
+
+
+def _pinecone_handler(index):
+    class Handler(_Handler):
+        def do_POST(self):
+            body = self._body() or {}
+            path = self.path.split("?")[0].rstrip("/")
+            if path == "/query":
+                result = index.query(
+                    vector=body.get("vector") or [], top_k=body.get("topK", 10), filter=body.get("filter"),
+                    include_metadata=body.get("includeMetadata", False),
+                )
+                return self._send(200, {"matches": result["matches"], "namespace": body.get("namespace", ""), "usage": {"readUnits": 5}})
+            if path == "/vectors/upsert":
+                result = index.upsert(vectors=body.get("vectors") or [])
+                return self._send(200, {"upsertedCount": result["upserted_count"]})
+            if path == "/vectors/delete":
+                index.delete(ids=body.get("ids") or [])
+                return self._send(200, {})
+            if path == "/describe_index_stats":
+                stats = index.describe_index_stats()
+                return self._send(200, {
+                    "dimension": stats["dimension"], "indexFullness": 0.0, "totalVectorCount": stats["total_vector_count"],
+                    "namespaces": {"": {"vectorCount": stats["total_vector_count"]}},
+                })
+            self._send(404, {"message": f"unknown path {self.path}"})
+
+        do_GET = do_POST
+
+    return Handler
+
+
+def _parse_postgrest_value(raw):
+    if raw == "true":
+        return True
+    if raw == "false":
+        return False
+    if raw == "null":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            pass
+    return raw
+
+
+def parse_postgrest_query(query_string):
+    """(columns, filters, limit, on_conflict) from a PostgREST query string."""
+    columns, limit, on_conflict = "*", None, None
+    filters = []
+    for key, raw in urllib.parse.parse_qsl(query_string, keep_blank_values=True):
+        if key == "select":
+            columns = raw
+        elif key == "limit":
+            limit = int(raw)
+        elif key == "on_conflict":
+            on_conflict = raw
+        elif key in ("order", "offset"):
+            continue
+        else:
+            op, _, value = raw.partition(".")
+            if op == "in":
+                items = next(csv.reader([value.strip("()")], skipinitialspace=True), [])
+                filters.append(("in", key, [_parse_postgrest_value(item) for item in items]))
+            elif op == "is":
+                filters.append(("eq" if value != "null" else "is_null", key, _parse_postgrest_value(value)))
+            else:
+                filters.append((op, key, _parse_postgrest_value(value)))
+    return columns, filters, limit, on_conflict
+
+
+def _postgrest_handler(db, latency):
+    class Handler(_Handler):
+        def _table(self):
+            path, _, query = self.path.partition("?")
+            prefix = "/rest/v1/"
+            return (path[len(prefix):].strip("/") if path.startswith(prefix) else None), query
+
+        def do_GET(self):
+            table, query = self._table()
+            if not table:
+                return self._send(404, {"message": f"unknown path {self.path}"})
+            columns, filters, limit, _ = parse_postgrest_query(query)
+            latency.sleep("supabase")
+            with db.lock:
+                rows = db.tables.get(table, [])
+                null_columns = [col for op, col, _ in filters if op == "is_null"]
+                rows = [row for row in rows if all(row.get(col) is None for col in null_columns)]
+                result = query_rows(rows, [f for f in filters if f[0] != "is_null"], columns, limit)
+            self._send(200, result)
+
+        def do_POST(self):
+            table, query = self._table()
+            if not table:
+                return self._send(404, {"message": f"unknown path {self.path}"})
+            _, _, _, on_conflict = parse_postgrest_query(query)
+            rows = self._body() or []
+            latency.sleep("supabase")
+            result = db.table(table).upsert(rows, on_conflict=on_conflict).execute()
+            self._send(201, result.data)
+
+        def do_HEAD(self):
+            self._send(200, [])
+
+    return Handler
+
+
+def _wikipedia_handler(fixtures, latency):
+    template = fixtures.get("wikipedia", {}).get("default", "")
+
+    class Handler(_Handler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/v4/latest/USD":  # exchange rate API, served alongside
+                return self._send(200, {"base": "USD", "rates": {"EUR": fixtures.get("usd_to_eur", 0.92)}})
+            prefix = "/page/summary/"
+            if prefix not in path:
+                return self._send(404, {"title": "Not found."})
+            latency.sleep("wikipedia")
+            title = urllib.parse.unquote(path.split(prefix, 1)[1]).replace("_", " ")
+            self._send(200, {"title": title, "extract": template.format(title=title)})
+
+    return Handler
+
+
+def _resp(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        return b"+OK\r\n" if value else b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, Exception):
+        return b"-ERR %s\r\n" % str(value).encode()
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def resp_command(store, args):
+    """Execute one Redis command against a MemoryBackend; returns the reply value."""
+    name = args[0].decode().upper()
+    rest = args[1:]
+    if name == "PING":
+        return "PONG"
+    if name in ("AUTH", "SELECT", "CLIENT"):
+        return True
+    if name == "GET":
+        return store.get(rest[0].decode())
+    if name == "SET":
+        key, value, options = rest[0].decode(), rest[1], [o.decode().upper() for o in rest[2:]]
+        ttl = None
+        if "EX" in options:
+            ttl = float(options[options.index("EX") + 1])
+        elif "PX" in options:
+            ttl = float(options[options.index("PX") + 1]) / 1000
+        if "NX" in options and store.get(key) is not None:
+            return None
+        store.set(key, value, ttl)
+        return True
+    if name == "DEL":
+        existing = [k.decode() for k in rest if store.get(k.decode()) is not None]
+        for key in rest:
+            store.delete(key.decode())
+        return len(existing)
+    if name == "EXISTS":
+        return sum(store.get(k.decode()) is not None for k in rest)
+    if name in ("INCR", "INCRBY"):
+        return store.incr(rest[0].decode(), int(rest[1]) if name == "INCRBY" else 1)
+    if name in ("EXPIRE", "PEXPIRE"):
+        key = rest[0].decode()
+        if store.get(key) is None:
+            return 0
+        store.expire(key, float(rest[1]) / (1000 if name == "PEXPIRE" else 1))
+        return 1
+    if name in ("PTTL", "TTL"):
+        key = rest[0].decode()
+        if store.get(key) is None:
+            return -2
+        expires_at = store.expires_at(key)
+        if expires_at is None:
+            return -1
+        remaining = max(0.0, expires_at - time.time())
+        return int(remaining * 1000) if name == "PTTL" else int(remaining)
+    if name in ("FLUSHDB", "FLUSHALL"):
+        store.clear()
+        return True
+    return ValueError(f"unknown command '{name}'")
+
+
+def _redis_handler(store):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                if not line.startswith(b"*"):
+                    continue  # inline commands are not supported
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                try:
+                    reply = resp_command(store, args)
+                except Exception as e:
+                    reply = e
+                self.wfile.write(_resp(reply))
+
+    return Handler
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_services(host="127.0.0.1", ports=None, profile="realistic", jitter=0.25, seed=0, error_rate=0.0, fixtures=None):
+    """
+    Start the fake services (four HTTP upstreams and the Redis stand-in) on background threads.
+    Returns (servers, env) where env holds the settings that point the app at them.
+    """
+    ports = {**DEFAULT_PORTS, **(ports or {})}
+    fixtures = fixtures or load_fixtures()
+    latency = Latency(LATENCY_PROFILES[profile], jitter=jitter, seed=seed)
+    db = FakeSupabase(fixtures["supabase"], Latency(scale=0.0))  # the PostgREST handler applies the latency
+    index = FakeIndex(fixtures["supabase"].get("factsheets_chunks", []), latency)
+    handlers = {
+        "llmod": _llmod_handler(fixtures, latency, error_rate, random.Random(seed)),
+        "pinecone": _pinecone_handler(index),
+        "supabase": _postgrest_handler(db, latency),
+        "wikipedia": _wikipedia_handler(fixtures, latency),
+    }
+    servers = {}
+    for name, handler in handlers.items():
+        server = ThreadingHTTPServer((host, ports[name]), handler)
+        server.daemon_threads = True
+        servers[name] = server
+    servers["redis"] = _ThreadingTCPServer((host, ports["redis"]), _redis_handler(MemoryBackend(max_keys=1_000_000)))
+    for name, server in servers.items():
+        threading.Thread(target=server.serve_forever, name=f"fake-{name}", daemon=True).start()
+
+    return servers, service_env(host, {name: server.server_address[1] for name, server in servers.items()})
+
+
+def service_env(host, ports):
+    """Environment variables that point the app at fake services listening on host:ports."""
+    def url(name):
+        return f"http://{host}:{ports[name]}"
+
+    return {
+        "LLMOD_BASE_URL": url("llmod"),
+        "LLMOD_API_KEY": "fake",
+        "PINECONE_HOST": url("pinecone"),
+        "PINECONE_API_KEY": "fake",
+        "PINECONE_INDEX_NAME": "fake",
+        "SUPABASE_URL": url("supabase"),
+        "SUPABASE_SERVICE_ROLE_KEY": FAKE_SUPABASE_KEY,
+        "WIKIPEDIA_API_URL": url("wikipedia"),
+        "EXCHANGE_RATE_API_URL": url("wikipedia") + "/v4/latest/USD",
+        "SHARED_STATE_URL": f"redis://{host}:{ports['redis']}/0",
+    }
+
+
+def stop_services(servers):
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run local fake LLMOD / Pinecone / Supabase / Wikipedia services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--llmod-port", type=int, default=8101)
+    parser.add_argument("--pinecone-port", type=int, default=8102)
+    parser.add_argument("--supabase-port", type=int, default=8103)
+    parser.add_argument("--wikipedia-port", type=int, default=8104)
+    parser.add_argument("--redis-port", type=int, default=8105)
+    parser.add_argument("--profile", choices=sorted(LATENCY_PROFILES), default="realistic", help="latency profile")
+    parser.add_argument("--jitter", type=float, default=0.25, help="log-normal sigma of the latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLMOD calls answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    servers, env = start_services(
+        args.host,
+        {"llmod": args.llmod_port, "pinecone": args.pinecone_port, "supabase": args.supabase_port, "wikipedia": args.wikipedia_port,
+         "redis": args.redis_port},
+        profile=args.profile, jitter=args.jitter, seed=args.seed, error_rate=args.error_rate,
+    )
+    print(f"Fake services running (profile={args.profile}). Point the app at them with:")
+    for key, value in env.items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stop_services(servers)
+
+
+if __name__ == "__main__":
+    main()
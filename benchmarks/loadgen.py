@@ -0,0 +1,354 @@
+"""
+Open-loop load generator and capacity report for POST /api/execute.
+
+Requests arrive as a Poisson process at a fixed offered rate, independent of how fast the server
+answers (so a slow server builds a queue instead of slowing the client down). Latency is measured
+from each request's scheduled arrival time, which keeps client-side queueing in the numbers.
+Each deployment shape (uvicorn worker count) is swept over increasing rates; the report gives the
+sustained RPS, latency percentiles and error/timeout rates per rate, plus the capacity (highest rate
+the deployment kept up with) and the rate where throughput saturated.
+
+Usage:
+    # spawn uvicorn with 1, 2 and 4 workers against local fake services
+    python -m benchmarks.loadgen --workers 1,2,4 --fake-services realistic --output capacity.json
+    # drive an existing deployment (it must have RATE_LIMIT_ENABLED=false)
+    python -m benchmarks.loadgen --url https://staging.example.com --rates 0.5,1,2 --duration 60
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from benchmarks.run import NL_PROMPTS, PROFILES, _git_commit, summarize
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+AUTO_START_RATE = 0.25  # req/s; the automatic sweep doubles from here until the deployment saturates
+
+# A run "keeps up" when it completes at least this share of the offered rate within the error budget
+MIN_EFFICIENCY = 0.9
+MAX_ERROR_RATE = 0.01
+
+OUTCOMES = ("ok", "error", "timeout", "rate_limited")
+
+
+def prompt_mix(n, json_share=0.6, seed=0):
+    """n prompts: JSON profiles (share json_share) and natural-language requests, as in /api/agent_info."""
+    rng = random.Random(seed)
+    json_prompts = [json.dumps(profile) for profile in PROFILES]
+    return [rng.choice(json_prompts) if rng.random() < json_share else rng.choice(NL_PROMPTS) for _ in range(n)]
+
+
+def poisson_arrivals(rate, duration, seed=0):
+    """Arrival offsets (seconds from start) of a Poisson process with `rate` req/s over `duration` seconds."""
+    rng = random.Random(seed)
+    offsets = []
+    t = rng.expovariate(rate)
+    while t < duration:
+        offsets.append(t)
+        t += rng.expovariate(rate)
+    return offsets
+
+
+def run_open_loop(send, prompts, arrivals, timeout):
+    """
+    Fire send(prompt, timeout) at each arrival offset without waiting for earlier requests.
+    send returns one of OUTCOMES. Returns (latencies_ms of ok requests, outcome counts, wall seconds).
+    """
+    latencies = []
+    counts = {outcome: 0 for outcome in OUTCOMES}
+    lock = threading.Lock()
+
+    def one(prompt, scheduled):
+        try:
+            outcome = send(prompt, timeout)
+        except Exception:
+            outcome = "error"
+        elapsed = (time.perf_counter() - scheduled) * 1000
+        with lock:
+            counts[outcome if outcome in counts else "error"] += 1
+            if outcome == "ok":
+                latencies.append(elapsed)
+
+    # Enough threads that the client never becomes the bottleneck: everything that can be in flight
+    # within one timeout window at the offered rate
+    duration = arrivals[-1] if arrivals else 0.0
+    max_in_flight = max(8, min(len(arrivals), int(len(arrivals) / max(duration, 1.0) * (timeout + 1)) + 8))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="loadgen") as executor:
+        for prompt, offset in zip(prompts, arrivals):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(one, prompt, scheduled)
+    return latencies, counts, time.perf_counter() - start
+
+
+def summarize_rate(offered_rps, duration, latencies, counts, wall_seconds):
+    """summarize() plus the open-loop fields: offered vs achieved RPS, timeout and rate-limit rates."""
+    result = summarize(latencies, wall_seconds, errors=counts["error"] + counts["rate_limited"], timeouts=counts["timeout"])
+    total = result["requests"]
+    result.update({
+        "offered_rps": offered_rps,
+        "duration_s": duration,
+        # Completions over the arrival window plus the drain: what the deployment actually sustained
+        "achieved_rps": round(len(latencies) / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        "timeout_rate": round(counts["timeout"] / total, 4) if total else 0.0,
+        "rate_limited": counts["rate_limited"],
+    })
+    return result
+
+
+def keeps_up(run, min_efficiency=MIN_EFFICIENCY, max_error_rate=MAX_ERROR_RATE, p95_slo_ms=None):
+    """(True, None) if the run sustained its offered rate, else (False, reason)."""
+    if run["requests"] == 0:
+        return True, None
+    if run["error_rate"] > max_error_rate:
+        return False, "errors"
+    if run["achieved_rps"] < min_efficiency * run["offered_rps"]:
+        return False, "throughput"
+    if p95_slo_ms is not None and (run["p95_ms"] is None or run["p95_ms"] > p95_slo_ms):
+        return False, "latency"
+    return True, None
+
+
+def capacity(runs, **criteria):
+    """
+    Capacity summary of one deployment from its rate sweep (runs in increasing offered rate):
+    capacity_rps is the highest offered rate it kept up with, saturation_rps the first it did not.
+    """
+    result = {"capacity_rps": None, "saturation_rps": None, "saturated_by": None,
+              "peak_achieved_rps": max((run["achieved_rps"] for run in runs), default=None)}
+    for run in sorted(runs, key=lambda r: r["offered_rps"]):
+        ok, reason = keeps_up(run, **criteria)
+        if not ok:
+            result["saturation_rps"] = run["offered_rps"]
+            result["saturated_by"] = reason
+            break
+        result["capacity_rps"] = run["offered_rps"]
+    return result
+
+
+def http_sender(base_url):
+    """send(prompt, timeout) for a deployment at base_url, one keep-alive session per client thread."""
+    import requests
+
+    local = threading.local()
+    url = base_url.rstrip("/") + "/api/execute"
+
+    def send(prompt, timeout):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            response = session.post(url, json={"prompt": prompt}, timeout=timeout)
+        except requests.Timeout:
+            return "timeout"
+        except requests.RequestException:
+            return "error"
+        if response.status_code == 429:
+            return "rate_limited"
+        if response.status_code != 200:
+            return "error"
+        try:
+            return "ok" if response.json().get("status") == "ok" else "error"
+        except ValueError:
+            return "error"
+
+    return send
+
+
+def _free_port(host="127.0.0.1"):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(host, port, timeout, proc=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"process exited with code {proc.returncode} before listening on {host}:{port}")
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"nothing listening on {host}:{port} after {timeout}s")
+
+
+def _stop(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+@contextmanager
+def fake_services_process(profile, seed=0, host="127.0.0.1", startup_timeout=30):
+    """Run benchmarks.fake_services in a separate process (so it does not share the client's GIL); yields its env."""
+    from benchmarks.fake_services import DEFAULT_PORTS, service_env
+
+    ports = {name: _free_port(host) for name in DEFAULT_PORTS}
+    cmd = [sys.executable, "-m", "benchmarks.fake_services", "--host", host, "--profile", profile, "--seed", str(seed)]
+    for name, port in ports.items():
+        cmd += [f"--{name}-port", str(port)]
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL)
+    try:
+        for port in ports.values():
+            _wait_for_port(host, port, startup_timeout, proc)
+        yield service_env(host, ports)
+    finally:
+        _stop(proc)
+
+
+@contextmanager
+def uvicorn_server(workers, env=None, host="127.0.0.1", startup_timeout=120, log_path=os.devnull, response_cache=False):
+    """
+    Start `uvicorn api.main:app --workers N` with the rate limiter off; yields its base URL.
+    The prompt mix repeats profiles, so the response cache is off too unless response_cache=True.
+    """
+    import requests
+
+    port = _free_port(host)
+    cmd = [sys.executable, "-m", "uvicorn", "api.main:app", "--host", host, "--port", str(port),
+           "--workers", str(workers), "--no-access-log", "--log-level", "warning"]
+    with open(log_path, "ab") as log:
+        proc = subprocess.Popen(
+            cmd, cwd=REPO_ROOT, stdout=log, stderr=log,
+            env={**os.environ, **(env or {}), "RATE_LIMIT_ENABLED": "false", "PYTHONPATH": REPO_ROOT,
+                 **({} if response_cache else {"RESPONSE_CACHE_TTL_SECONDS": "0"})},
+        )
+        base_url = f"http://{host}:{port}"
+        try:
+            _wait_for_port(host, port, startup_timeout, proc)
+            deadline = time.monotonic() + startup_timeout
+            while True:  # every worker imports the app before the health check answers reliably
+                try:
+                    if requests.get(base_url + "/api/health", timeout=5).status_code == 200:
+                        break
+                except requests.RequestException:
+                    pass
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn with {workers} worker(s) did not become healthy")
+                time.sleep(0.5)
+            yield base_url
+        finally:
+            _stop(proc)
+
+
+def sweep(send, rates, duration, timeout, json_share=0.6, seed=0, warmup=0, stop_on_saturation=False, log=None, **criteria):
+    """Run one open-loop phase per offered rate; returns the per-rate results and the capacity summary."""
+    for prompt in prompt_mix(warmup, json_share, seed + 7919):
+        send(prompt, timeout)  # lazy indexes, embeddings and connections in each worker
+    runs = []
+    for i, rate in enumerate(rates):
+        arrivals = poisson_arrivals(rate, duration, seed + i)
+        prompts = prompt_mix(len(arrivals), json_share, seed + i)
+        latencies, counts, wall = run_open_loop(send, prompts, arrivals, timeout)
+        run = summarize_rate(rate, duration, latencies, counts, wall)
+        runs.append(run)
+        if log:
+            log(f"  offered {rate:>7.2f} rps  achieved {run['achieved_rps']:>7.2f} rps  "
+                f"p50 {run['p50_ms']} ms  p95 {run['p95_ms']} ms  errors {run['errors']}  timeouts {run['timeouts']}")
+        if stop_on_saturation and not keeps_up(run, **criteria)[0]:
+            break
+    return {"runs": runs, **capacity(runs, **criteria)}
+
+
+def _rates(spec, max_rate):
+    if spec == "auto":
+        rates, rate = [], AUTO_START_RATE
+        while rate <= max_rate:
+            rates.append(rate)
+            rate *= 2
+        return rates
+    return sorted(float(r) for r in spec.split(",") if r.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Open-loop load test and capacity report for /api/execute")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL of a running deployment (rate limiting must be disabled)")
+    target.add_argument("--workers", default="1,2,4", help="comma-separated uvicorn worker counts to spawn and compare")
+    parser.add_argument("--fake-services", metavar="PROFILE", help="run against local fake upstreams with this latency profile "
+                        "(zero, fast, realistic, slow); default: the upstreams configured in the environment")
+    parser.add_argument("--rates", default="auto", help="comma-separated offered rates (req/s), or 'auto' to double until saturation")
+    parser.add_argument("--max-rate", type=float, default=64.0, help="upper bound of the automatic sweep (req/s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals per rate")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request (seconds)")
+    parser.add_argument("--json-share", type=float, default=0.6, help="fraction of JSON profiles; the rest are natural-language prompts")
+    parser.add_argument("--warmup", type=int, default=None, help="sequential warm-up requests per deployment (default: 2 x workers)")
+    parser.add_argument("--p95-slo-ms", type=float, default=None, help="also count a rate as saturated when p95 exceeds this")
+    parser.add_argument("--response-cache", action="store_true", help="keep the response cache on in spawned servers "
+                        "(repeat profiles are then answered from it)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-log", default=os.devnull, help="append spawned uvicorn output here")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    rates = _rates(args.rates, args.max_rate)
+    criteria = {"p95_slo_ms": args.p95_slo_ms}
+    options = {"duration": args.duration, "timeout": args.timeout, "json_share": args.json_share, "seed": args.seed,
+               "stop_on_saturation": args.rates == "auto", **criteria}
+
+    def log(message):
+        print(message, file=sys.stderr, flush=True)
+
+    report = {
+        "git_commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {
+            "rates": rates, "duration_s": args.duration, "timeout_s": args.timeout, "json_share": args.json_share,
+            "fake_services": args.fake_services, "min_efficiency": MIN_EFFICIENCY, "max_error_rate": MAX_ERROR_RATE,
+            "p95_slo_ms": args.p95_slo_ms, "response_cache": args.response_cache,
+        },
+        "deployments": [],
+    }
+
+    if args.url:
+        log(f"{args.url}:")
+        result = sweep(http_sender(args.url), rates, warmup=args.warmup or 0, log=log, **options)
+        report["deployments"].append({"url": args.url, "workers": None, **result})
+    else:
+        with fake_services_process(args.fake_services, args.seed) if args.fake_services else _no_env() as env:
+            for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+                log(f"{workers} worker(s):")
+                with uvicorn_server(workers, env, log_path=args.server_log, response_cache=args.response_cache) as base_url:
+                    warmup = args.warmup if args.warmup is not None else 2 * workers
+                    result = sweep(http_sender(base_url), rates, warmup=warmup, log=log, **options)
+                report["deployments"].append({"workers": workers, **result})
+
+    for deployment in report["deployments"]:
+        label = f"{deployment['workers']} worker(s)" if deployment["workers"] else deployment["url"]
+        log(f"{label}: capacity {deployment['capacity_rps']} rps, saturates at {deployment['saturation_rps']} rps "
+            f"({deployment['saturated_by'] or 'not reached'}), peak {deployment['peak_achieved_rps']} rps")
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return report
+
+
+@contextmanager
+def _no_env():
+    yield {}
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
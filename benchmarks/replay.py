@@ -0,0 +1,334 @@
+"""
+Offline replay of the upstream services (LLMOD, Pinecone, Supabase, Wikipedia) from synthetic fixtures.
+
+The fixtures (fixtures/synthetic.json) and DEFAULT_LATENCIES are hand-written, not captured from the hosted
+services: they exercise the real code paths with plausible payloads and delays, so results compare commits
+against each other, not against production.
+
+install() patches the four upstream boundaries in-process:
+- utils.llmod_client._post                    (chat completions + embeddings)
+- pinecone_db.pinecone_client._get_index       (vector queries)
+- utils.config.get_supabase() and the `supabase` client imported by scripts (PostgREST table queries)
+- utils.web_enrichment._fetch_wikipedia_summary and fetch_exchange_rate_usd_to_eur
+
+Every replayed call sleeps for a configurable latency (with log-normal jitter) so the pipeline's
+concurrency and time budgets behave as they do against the real services.
+"""
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from orchestration.router import embed_text
+from pinecone_db.chunk_store import chunk_id
+from utils.instrumentation import span
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "synthetic.json")
+
+# Seconds per call: synthetic defaults (an LLM call dominates, vector/table lookups are tens of ms), not measurements
+DEFAULT_LATENCIES = {
+    "llm_chat": 0.8,
+    "embedding": 0.05,
+    "pinecone": 0.04,
+    "supabase": 0.03,
+    "wikipedia": 0.15,
+}
+
+PROJECT_PACKAGES = ("api", "orchestration", "pinecone_db", "data_pipeline", "utils")
+
+
+def load_fixtures(path=FIXTURES_PATH) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Latency:
+    """Injected per-service latency: base seconds x log-normal jitter (sigma), reproducible with a seed."""
+
+    def __init__(self, latencies=None, jitter=0.25, seed=0, scale=1.0):
+        self.latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+        self.jitter = jitter
+        self.scale = scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self, service: str):
+        base = self.latencies.get(service, 0.0) * self.scale
+        if base <= 0:
+            return
+        with self._lock:
+            factor = self._random.lognormvariate(0, self.jitter) if self.jitter else 1.0
+        time.sleep(base * factor)
+
+
+# --- PostgREST-style table queries (shared with the fake Supabase HTTP service) ---
+
+def _compare(op, row_value, value):
+    if op == "in":
+        return row_value in value
+    if row_value is None:
+        return False
+    if op == "eq":
+        return row_value == value
+    if op == "neq":
+        return row_value != value
+    try:
+        a, b = float(row_value), float(value)
+    except (TypeError, ValueError):
+        a, b = str(row_value), str(value)
+    return {"lt": a < b, "lte": a <= b, "gt": a > b, "gte": a >= b}.get(op, False)
+
+
+def query_rows(rows, filters=(), columns="*", limit=None):
+    """Apply (op, column, value) filters, a select column list and a limit to fixture rows."""
+    out = [row for row in rows if all(_compare(op, row.get(col), value) for op, col, value in filters)]
+    if limit is not None:
+        out = out[:limit]
+    if columns and columns.strip() != "*":
+        names = [c.strip() for c in columns.split(",") if c.strip()]
+        out = [{name: row.get(name) for name in names} for row in out]
+    return [dict(row) for row in out]
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeTableQuery:
+    """Subset of the supabase-py query builder used in this repo (select/eq/lte/.../limit/upsert/execute)."""
+
+    def __init__(self, store, name, latency):
+        self._store = store
+        self._name = name
+        self._latency = latency
+        self._filters = []
+        self._columns = "*"
+        self._limit = None
+        self._upsert = None
+
+    def select(self, columns="*", **_kwargs):
+        self._columns = columns
+        return self
+
+    def _filter(self, op, column, value):
+        self._filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def in_(self, column, values):
+        return self._filter("in", column, list(values))
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def upsert(self, rows, on_conflict=None, **_kwargs):
+        self._upsert = (rows if isinstance(rows, list) else [rows], on_conflict)
+        return self
+
+    def execute(self):
+        self._latency.sleep("supabase")
+        with self._store.lock:
+            table = self._store.tables.setdefault(self._name, [])
+            if self._upsert is not None:
+                rows, on_conflict = self._upsert
+                keys = [k.strip() for k in on_conflict.split(",")] if on_conflict else []
+                for row in rows:
+                    match = next((i for i, old in enumerate(table) if keys and all(old.get(k) == row.get(k) for k in keys)), None)
+                    if match is None:
+                        table.append(dict(row))
+                    else:
+                        table[match] = {**table[match], **row}
+                return _Result([dict(row) for row in rows])
+            return _Result(query_rows(table, self._filters, self._columns, self._limit))
+
+
+class FakeSupabase:
+    def __init__(self, tables, latency):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in tables.items()}
+        self.lock = threading.Lock()
+        self._latency = latency
+
+    def table(self, name):
+        return FakeTableQuery(self, name, self._latency)
+
+
+# --- Pinecone ---
+
+def _matches_filter(metadata, filter):
+    for key, cond in (filter or {}).items():
+        value = metadata.get(key)
+        if isinstance(cond, dict):
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$eq" in cond and value != cond["$eq"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeIndex:
+    """Pinecone index over the fixture chunks, embedded with the deterministic local embedding."""
+
+    def __init__(self, chunks, latency):
+        self._latency = latency
+        self._lock = threading.Lock()
+        self._vectors = []
+        for row in chunks:
+            metadata = {k: row.get(k) for k in ("country", "university", "file_name", "chunk_index", "text", "headers")}
+            self._vectors.append((row.get("chunk_id") or chunk_id(row), embed_text(row.get("text") or ""), metadata))
+
+    def query(self, vector=None, top_k=10, namespace=None, filter=None, include_metadata=True, **_kwargs):
+        self._latency.sleep("pinecone")
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        scored = []
+        with self._lock:
+            vectors = list(self._vectors)
+        for vid, values, metadata in vectors:
+            if _matches_filter(metadata, filter):
+                score = sum(a * b for a, b in zip(vector, values)) / norm
+                scored.append((score, vid, metadata))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return {"matches": [
+            {"id": vid, "score": score, "metadata": dict(metadata) if include_metadata else {}}
+            for score, vid, metadata in scored[:top_k]
+        ]}
+
+    def upsert(self, vectors=None, namespace=None, **kwargs):
+        vectors = vectors or kwargs.get("items") or []
+        self._latency.sleep("pinecone")
+        with self._lock:
+            by_id = {vid: i for i, (vid, _values, _meta) in enumerate(self._vectors)}
+            for vector in vectors:
+                entry = (vector["id"], list(vector["values"]), dict(vector.get("metadata") or {}))
+                if vector["id"] in by_id:
+                    self._vectors[by_id[vector["id"]]] = entry
+                else:
+                    by_id[vector["id"]] = len(self._vectors)
+                    self._vectors.append(entry)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids=None, namespace=None, **_kwargs):
+        self._latency.sleep("pinecone")
+        ids = set(ids or [])
+        with self._lock:
+            self._vectors = [entry for entry in self._vectors if entry[0] not in ids]
+        return {}
+
+    def describe_index_stats(self, **_kwargs):
+        return {"total_vector_count": len(self._vectors), "dimension": len(self._vectors[0][1]) if self._vectors else 0}
+
+
+# --- LLMOD ---
+
+def chat_response(fixtures, system_prompt, user_prompt):
+    """Fixture chat completion content for a prompt (matched by a substring of the system prompt)."""
+    for entry in fixtures["chat"]:
+        if entry["match"] in system_prompt:
+            response = entry["response"]
+            if isinstance(response, dict) and "scored_universities" in response:
+                # Ranker: only score the universities that are in this prompt
+                response = {"scored_universities": [
+                    uni for uni in response["scored_universities"] if f'"{uni["university_name"]}"' in user_prompt
+                ]}
+            return json.dumps(response, ensure_ascii=False) if isinstance(response, (dict, list)) else str(response)
+    return "{}"
+
+
+def make_post(fixtures, latency):
+    usage = fixtures.get("usage") or {}
+
+    def fake_post(url, payload, headers, timeout, span_name):
+        with span(span_name):
+            if url.endswith("/embeddings"):
+                latency.sleep("embedding")
+                inputs = payload.get("input")
+                inputs = inputs if isinstance(inputs, list) else [inputs]
+                return {
+                    "data": [{"index": i, "embedding": embed_text(str(text))} for i, text in enumerate(inputs)],
+                    "usage": {"prompt_tokens": sum(len(str(t)) // 4 for t in inputs), "completion_tokens": 0},
+                }
+            latency.sleep("llm_chat")
+            messages = payload.get("messages") or []
+            system_prompt = next((m["content"] for m in messages if m.get("role") == "system"), "")
+            user_prompt = next((m["content"] for m in messages if m.get("role") == "user"), "")
+            return {
+                "choices": [{"message": {"role": "assistant", "content": chat_response(fixtures, system_prompt, user_prompt)}}],
+                "usage": usage,
+            }
+
+    return fake_post
+
+
+def make_wikipedia(fixtures, latency):
+    template = fixtures.get("wikipedia", {}).get("default", "")
+
+    def fake_summary(article_title):
+        with span("wikipedia.summary"):
+            latency.sleep("wikipedia")
+        return template.format(title=article_title) or None
+
+    return fake_summary
+
+
+@contextmanager
+def install(latencies=None, jitter=0.25, seed=0, scale=1.0, fixtures=None):
+    """
+    Replay all upstream services from fixtures for the duration of the block.
+    Yields the Latency object (its .latencies / .scale can be changed between runs).
+    """
+    import utils.config
+    import utils.llmod_client
+    import utils.web_enrichment
+    import pinecone_db.pinecone_client
+
+    fixtures = fixtures or load_fixtures()
+    latency = Latency(latencies, jitter=jitter, seed=seed, scale=scale)
+    fake_supabase = FakeSupabase(fixtures["supabase"], latency)
+    fake_index = FakeIndex(fixtures["supabase"].get("factsheets_chunks", []), latency)
+
+    real_supabase = utils.config.get_supabase()
+    patches = [
+        (utils.config, "_supabase", {"client": fake_supabase, "initialized": True}),
+        (utils.llmod_client, "_post", make_post(fixtures, latency)),
+        (utils.web_enrichment, "_fetch_wikipedia_summary", make_wikipedia(fixtures, latency)),
+        (utils.web_enrichment, "fetch_exchange_rate_usd_to_eur", lambda: fixtures.get("usd_to_eur", 0.92)),
+        (pinecone_db.pinecone_client, "_get_index", lambda: fake_index),
+    ]
+    for name, module in list(sys.modules.items()):
+        if module is not None and name != "utils.config" and name.split(".")[0] in PROJECT_PACKAGES and getattr(module, "supabase", object()) is real_supabase:
+            patches.append((module, "supabase", fake_supabase))
+
+    originals = [(module, attr, getattr(module, attr)) for module, attr, _ in patches]
+    for module, attr, value in patches:
+        setattr(module, attr, value)
+    pinecone_db.pinecone_client._query_vector.cache_clear()
+    try:
+        yield latency
+    finally:
+        for module, attr, value in originals:
+            setattr(module, attr, value)
+        pinecone_db.pinecone_client._query_vector.cache_clear()
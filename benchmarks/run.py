@@ -0,0 +1,236 @@
+"""
+Offline benchmark suite: end-to-end pipeline and API latency/throughput against replayed upstream
+services (see replay.py), plus CPU microbenchmarks. Results are written as JSON so runs can be
+compared across commits.
+
+Usage:
+    python -m benchmarks.run --concurrency 1,4,8 --requests 24 --output bench.json
+    python -m benchmarks.run --targets micro
+    python -m benchmarks.run --latency llm_chat=1.5 --latency-scale 0.5
+"""
+import argparse
+import copy
+import json
+import math
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import replay
+
+# Profiles modeled on the /api/agent_info examples: structured JSON and natural language
+PROFILES = [
+    {"academic_profile": {"gpa": 85, "major": "Computer Science"}, "preferences": {"free_language_preferences": "party vibe, easy to make friends"},
+     "language_profile": {}, "availability": {}},
+    {"academic_profile": {"gpa": 90, "study_level": "MSc", "semesters_completed": 5}, "preferences": {"free_language_preferences": "research labs, nature and hiking"},
+     "language_profile": {"english_test_type": ["TOEFL"], "english_test_level": "C1"}, "availability": {"start_month": 9, "end_month": 1}},
+    {"academic_profile": {"gpa": 78}, "preferences": {"free_language_preferences": "cheap city, Jewish community, good food", "must_be_erasmus": True},
+     "language_profile": {}, "availability": {}},
+]
+NL_PROMPTS = [
+    "I have a GPA of 88 in electrical engineering and want a big city in Europe with nightlife and a Jewish community",
+    "Looking for an affordable exchange in Asia, I study CS with an 84 average, fall semester",
+]
+PROMPTS = [json.dumps(profile) for profile in PROFILES] + NL_PROMPTS
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), math.ceil(q * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies_ms, wall_seconds, errors=0, timeouts=0):
+    """Latency percentiles (ms) and throughput for one run."""
+    values = sorted(latencies_ms)
+    total = len(values) + errors + timeouts
+    return {
+        "requests": total,
+        "ok": len(values),
+        "errors": errors,
+        "timeouts": timeouts,
+        "error_rate": round((errors + timeouts) / total, 4) if total else 0.0,
+        "throughput_rps": round(len(values) / wall_seconds, 3) if wall_seconds > 0 else None,
+        "mean_ms": round(sum(values) / len(values), 1) if values else None,
+        "p50_ms": round(percentile(values, 0.50), 1) if values else None,
+        "p95_ms": round(percentile(values, 0.95), 1) if values else None,
+        "p99_ms": round(percentile(values, 0.99), 1) if values else None,
+        "max_ms": round(values[-1], 1) if values else None,
+    }
+
+
+def run_closed_loop(fn, concurrency, n_requests):
+    """Run n_requests calls of fn(i) with `concurrency` workers; fn returns True on success."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = fn(i)
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(n_requests)))
+    return summarize(latencies, time.perf_counter() - wall_start, errors)
+
+
+def bench_pipeline(levels, n_requests):
+    from orchestration.supervisor import Supervisor
+    agent = Supervisor()
+
+    def call(i):
+        result = agent.run("benchmark", user_profile_dict=copy.deepcopy(PROFILES[i % len(PROFILES)]), thread_id=str(uuid.uuid4()))
+        return bool(result.get("analysis"))
+
+    call(0)  # warm-up (lazy indexes, embeddings of the fixed sub-queries)
+    return {str(c): run_closed_loop(call, c, n_requests) for c in levels}
+
+
+def bench_api(levels, n_requests):
+    from fastapi.testclient import TestClient
+    import api.main
+    from orchestration import response_cache
+
+    api.main.limiter.enabled = False  # measure the pipeline, not the rate limiter or the response cache
+    cache_ttl, response_cache.RESPONSE_CACHE_TTL_SECONDS = response_cache.RESPONSE_CACHE_TTL_SECONDS, 0
+    local = threading.local()
+
+    def call(i):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = TestClient(api.main.app)
+        response = client.post("/api/execute", json={"prompt": PROMPTS[i % len(PROMPTS)]})
+        return response.status_code == 200 and response.json().get("status") == "ok"
+
+    try:
+        call(0)
+        return {str(c): run_closed_loop(call, c, n_requests) for c in levels}
+    finally:
+        api.main.limiter.enabled = True
+        response_cache.RESPONSE_CACHE_TTL_SECONDS = cache_ttl
+
+
+def _time_calls(fn, iterations):
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    return {
+        "iterations": iterations,
+        "mean_us": round(sum(times) / len(times), 1),
+        "p50_us": round(percentile(times, 0.50), 1),
+        "p95_us": round(percentile(times, 0.95), 1),
+        "p99_us": round(percentile(times, 0.99), 1),
+    }
+
+
+def bench_micro(fixtures, iterations):
+    from orchestration.specialists.filter import filter_universities
+    from orchestration.specialists.ranker import process_llm_scores
+    from data_pipeline.rag_embedding import chunk_pdf_with_headers
+
+    catalog = fixtures["supabase"]["universities_requirements"]
+    ranker = next(e["response"] for e in fixtures["chat"] if "scored_universities" in e["response"])
+    chunks = fixtures["supabase"]["factsheets_chunks"]
+    markdown = "\n\n".join(chunk["text"] for chunk in chunks) * 3
+    profile = PROFILES[1]
+
+    return {
+        "filter_universities_catalog": _time_calls(lambda: filter_universities(profile, catalog=catalog), iterations),
+        "filter_universities_query": _time_calls(lambda: filter_universities(profile), iterations),
+        "process_llm_scores": _time_calls(lambda: process_llm_scores(copy.deepcopy(ranker), top_k=5), iterations),
+        "chunk_pdf_with_headers": _time_calls(lambda: chunk_pdf_with_headers({"text": markdown}), max(1, iterations // 10)),
+        "_inputs": {"catalog_rows": len(catalog), "ranked_universities": len(ranker["scored_universities"]), "markdown_chars": len(markdown)},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _parse_latencies(pairs):
+    latencies = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        if name not in replay.DEFAULT_LATENCIES:
+            raise SystemExit(f"Unknown service '{name}' (expected one of {', '.join(replay.DEFAULT_LATENCIES)})")
+        latencies[name] = float(value)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks against replayed upstream services")
+    parser.add_argument("--targets", default="pipeline,api,micro", help="comma-separated: pipeline, api, micro")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=24, help="requests per concurrency level")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDS", help="override an injected latency")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply all injected latencies")
+    parser.add_argument("--jitter", type=float, default=0.25, help="log-normal sigma of the latency jitter (0 = fixed)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--micro-iterations", type=int, default=200)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    targets = {t.strip() for t in args.targets.split(",") if t.strip()}
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    fixtures = replay.load_fixtures()
+
+    # Import everything that holds a supabase reference before patching it
+    import orchestration.supervisor  # noqa: F401
+    if "api" in targets:
+        import api.main  # noqa: F401
+
+    results = {
+        "git_commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {
+            "requests_per_level": args.requests,
+            "concurrency": levels,
+            "latencies_s": {**replay.DEFAULT_LATENCIES, **_parse_latencies(args.latency)},
+            "latency_scale": args.latency_scale,
+            "jitter": args.jitter,
+        },
+    }
+    with replay.install(_parse_latencies(args.latency), jitter=args.jitter, seed=args.seed, scale=args.latency_scale) as latency:
+        if "pipeline" in targets:
+            results["supervisor_run"] = bench_pipeline(levels, args.requests)
+        if "api" in targets:
+            results["api_execute"] = bench_api(levels, args.requests)
+        if "micro" in targets:
+            latency.scale = 0.0  # CPU cost only
+            results["micro"] = bench_micro(fixtures, args.micro_iterations)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return results
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
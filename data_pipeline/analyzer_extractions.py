@@ -0,0 +1,85 @@
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.config import supabase
+from orchestration.specialists.analyzer import extract_logistics
+from utils import data_version
+
+
+def compute_chunks_hash(chunks):
+    """Stable digest of a university's factsheet chunks (order-independent)."""
+    digest = hashlib.sha256()
+    for chunk in sorted(chunks, key=lambda c: (c.get("file_name") or "", c.get("chunk_index") or 0)):
+        digest.update(f"{chunk.get('file_name')}|{chunk.get('chunk_index')}|".encode("utf-8"))
+        digest.update((chunk.get("text") or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _load_chunk_hashes():
+    response = supabase.table("factsheets_chunks").select("university,file_name,chunk_index,text").execute()
+    rows = response.data if response and hasattr(response, 'data') else []
+    grouped = defaultdict(list)
+    for row in rows:
+        if row.get("university"):
+            grouped[row["university"]].append(row)
+    return {uni: compute_chunks_hash(chunks) for uni, chunks in grouped.items()}
+
+
+def _load_existing_hashes():
+    response = supabase.table("analyzer_extractions").select("university,chunks_hash").execute()
+    rows = response.data if response and hasattr(response, 'data') else []
+    return {row["university"]: row.get("chunks_hash") for row in rows if row.get("university")}
+
+
+def _extract_one(uni_name, chunks_hash):
+    logistics, _user_prompt = extract_logistics(uni_name)
+    if not logistics:
+        return None
+    return {
+        "university": uni_name,
+        "chunks_hash": chunks_hash,
+        "logistics_and_experience": logistics,
+    }
+
+
+def materialize_extractions(force=False):
+    """
+    Precompute the Analyzer's logistics_and_experience JSON for every university and store it in
+    the analyzer_extractions table. Run after embed_chunks. Only universities whose factsheet
+    chunks changed (by hash) are recomputed unless force=True.
+    """
+    chunk_hashes = _load_chunk_hashes()
+    existing = {} if force else _load_existing_hashes()
+    stale = [(uni, h) for uni, h in chunk_hashes.items() if existing.get(uni) != h]
+    print(f"Found {len(chunk_hashes)} universities with chunks, {len(stale)} need extraction.")
+
+    all_records = []
+    # Same concurrency as run_ingestion; adjust to llmod.ai rate limits
+    max_concurrent_requests = 5
+    with ThreadPoolExecutor(max_workers=max_concurrent_requests) as executor:
+        future_to_uni = {executor.submit(_extract_one, uni, h): uni for uni, h in stale}
+        for future in as_completed(future_to_uni):
+            uni_name = future_to_uni[future]
+            try:
+                record = future.result()
+                if record:
+                    all_records.append(record)
+                    print(f"Extracted: {uni_name}")
+                else:
+                    print(f"Empty extraction for: {uni_name}")
+            except Exception as e:
+                print(f"Exception occurred extracting {uni_name}: {e}")
+
+    if all_records:
+        supabase.table("analyzer_extractions").upsert(all_records, on_conflict="university").execute()
+        print(f"Saved {len(all_records)} extractions to analyzer_extractions table.")
+        response = supabase.table("analyzer_extractions").select("university,chunks_hash,logistics_and_experience").execute()
+        print(f"Data version: {data_version.record_ingestion('analyzer_extractions', response.data or [])}")
+    else:
+        print("No extractions to save.")
+    return all_records
+
+
+if __name__ == "__main__":
+    materialize_extractions()
@@ -1,3 +1,8 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
 # --- GLOBAL CONTEXT DATA ---
 
 FINANCIAL_REFERENCE_TABLE = """
@@ -37,3 +42,174 @@ SOCIAL_SENTIMENT_TABLE = """
 | EPFL | Famous for high failure rates; social life takes a deep backseat to studying. | Low |
 | Academia Sinica | Pure research institute, mostly post-grads, almost zero traditional campus life. | Lowest |
 """
+
+# --- STRUCTURED VIEWS OF THE TABLES ---
+# The tables above stay the source of truth; they are parsed once into typed records with lookups by
+# university, region and country, so callers can use just the rows that matter for a request.
+
+class CostRange(NamedTuple):
+    region: str
+    characterization: str
+    semester_low_usd: int
+    semester_high_usd: int
+
+    @property
+    def semester_mid_usd(self) -> int:
+        return (self.semester_low_usd + self.semester_high_usd) // 2
+
+
+class SocialRecord(NamedTuple):
+    university: str  # as written in SOCIAL_SENTIMENT_TABLE (may name several universities, e.g. "TUM / TU Berlin")
+    vibe: str
+    level: str  # "Lowest" .. "High", e.g. "Medium/High" or "High (Closed)"
+    score: int  # level on a 0-100 scale
+
+
+# Overall Social Level -> ordinal (0 = Lowest, 3 = High); "X/Y" levels sit halfway between X and Y
+_SOCIAL_LEVELS = {"lowest": 0.0, "low": 1.0, "medium": 2.0, "high": 3.0}
+
+COUNTRY_REGIONS = {
+    "USA / Australia": ["United States", "USA", "US", "Australia"],
+    "Canada / UK": ["Canada", "United Kingdom", "UK", "England", "Scotland", "Wales", "Ireland"],
+    "Northern Europe": ["Denmark", "Sweden", "Norway", "Finland", "Iceland", "Netherlands", "Switzerland", "Luxembourg"],
+    "Western / Southern Europe": ["Germany", "France", "Italy", "Spain", "Portugal", "Belgium", "Austria", "Greece", "Cyprus", "Malta"],
+    "Mexico / Latin America": ["Mexico", "Argentina", "Brazil", "Chile", "Colombia", "Peru", "Uruguay", "Costa Rica", "Ecuador"],
+    "East Asia (Japan / Korea)": ["Japan", "South Korea", "Korea"],
+    "China / Taiwan": ["China", "Taiwan"],
+    "Eastern Europe": ["Czech Republic", "Czechia", "Poland", "Hungary", "Romania", "Slovakia", "Slovenia", "Croatia",
+                       "Bulgaria", "Estonia", "Latvia", "Lithuania", "Serbia"],
+}
+
+# Full catalog names -> the short names used in SOCIAL_SENTIMENT_TABLE
+UNIVERSITY_ALIASES = {
+    "Czech Technical University in Prague": "CTU (Prague)",
+    "Technical University of Denmark": "DTU",
+    "Technical University of Munich": "TUM",
+    "Technische Universität München": "TUM",
+    "Technical University of Berlin": "TU Berlin",
+    "Technische Universität Berlin": "TU Berlin",
+    "Karlsruhe Institute of Technology": "KIT",
+    "University of British Columbia": "UBC",
+    "University of Toronto": "U of Toronto",
+    "Tsinghua University": "Tsinghua",
+    "Peking University": "Peking",
+    "Korea Advanced Institute of Science and Technology": "KAIST",
+    "Pohang University of Science and Technology": "POSTECH",
+    "University of Science and Technology of China": "USTC",
+    "Sungkyunkwan University": "SKKU",
+    "École Polytechnique Fédérale de Lausanne": "EPFL",
+    "Carnegie Mellon University": "Carnegie Mellon",
+    "University of Connecticut": "UConn",
+    "Tecnológico de Monterrey": "ITESM Monterrey",
+    "Monterrey Institute of Technology": "ITESM Monterrey",
+    "HEC Paris": "HEC",
+}
+
+# Words that do not tell universities apart ("McGill University" and "McGill" are the same key)
+_GENERIC_WORDS = {"the", "of", "in", "u", "university", "universitat", "universite", "universidad", "universita", "institute", "technology"}
+
+
+def name_key(name: str) -> str:
+    """Lookup key for a university or country name: no accents, case, punctuation or generic words."""
+    text = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(word for word in re.findall(r"[a-z0-9]+", text) if word not in _GENERIC_WORDS)
+
+
+def parse_markdown_table(text: str) -> list:
+    """Rows of a pipe-delimited markdown table as dicts keyed by the header cells."""
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip().startswith("|")]
+    if not lines:
+        return []
+    split = lambda line: [cell.strip() for cell in line.strip("|").split("|")]
+    header = split(lines[0])
+    return [dict(zip(header, split(line))) for line in lines[1:] if not set(line) <= set("|:- ")]
+
+
+def _parse_usd_range(text: str):
+    amounts = [int(amount.replace(",", "")) for amount in re.findall(r"\$([\d,]+)", text)]
+    return (amounts[0], amounts[-1]) if amounts else (None, None)
+
+
+def _social_score(level: str) -> int:
+    parts = [_SOCIAL_LEVELS[part] for part in re.findall(r"[a-z]+", level.lower()) if part in _SOCIAL_LEVELS]
+    return round(sum(parts) / len(parts) / 3 * 100) if parts else None
+
+
+def _aliases(university: str) -> list:
+    """Names a SOCIAL_SENTIMENT_TABLE cell stands for: "Carnegie Mellon (CMU)" -> ["Carnegie Mellon (CMU)", "Carnegie Mellon", "CMU"]."""
+    names = []
+    for part in university.split("/"):
+        part = part.strip()
+        names.append(part)
+        match = re.match(r"^(.*?)\s*\((.*?)\)$", part)
+        if match:
+            names.extend(name for name in match.groups() if name.lower() != "closed")
+    return [university] + names
+
+
+@lru_cache(maxsize=1)
+def reference_index() -> dict:
+    """
+    Parse both tables once.
+    Returns:
+        dict: {"costs": {region: CostRange}, "regions_by_country": {country key: region},
+               "social": [SocialRecord], "social_by_name": {name key: SocialRecord}}
+    """
+    costs = {}
+    for row in parse_markdown_table(FINANCIAL_REFERENCE_TABLE):
+        low, high = _parse_usd_range(row["Est. Semester Total (USD)"])
+        costs[row["Region"]] = CostRange(row["Region"], row["Characterization"], low, high)
+    regions_by_country = {name_key(country): region for region, countries in COUNTRY_REGIONS.items() for country in countries}
+
+    social, social_by_name = [], {}
+    for row in parse_markdown_table(SOCIAL_SENTIMENT_TABLE):
+        level = row["Overall Social Level"]
+        record = SocialRecord(row["University"], row["Primary Social Vibe & Internet Sentiment"], level, _social_score(level))
+        social.append(record)
+        for alias in _aliases(record.university):
+            social_by_name.setdefault(name_key(alias), record)
+    for full_name, short_name in UNIVERSITY_ALIASES.items():
+        if name_key(short_name) in social_by_name:
+            social_by_name.setdefault(name_key(full_name), social_by_name[name_key(short_name)])
+    return {"costs": costs, "regions_by_country": regions_by_country, "social": social, "social_by_name": social_by_name}
+
+
+def region_for_country(country: str) -> Optional[str]:
+    """FINANCIAL_REFERENCE_TABLE region of a country, or None when the table does not cover it."""
+    return reference_index()["regions_by_country"].get(name_key(country))
+
+
+def cost_range(country: str) -> Optional[CostRange]:
+    """Semester cost range for a country's region, or None."""
+    region = region_for_country(country)
+    return reference_index()["costs"].get(region) if region else None
+
+
+def social_record(university: str) -> Optional[SocialRecord]:
+    """SOCIAL_SENTIMENT_TABLE row for a university (full or short name), or None."""
+    return reference_index()["social_by_name"].get(name_key(university))
+
+
+def relevant_reference_rows(universities: list) -> dict:
+    """
+    The table rows that matter for these universities (dicts with "name" and "country").
+    Returns:
+        dict: {"social": [SocialRecord] in table order, "unmapped_countries": [str] without a cost region}
+    """
+    social = {social_record(uni.get("name")) for uni in universities} - {None}
+    unmapped = []
+    for uni in universities:
+        country = uni.get("country")
+        if country and not region_for_country(country) and country not in unmapped:
+            unmapped.append(country)
+    return {
+        "social": [record for record in reference_index()["social"] if record in social],
+        "unmapped_countries": unmapped,
+    }
+
+
+def format_social_rows(records: list) -> str:
+    """SOCIAL_SENTIMENT_TABLE restricted to `records`, in the same markdown layout."""
+    lines = ["| University | Primary Social Vibe & Internet Sentiment | Overall Social Level |", "| :--- | :--- | :--- |"]
+    lines += [f"| {r.university} | {r.vibe} | {r.level} |" for r in records]
+    return "\n".join(lines)
@@ -2,7 +2,9 @@ from utils.llmod_client import batch_embed_texts
 from utils.config import supabase
 from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
 from utils.config import BASE_DIR, CHUNK_SIZE, CHUNK_OVERLAP
-from pinecone_db.pinecone_client import upsert_embeddings
+from pinecone_db.pinecone_client import upsert_embeddings, delete_embeddings
+from pinecone_db.chunk_store import chunk_id, legacy_chunk_id, save_chunk_store
+from utils import data_version
 
 def chunk_pdf_with_headers(row):
     """Chunk markdown text from a row in extracted_texts table using headers and recursive splitting."""
@@ -70,6 +72,7 @@ def save_chunks():
                 "university": uni,
                 "file_name": file_name,
                 "chunk_index": i,
+                "chunk_id": chunk_id({"country": country, "university": uni, "file_name": file_name, "chunk_index": i}),
                 "text": chunk.page_content,
                 "headers": chunk.metadata
             }
@@ -77,6 +80,9 @@ def save_chunks():
     if all_chunks:
         supabase.table("factsheets_chunks").upsert(all_chunks).execute()
         print(f"Saved {len(all_chunks)} chunks to factsheets_chunks table.")
+        save_chunk_store(all_chunks)
+        print(f"Saved {len(all_chunks)} chunks to the local chunk store (source of the BM25 index).")
+        print(f"Data version: {data_version.record_ingestion('factsheets_chunks', all_chunks)}")
     else:
         print("No chunks to save.")
     return all_chunks
@@ -94,18 +100,28 @@ def embed_chunks():
     vectors = []
     metadatas = []
     for i, (row, embedding) in enumerate(zip(rows, embeddings)):
-        chunk_id = f"{row['country']}_{row['university']}_{row['file_name']}_{row.get('chunk_index', i)}"
-        vectors.append((chunk_id, embedding))
+        vectors.append((row.get("chunk_id") or chunk_id(row, i), embedding))
         metadatas.append({
             "country": row["country"],
             "university": row["university"],
             "file_name": row["file_name"],
+            "chunk_index": row.get("chunk_index", i),
             "headers": row["headers"],
             "text": (row.get("text") or "")[:4000]  # Pinecone metadata limit; truncate if needed
         })
     if vectors:
         upsert_embeddings(vectors, metadatas=metadatas)
         print(f"Upserted {len(vectors)} embeddings to Pinecone.")
+        # Vectors from before stable IDs hold the same chunks; left in place they take top_k slots twice
+        legacy_ids = [legacy_chunk_id(row, i) for i, row in enumerate(rows)]
+        try:
+            delete_embeddings(legacy_ids)
+            print(f"Deleted {len(legacy_ids)} legacy vector IDs (if present).")
+        except Exception as e:
+            print(f"Could not delete legacy vector IDs: {e}")
+        # Vector IDs and the chunk text they embed (the embeddings are a function of the text)
+        indexed = [{"id": vector_id, "text": metadata["text"]} for (vector_id, _), metadata in zip(vectors, metadatas)]
+        print(f"Data version: {data_version.record_ingestion('pinecone_index', indexed, exclude=())}")
     else:
         print("No embeddings to upsert.")
 
@@ -115,3 +131,6 @@ if __name__ == "__main__":
     save_chunks()
     # print("Step 2: Embedding and upserting to Pinecone...")
     # embed_chunks()
+    # print("Step 3: Precomputing Analyzer extractions...")
+    # from data_pipeline.analyzer_extractions import materialize_extractions
+    # materialize_extractions()
@@ -10,6 +10,7 @@ sys.path.append(project_root)
 from utils.llmod_client import llmod_chat
 from utils.config import supabase
 from utils.config import BASE_DIR
+from utils import data_version
 
 load_dotenv()
 
@@ -168,6 +169,11 @@ def run_ingestion():
         except Exception as e:
             print(f"\nDatabase error during upsert: {e}")
             # Ensure your Supabase table actually has a unique constraint on (name, country)!
+            return
+        # 4. Record the table's new content so caches keyed on the data version are refreshed
+        response = supabase.table("universities_requirements").select("*").execute()
+        version = data_version.record_ingestion("universities_requirements", response.data or [])
+        print(f"Data version: {version}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+"""
+Batch runner for many user profiles at once (e.g. an advisor's whole cohort).
+Runs the same Filter -> Rank -> Analyze pipeline as the Supervisor, but shares the work that does not
+depend on the user: the catalog is loaded once and each university is analyzed once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from orchestration.profile_extractor import extract_profile_from_text
+from orchestration.specialists.analyzer import analyze_university, prefetch_contexts, with_fit_reasoning
+from orchestration.specialists.filter import load_catalog
+from orchestration.supervisor import filter_node, rank_node, _synthesize_recommendations, _format_analysis_as_string
+from utils.config import BATCH_MAX_WORKERS
+from utils.instrumentation import submit
+
+
+def _error_result(error):
+    return {"status": "error", "error": str(error), "response": None, "steps": []}
+
+
+def run_batch(prompts, top_k=5, progress=None):
+    """
+    Execute the agent pipeline for a list of prompts.
+
+    Args:
+        prompts (list[str]): One prompt (JSON or natural language) per profile.
+        top_k (int): Number of universities to rank and analyze per profile.
+        progress (callable, optional): Called as progress(stage, completed, total) while work finishes.
+
+    Returns:
+        list[dict]: One {"status", "error", "response", "steps"} dict per prompt, in input order.
+    """
+    report = progress or (lambda stage, completed, total: None)
+    n = len(prompts)
+    results = [None] * n
+
+    with ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS) as executor:
+        # 1. Profiles (LLM extraction only for free-text prompts)
+        profiles = [f.result() for f in [submit(executor, extract_profile_from_text, p.strip()) for p in prompts]]
+        report("extract", n, n)
+
+        # 2. One catalog load shared by every profile's filter
+        catalog = load_catalog()
+        catalog_by_name = {row.get("name"): row for row in catalog if row.get("name")}
+
+        def filter_and_rank(profile):
+            state = {"user_iformation": profile, "catalog": catalog, "top_k": top_k}
+            filtered = filter_node(state)
+            state.update(filtered)
+            ranked = rank_node(state)
+            return {**state, **ranked, "steps": filtered["steps"] + ranked["steps"]}
+
+        states = [None] * n
+        futures = {
+            submit(executor, filter_and_rank, profile): i
+            for i, profile in enumerate(profiles) if profile
+        }
+        for i, profile in enumerate(profiles):
+            if not profile:
+                results[i] = _error_result("Could not extract profile from input")
+        for completed, future in enumerate(futures, 1):
+            i = futures[future]
+            try:
+                states[i] = future.result()
+            except Exception as e:
+                results[i] = _error_result(e)
+            report("rank", completed, len(futures))
+
+        # 3. Analyzer extraction depends only on the university: run it once per unique name
+        unique_universities = list(dict.fromkeys(
+            name for state in states if state for name in state.get("top_universities") or []
+        ))
+        shared = {}
+        context_call = prefetch_contexts(unique_universities)
+        analysis_futures = {
+            submit(executor, analyze_university, name, catalog_by_name.get(name), None, context_call): name
+            for name in unique_universities
+        }
+        for completed, future in enumerate(analysis_futures, 1):
+            name = analysis_futures[future]
+            try:
+                shared[name] = future.result()
+            except Exception:
+                shared[name] = None
+            report("analyze", completed, len(analysis_futures))
+
+        # 4. Per-profile composition + executive summary
+        def finish(state):
+            if not state.get("top_universities"):
+                return {"status": "ok", "error": None, "response": state.get("analysis", ""), "steps": state["steps"]}
+            names = [name for name in state["top_universities"] if shared.get(name)]
+            fit_text = state.get("universities_fit_text")
+            analysis_results = [
+                with_fit_reasoning(shared[name][0], fit_text, state["top_universities"].index(name))
+                for name in names
+            ]
+            prefs = (state["user_iformation"].get("preferences") or {}).get("free_language_preferences", "")
+            exec_summary, synthesis_step = _synthesize_recommendations(names, str(prefs))
+            steps = state["steps"] + [shared[name][1] for name in names] + ([synthesis_step] if synthesis_step else [])
+            return {
+                "status": "ok",
+                "error": None,
+                "response": _format_analysis_as_string(analysis_results, exec_summary),
+                "steps": steps,
+            }
+
+        finish_futures = {submit(executor, finish, state): i for i, state in enumerate(states) if state}
+        for completed, future in enumerate(finish_futures, 1):
+            i = finish_futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = _error_result(e)
+            report("synthesize", completed, len(finish_futures))
+
+    return results
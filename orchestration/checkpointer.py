@@ -0,0 +1,182 @@
+"""
+LangGraph checkpointer backed by the shared state (utils/shared_state.py), so a conversation started on
+one worker process can continue on any other.
+
+Each conversation (thread_id) is one JSON document holding its most recent checkpoints and their channel
+blobs. put() loads the document, runs the InMemorySaver logic on it and writes it back; concurrent requests
+for the same conversation on different processes are last-writer-wins, like concurrent requests on one
+process with the in-memory saver.
+
+Pending writes are stored apart from the document, one key per (thread_id, checkpoint_id, task_id), so a
+task's put_writes neither rewrites the document nor races other tasks. A per-checkpoint counter numbers
+the tasks that wrote, and reads merge their writes back in.
+"""
+import threading
+import zlib
+
+from langgraph.checkpoint.base import WRITES_IDX_MAP, get_checkpoint_id
+from langgraph.checkpoint.memory import InMemorySaver
+
+from utils.config import CHECKPOINT_HISTORY, SESSION_TTL_SECONDS
+from utils.shared_state import decode_bytes, encode_bytes, get_shared_state
+
+
+def _typed_to_json(typed):
+    kind, data = typed
+    return [kind, encode_bytes(data)]
+
+
+def _typed_from_json(value):
+    return value[0], decode_bytes(value[1])
+
+
+class SharedStateSaver(InMemorySaver):
+    """InMemorySaver whose per-conversation state round-trips through a shared-state backend."""
+
+    _STRIPES = 64
+
+    def __init__(self, backend=None, ttl=SESSION_TTL_SECONDS, history=CHECKPOINT_HISTORY):
+        super().__init__()
+        self.backend = backend or get_shared_state()
+        self.ttl = ttl
+        self.history = max(1, history)
+        # The local dicts only ever hold the conversations being worked on; one lock per stripe of thread IDs
+        self._locks = [threading.RLock() for _ in range(self._STRIPES)]
+
+    def _lock_for(self, thread_id):
+        return self._locks[zlib.crc32(str(thread_id).encode("utf-8")) % self._STRIPES]
+
+    @staticmethod
+    def _key(thread_id):
+        return f"checkpoint:{thread_id}"
+
+    @staticmethod
+    def _writes_key(thread_id, checkpoint_id, part=None):
+        """Task counter of a checkpoint, or with `part` one of its slots ("slot:<n>") or task writes ("task:<id>")."""
+        key = f"checkpoint-writes:{thread_id}:{checkpoint_id}"
+        return f"{key}:{part}" if part else key
+
+    def _task_ids(self, thread_id, checkpoint_id):
+        count = int(self.backend.get(self._writes_key(thread_id, checkpoint_id)) or 0)
+        slots = (self.backend.get(self._writes_key(thread_id, checkpoint_id, f"slot:{n}")) for n in range(1, count + 1))
+        return list(dict.fromkeys(slot.decode("utf-8") for slot in slots if slot))
+
+    def _load_writes(self, thread_id, checkpoint_ids):
+        for checkpoint_id in checkpoint_ids:
+            for task_id in self._task_ids(thread_id, checkpoint_id):
+                entries = self.backend.get_json(self._writes_key(thread_id, checkpoint_id, f"task:{task_id}")) or []
+                for ns, idx, channel, value, task_path in entries:
+                    self.writes[(thread_id, ns, checkpoint_id)][(task_id, idx)] = (task_id, channel, _typed_from_json(value), task_path)
+
+    def _delete_writes(self, thread_id, checkpoint_ids):
+        for checkpoint_id in checkpoint_ids:
+            count = int(self.backend.get(self._writes_key(thread_id, checkpoint_id)) or 0)
+            for n in range(1, count + 1):
+                slot_key = self._writes_key(thread_id, checkpoint_id, f"slot:{n}")
+                task_id = self.backend.get(slot_key)
+                if task_id:
+                    self.backend.delete(self._writes_key(thread_id, checkpoint_id, f"task:{task_id.decode('utf-8')}"))
+                self.backend.delete(slot_key)
+            self.backend.delete(self._writes_key(thread_id, checkpoint_id))
+
+    def _forget(self, thread_id):
+        InMemorySaver.delete_thread(self, thread_id)
+
+    def _load(self, thread_id):
+        """Load the checkpoints and blobs of a conversation (pending writes are loaded separately)."""
+        self._forget(thread_id)
+        doc = self.backend.get_json(self._key(thread_id))
+        if not doc:
+            return
+        for ns, checkpoints in doc["storage"].items():
+            for checkpoint_id, (checkpoint, metadata, parent) in checkpoints.items():
+                self.storage[thread_id][ns][checkpoint_id] = (_typed_from_json(checkpoint), _typed_from_json(metadata), parent)
+        for ns, channel, version, value in doc["blobs"]:
+            self.blobs[(thread_id, ns, channel, version)] = _typed_from_json(value)
+
+    def _save(self, thread_id):
+        """Write the conversation back, keeping the last `history` checkpoints per namespace and what they reference."""
+        storage, blobs = {}, []
+        referenced, dropped = set(), []
+        for ns, checkpoints in self.storage.get(thread_id, {}).items():
+            kept = sorted(checkpoints)[-self.history:]
+            dropped += sorted(checkpoints)[:-self.history]
+            storage[ns] = {}
+            for checkpoint_id in kept:
+                checkpoint, metadata, parent = checkpoints[checkpoint_id]
+                storage[ns][checkpoint_id] = [_typed_to_json(checkpoint), _typed_to_json(metadata), parent]
+                for channel, version in self.serde.loads_typed(checkpoint)["channel_versions"].items():
+                    referenced.add((ns, channel, version))
+        for (tid, ns, channel, version), value in self.blobs.items():
+            if tid == thread_id and (ns, channel, version) in referenced:
+                blobs.append([ns, channel, version, _typed_to_json(value)])
+        self.backend.set_json(self._key(thread_id), {"storage": storage, "blobs": blobs}, ttl=self.ttl)
+        self._delete_writes(thread_id, dropped)
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock_for(thread_id):
+            self._load(thread_id)
+            try:
+                checkpoints = self.storage[thread_id][config["configurable"].get("checkpoint_ns", "")]
+                checkpoint_id = get_checkpoint_id(config) or (max(checkpoints) if checkpoints else None)
+                if checkpoint_id:
+                    self._load_writes(thread_id, [checkpoint_id])
+                return super().get_tuple(config)
+            finally:
+                self._forget(thread_id)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        if not config:
+            return iter(())  # listing every conversation would mean scanning the backend
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock_for(thread_id):
+            self._load(thread_id)
+            try:
+                self._load_writes(thread_id, {cid for checkpoints in self.storage[thread_id].values() for cid in checkpoints})
+                return iter(list(super().list(config, filter=filter, before=before, limit=limit)))
+            finally:
+                self._forget(thread_id)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock_for(thread_id):
+            self._load(thread_id)
+            try:
+                result = super().put(config, checkpoint, metadata, new_versions)
+                self._save(thread_id)
+                return result
+            finally:
+                self._forget(thread_id)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        """Merge this task's writes into its own key, with the InMemorySaver rules (regular writes are kept once)."""
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        task_key = self._writes_key(thread_id, checkpoint_id, f"task:{task_id}")
+        with self._lock_for(thread_id):
+            existing = self.backend.get_json(task_key)
+            entries = {(entry[0], entry[1]): entry for entry in existing or []}
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                if idx >= 0 and (ns, idx) in entries:
+                    continue
+                entries[(ns, idx)] = [ns, idx, channel, _typed_to_json(self.serde.dumps_typed(value)), task_path]
+            self.backend.set_json(task_key, list(entries.values()), ttl=self.ttl)
+            if existing is None:
+                slot = self.backend.incr(self._writes_key(thread_id, checkpoint_id), ttl=self.ttl)
+                self.backend.set(self._writes_key(thread_id, checkpoint_id, f"slot:{slot}"), task_id, ttl=self.ttl)
+
+    def delete_thread(self, thread_id):
+        with self._lock_for(thread_id):
+            self._forget(thread_id)
+            doc = self.backend.get_json(self._key(thread_id)) or {"storage": {}}
+            self._delete_writes(thread_id, {cid for checkpoints in doc["storage"].values() for cid in checkpoints})
+            self.backend.delete(self._key(thread_id))
+
+
+def make_checkpointer():
+    """SharedStateSaver when the shared state is visible to other processes, else the plain in-memory saver."""
+    backend = get_shared_state()
+    return SharedStateSaver(backend) if backend.shared else InMemorySaver()
@@ -0,0 +1,128 @@
+"""
+Token-budgeted context packing for extraction prompts.
+Retrieved chunks overlap (CHUNK_OVERLAP) and vary in size, so the packer removes repeated spans using each
+chunk's start_index within its header section, keeps the most relevant chunks that fit the token budget,
+and lays them out grouped by section in document order.
+"""
+import threading
+from typing import List, Optional
+
+from utils.config import ANALYZER_CONTEXT_TOKEN_BUDGET
+
+MIN_PIECE_TOKENS = 32  # Partial chunks shorter than this are not worth including
+
+_encoder = {"value": None, "loaded": False}
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    with _encoder_lock:
+        if not _encoder["loaded"]:
+            try:
+                import tiktoken
+                _encoder["value"] = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _encoder["value"] = None  # tiktoken missing or its encoding file cannot be downloaded
+            _encoder["loaded"] = True
+        return _encoder["value"]
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken (cl100k_base), or a chars/4 estimate when it is unavailable."""
+    encoder = _get_encoder()
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoder = _get_encoder()
+    if encoder is None:
+        return text[:max_tokens * 4]
+    return encoder.decode(encoder.encode(text)[:max_tokens])
+
+
+def _section_key(chunk: dict):
+    """(source file, header path) — start_index is relative to this section."""
+    if chunk.get("file_name"):
+        source = (chunk.get("country"), chunk.get("university"), chunk["file_name"])
+    else:
+        source = str(chunk.get("id") or "").rsplit("_", 1)[0]  # legacy "country_university_file_index" IDs
+    headers = chunk.get("headers") if isinstance(chunk.get("headers"), dict) else {}
+    path = tuple(v for k, v in sorted(headers.items()) if k != "start_index")
+    return source, path
+
+
+def _novel_span(start: int, text: str, taken: list):
+    """Trim the head/tail of [start, start+len(text)) already covered by taken spans. Returns (start, text) or None."""
+    span_start, span_end = start, start + len(text)
+    for taken_start, taken_end in taken:
+        if taken_start <= span_start and span_end <= taken_end:
+            return None
+        if taken_start <= span_start < taken_end:
+            span_start = taken_end
+        elif taken_start < span_end <= taken_end:
+            span_end = taken_start
+    if span_end <= span_start:
+        return None
+    return span_start, text[span_start - start:span_end - start]
+
+
+def pack_context(chunks: List[dict], token_budget: Optional[int] = None) -> str:
+    """
+    Pack retrieved chunks into a prompt context of at most `token_budget` tokens.
+
+    Args:
+        chunks (list): {"id", "text", "headers", "country", "university", "file_name"} dicts ordered by relevance (best first)
+        token_budget (int): defaults to ANALYZER_CONTEXT_TOKEN_BUDGET
+
+    Returns:
+        str: context text, grouped by header section and ordered by position within each section
+    """
+    budget = ANALYZER_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    used = 0
+    sections = {}  # section key -> list of (start, text); insertion order = section relevance
+    taken_spans = {}
+    seen_texts = set()
+
+    for chunk in chunks:
+        text = chunk.get("text") or ""
+        if not text.strip() or text in seen_texts:
+            continue
+        key = _section_key(chunk)
+        headers = chunk.get("headers") if isinstance(chunk.get("headers"), dict) else {}
+        start = headers.get("start_index")
+        if isinstance(start, int):
+            novel = _novel_span(start, text, taken_spans.get(key, []))
+            if novel is None:
+                continue
+            start, text = novel
+        else:
+            start = None
+
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            remaining = budget - used
+            if remaining < MIN_PIECE_TOKENS:
+                break
+            text = truncate_to_tokens(text, remaining)
+            tokens = count_tokens(text)
+        seen_texts.add(chunk.get("text") or "")
+        if start is not None:
+            taken_spans.setdefault(key, []).append((start, start + len(text)))
+        sections.setdefault(key, []).append((start, text))
+        used += tokens
+        if used >= budget:
+            break
+
+    parts = []
+    for pieces in sections.values():
+        pieces.sort(key=lambda piece: float("inf") if piece[0] is None else piece[0])
+        previous_end = None
+        for start, text in pieces:
+            if start is not None and start == previous_end:
+                parts[-1] += text  # Contiguous spans of the same section read as one passage
+            else:
+                parts.append(text)
+            previous_end = start + len(text) if start is not None else None
+    return "\n".join(parts)
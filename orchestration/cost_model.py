@@ -0,0 +1,200 @@
+"""
+Deterministic cost model for an exchange semester, replacing the LLM's cost guesses.
+
+The base is the university's region in FINANCIAL_REFERENCE_TABLE (semester pure cost, $0 tuition), scaled
+by a country factor (countries above or below their region's average) and a city factor (expensive or cheap
+cities within their country). Amounts are converted to EUR at the USD -> EUR rate from
+utils.web_enrichment.fetch_exchange_rate_usd_to_eur, cached for EXCHANGE_RATE_TTL_SECONDS in the shared state.
+
+The ranker's financial_fit and the Analyzer's monthly housing/living costs come from here: same inputs,
+same numbers, no LLM call.
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+from data_pipeline.context_data import cost_range, name_key, reference_index
+from utils import web_enrichment
+from utils.config import EXCHANGE_RATE_TTL_SECONDS, USD_TO_EUR_FALLBACK
+from utils.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+SEMESTER_MONTHS = 5
+
+# Share of the monthly cost that goes to rent; subsidized dorms make it smaller in East Asia
+DEFAULT_HOUSING_SHARE = 0.45
+REGION_HOUSING_SHARE = {
+    "USA / Australia": 0.5,
+    "Canada / UK": 0.5,
+    "Northern Europe": 0.5,
+    "East Asia (Japan / Korea)": 0.3,
+    "China / Taiwan": 0.25,
+}
+
+# Multipliers on the region's range for countries that sit above or below their region's average
+COUNTRY_FACTORS = {
+    "Switzerland": 1.35, "Norway": 1.15, "Iceland": 1.15, "Luxembourg": 1.1, "Ireland": 1.1, "Denmark": 1.05,
+    "Netherlands": 1.0, "Sweden": 0.95, "Finland": 0.9,
+    "United Kingdom": 1.1, "Canada": 0.95, "Australia": 0.9,
+    "France": 1.05, "Belgium": 1.0, "Austria": 1.0, "Germany": 0.95, "Italy": 0.95, "Spain": 0.9,
+    "Cyprus": 0.85, "Portugal": 0.85, "Greece": 0.8, "Malta": 0.9,
+    "Chile": 1.1, "Mexico": 1.0, "Brazil": 0.95, "Argentina": 0.85, "Colombia": 0.85,
+    "Japan": 1.05, "South Korea": 0.95, "Taiwan": 1.1, "China": 1.0,
+    "Estonia": 1.1, "Slovenia": 1.1, "Czech Republic": 1.05, "Poland": 0.95, "Hungary": 0.95, "Romania": 0.85, "Bulgaria": 0.8,
+}
+COUNTRY_FACTORS.update({"Czechia": COUNTRY_FACTORS["Czech Republic"], "UK": COUNTRY_FACTORS["United Kingdom"], "Korea": COUNTRY_FACTORS["South Korea"]})
+
+# Multipliers on top of the country factor for cities far from their country's average
+CITY_FACTORS = {
+    "Zurich": 1.15, "Geneva": 1.15, "Lausanne": 1.05, "London": 1.3, "Dublin": 1.15, "Amsterdam": 1.15, "Copenhagen": 1.1,
+    "Paris": 1.25, "Munich": 1.2, "Berlin": 1.05, "Aachen": 0.95, "Karlsruhe": 0.95, "Milan": 1.15, "Turin": 0.95,
+    "Madrid": 1.05, "Barcelona": 1.1, "Nicosia": 1.0, "Prague": 1.1, "Iasi": 0.9,
+    "Toronto": 1.1, "Vancouver": 1.15, "Montreal": 0.95, "Innsbruck": 1.05,
+    "New York": 1.25, "Boston": 1.2, "Ithaca": 0.95, "Pittsburgh": 0.9, "Eugene": 0.9, "Storrs": 0.9,
+    "Tokyo": 1.15, "Seoul": 1.1, "Daejeon": 0.9, "Pohang": 0.85, "Beijing": 1.05, "Hefei": 0.85, "Taipei": 1.05,
+    "Buenos Aires": 1.0, "Monterrey": 1.0,
+}
+
+UNIVERSITY_CITIES = {
+    "Technical University of Munich": "Munich", "TUM": "Munich", "TU Berlin": "Berlin",
+    "RWTH Aachen": "Aachen", "KIT": "Karlsruhe",
+    "Politecnico di Milano": "Milan", "Politecnico di Torino": "Turin",
+    "Czech Technical University in Prague": "Prague", "CTU (Prague)": "Prague",
+    "Technical University of Denmark": "Copenhagen", "DTU": "Copenhagen",
+    "EPFL": "Lausanne", "ETH Zurich": "Zurich",
+    "HEC": "Paris", "Ecole Polytechnique": "Paris",
+    "Universidad Francisco de Vitoria": "Madrid", "University of Cyprus": "Nicosia",
+    "Alexandru Ioan Cuza University of Iasi": "Iasi", "MCI Management Center Innsbruck": "Innsbruck",
+    "McGill University": "Montreal", "Concordia University": "Montreal", "Polytechnique Montréal": "Montreal",
+    "University of Toronto": "Toronto", "U of Toronto": "Toronto", "UBC": "Vancouver", "University of British Columbia": "Vancouver",
+    "Cornell University": "Ithaca", "Carnegie Mellon": "Pittsburgh", "University of Oregon": "Eugene", "UConn": "Storrs",
+    "KAIST": "Daejeon", "POSTECH": "Pohang", "SKKU": "Seoul", "USTC": "Hefei",
+    "Tsinghua University": "Beijing", "Tsinghua": "Beijing", "Peking": "Beijing",
+    "Universidad de Palermo": "Buenos Aires", "Instituto Tecnológico de Buenos Aires": "Buenos Aires",
+    "ITESM Monterrey": "Monterrey",
+}
+
+_COUNTRY_FACTORS = {name_key(country): factor for country, factor in COUNTRY_FACTORS.items()}
+_CITY_FACTORS = {name_key(city): factor for city, factor in CITY_FACTORS.items()}
+_UNIVERSITY_CITIES = {name_key(university): city for university, city in UNIVERSITY_CITIES.items()}
+
+FX_KEY = "fx:usd_eur"
+FX_RETRY_SECONDS = 300  # after a failed fetch, the last known (or fallback) rate is used this long before retrying
+
+_fx = {"rate": None, "source": None, "expires_at": 0.0}
+_fx_lock = threading.Lock()
+
+
+def _reference_bounds():
+    costs = reference_index()["costs"].values()
+    return min(row.semester_low_usd for row in costs), max(row.semester_high_usd for row in costs)
+
+
+def financial_score(semester_usd: float) -> int:
+    """0-100, cheapest region of the reference table = 100, most expensive = 0 (clamped outside that span)."""
+    low, high = _reference_bounds()
+    return max(0, min(100, round(100 * (high - semester_usd) / (high - low))))
+
+
+def city_for_university(university: str) -> Optional[str]:
+    return _UNIVERSITY_CITIES.get(name_key(university))
+
+
+def _fetch_rate():
+    """(rate, source, ttl): the shared cached rate, else a live fetch, else the last known or fallback rate."""
+    try:
+        cached = get_shared_state().get_json(FX_KEY)
+    except Exception:
+        cached = None
+    if cached and cached.get("rate"):
+        return float(cached["rate"]), "cached", max(1.0, cached["expires_at"] - time.time())
+    rate = web_enrichment.fetch_exchange_rate_usd_to_eur()
+    if rate and 0.3 < float(rate) < 3.0:
+        try:
+            get_shared_state().set_json(FX_KEY, {"rate": float(rate), "expires_at": time.time() + EXCHANGE_RATE_TTL_SECONDS}, ttl=EXCHANGE_RATE_TTL_SECONDS)
+        except Exception:
+            pass
+        return float(rate), "live", EXCHANGE_RATE_TTL_SECONDS
+    logger.info("USD->EUR rate unavailable; using %s", "the last known rate" if _fx["rate"] else "USD_TO_EUR_FALLBACK")
+    return (_fx["rate"], "stale", FX_RETRY_SECONDS) if _fx["rate"] else (USD_TO_EUR_FALLBACK, "fallback", FX_RETRY_SECONDS)
+
+
+def usd_to_eur_rate():
+    """
+    USD -> EUR rate and where it came from ("live", "cached", "stale" or "fallback").
+    One caller refreshes an expired rate; concurrent callers keep using the previous one meanwhile.
+    """
+    if _fx["rate"] is not None and time.time() < _fx["expires_at"]:
+        return _fx["rate"], _fx["source"]
+    if not _fx_lock.acquire(blocking=False):
+        return (_fx["rate"], _fx["source"]) if _fx["rate"] is not None else (USD_TO_EUR_FALLBACK, "fallback")
+    try:
+        rate, source, ttl = _fetch_rate()
+        _fx.update(rate=rate, source=source, expires_at=time.time() + ttl)
+        return rate, source
+    finally:
+        _fx_lock.release()
+
+
+def estimate_costs(university: str, country: str, city: str = None, usd_to_eur: float = None) -> Optional[dict]:
+    """
+    Semester and monthly cost estimate for one university.
+    Args:
+        university (str): University name (catalog or short name), used to find its city.
+        country (str): Country, which selects the reference region.
+        city (str, optional): Overrides the known city of the university.
+        usd_to_eur (float, optional): Overrides the cached exchange rate.
+    Returns:
+        dict or None: {"region", "city", "factor", "semester_usd": {"low", "mid", "high"}, "semester_eur",
+            "monthly_living_eur", "monthly_housing_eur", "monthly_living_usd", "monthly_housing_usd",
+            "financial_score", "usd_to_eur", "rate_source"}; None when the country has no reference region.
+    """
+    reference = cost_range(country)
+    if reference is None:
+        return None
+    city = city or city_for_university(university)
+    factor = _COUNTRY_FACTORS.get(name_key(country), 1.0) * (_CITY_FACTORS.get(name_key(city), 1.0) if city else 1.0)
+    if usd_to_eur is None:
+        usd_to_eur, rate_source = usd_to_eur_rate()
+    else:
+        rate_source = "given"
+    low, mid, high = (round(amount * factor, -2) for amount in (reference.semester_low_usd, reference.semester_mid_usd, reference.semester_high_usd))
+    monthly_usd = mid / SEMESTER_MONTHS
+    housing_usd = monthly_usd * REGION_HOUSING_SHARE.get(reference.region, DEFAULT_HOUSING_SHARE)
+    return {
+        "region": reference.region,
+        "city": city,
+        "factor": round(factor, 3),
+        "semester_usd": {"low": int(low), "mid": int(mid), "high": int(high)},
+        "semester_eur": int(round(mid * usd_to_eur, -2)),
+        "monthly_living_usd": int(round(monthly_usd, -1)),
+        "monthly_housing_usd": int(round(housing_usd, -1)),
+        "monthly_living_eur": int(round(monthly_usd * usd_to_eur, -1)),
+        "monthly_housing_eur": int(round(housing_usd * usd_to_eur, -1)),
+        "financial_score": financial_score(mid),
+        "usd_to_eur": round(usd_to_eur, 4),
+        "rate_source": rate_source,
+    }
+
+
+def with_cost_estimates(logistics: dict, estimate: Optional[dict]) -> dict:
+    """
+    Copy of an Analyzer extraction whose missing monthly housing/living costs are filled from `estimate`
+    (in EUR); figures stated in the factsheets are kept. Marks the filled fields in "cost_estimates_from".
+    """
+    logistics = dict(logistics or {})
+    if not estimate:
+        return logistics
+    housing = dict(logistics.get("housing_and_logistics") or {})
+    filled = []
+    for field, value in (("estimated_housing_cost_per_month", estimate["monthly_housing_eur"]),
+                         ("estimated_living_cost_per_month", estimate["monthly_living_eur"])):
+        if housing.get(field) is None:
+            housing[field] = value
+            filled.append(field)
+    if filled:
+        housing["cost_estimates_from"] = {"source": "cost_model", "currency": "EUR", "fields": filled}
+    logistics["housing_and_logistics"] = housing
+    return logistics
@@ -0,0 +1,107 @@
+"""
+Whole-response cache for /api/execute: a full Filter -> Rank -> Analyze run depends only on the structured
+profile, top_k and the catalog data, so repeat requests for the same profile are answered from the shared
+state without touching any upstream. Callers store a run only when it used the request's own profile and
+top_k (Supervisor.run reports what it used).
+
+Keys combine a canonical hash of the normalized profile, top_k and the catalog data version
+(utils/data_version.py). Ingestion that changes any dataset moves the version, which orphans every older
+entry at once; entries also expire after RESPONSE_CACHE_TTL_SECONDS.
+Free-text prompts additionally cache their extracted profile, so a repeat does not call the LLM either.
+"""
+import hashlib
+import json
+import logging
+import re
+from typing import Optional
+
+from utils import data_version
+from utils.config import RESPONSE_CACHE_TTL_SECONDS
+from utils.instrumentation import record_cache
+from utils.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical(value):
+    """Drop empty fields, collapse whitespace in strings and sort keys, so equivalent profiles compare equal."""
+    if isinstance(value, dict):
+        out = {str(k): _canonical(v) for k, v in value.items()}
+        return {k: v for k, v in sorted(out.items()) if v not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    return value
+
+
+def profile_hash(profile: dict, top_k: int) -> str:
+    """Canonical hash of a normalized profile (from extract_profile_from_text) and top_k."""
+    text = json.dumps({"profile": _canonical(profile), "top_k": top_k}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _response_key(profile: dict, top_k: int, version: Optional[int]) -> str:
+    version = data_version.current_version() if version is None else version
+    return f"response:v{version}:{profile_hash(profile, top_k)}"
+
+
+def get_response(profile: dict, top_k: int, version: int = None) -> Optional[dict]:
+    """
+    Cached {"response", "steps"} for this profile and top_k at data `version` (default: the current one), or None.
+    A caller that stores the run afterwards should read the version once before the run and pass it to both calls.
+    """
+    if RESPONSE_CACHE_TTL_SECONDS <= 0:
+        return None
+    try:
+        cached = get_shared_state().get_json(_response_key(profile, top_k, version))
+    except Exception:
+        cached = None  # an unreachable cache is a miss
+    record_cache("response", hit=cached is not None)
+    return cached
+
+
+def cacheable(steps: list) -> bool:
+    """
+    Only full pipeline runs with no degraded stage are stored: follow-up requests that the router sends
+    straight to rank/analyze depend on the conversation, not just the profile.
+    """
+    modules = [step.get("module") for step in steps or []]
+    return "Filter" in modules and not any(step.get("degraded") for step in steps)
+
+
+def put_response(profile: dict, top_k: int, response, steps: list, version: int = None):
+    """Store a run under data `version`: the one read before the run started, so a re-ingest during it orphans it."""
+    if RESPONSE_CACHE_TTL_SECONDS <= 0 or not cacheable(steps):
+        return
+    try:
+        get_shared_state().set_json(
+            _response_key(profile, top_k, version), {"response": response, "steps": steps}, ttl=RESPONSE_CACHE_TTL_SECONDS
+        )
+    except Exception:
+        logger.warning("Could not store a cached response", exc_info=True)
+
+
+def _profile_key(prompt: str) -> str:
+    return "profile:" + hashlib.sha256(prompt.strip().encode("utf-8")).hexdigest()
+
+
+def get_profile(prompt: str) -> Optional[dict]:
+    """Profile previously extracted from exactly this prompt, or None."""
+    if RESPONSE_CACHE_TTL_SECONDS <= 0:
+        return None
+    try:
+        cached = get_shared_state().get_json(_profile_key(prompt))
+    except Exception:
+        cached = None
+    record_cache("profile", hit=cached is not None)
+    return cached
+
+
+def put_profile(prompt: str, profile: dict):
+    if RESPONSE_CACHE_TTL_SECONDS <= 0 or not profile:
+        return
+    try:
+        get_shared_state().set_json(_profile_key(prompt), profile, ttl=RESPONSE_CACHE_TTL_SECONDS)
+    except Exception:
+        logger.warning("Could not store an extracted profile", exc_info=True)
@@ -0,0 +1,163 @@
+"""
+Local workflow router for follow-up requests.
+Decides between 'filter', 'rank' and 'analyze' without an LLM round trip:
+keyword rules first, then a nearest-centroid classifier over hashed n-gram
+embeddings of labeled example phrases. Returns no label when unsure so the
+caller can fall back to the LLM router.
+"""
+import json
+import math
+import re
+import zlib
+from typing import Optional, Tuple
+
+from utils.config import ROUTER_CONFIDENCE_THRESHOLD
+
+ROUTER_LABELS = ("filter", "rank", "analyze")
+PROFILE_KEYS = ("academic_profile", "language_profile", "preferences", "availability")
+EMBEDDING_DIM = 512
+
+# Each rule votes for one label. A single label voted -> confident decision.
+KEYWORD_RULES = {
+    "filter": re.compile(
+        r"\b(gpa|grades?|average|major|msc|master'?s?|bachelor'?s?|semesters? completed|toefl|ielts|cefr|"
+        r"speak|fluent|erasmus|availability|available (from|in|between)|start(ing)? in|"
+        r"january|february|march|april|june|july|august|september|october|november|december|"  # not "may" (modal verb)
+        r"only english|english only|study level)\b",
+        re.IGNORECASE,
+    ),
+    "rank": re.compile(
+        r"\b(re-?rank|rank(ing)?|prioriti[sz]e|prefer(ence)?s?|instead|care more|care less|"
+        r"party|nightlife|social|vibe|weather|warm(er)?|sunny|cheap(er)?|budget|afford|nature|hik(e|es|ing)|"
+        r"sea|beach|mountains?|quiet|relaxed|big city|culture|art|jewish|kosher|chabad|synagogue|antisemitism|prestig(e|ious)|ranking)\b",
+        re.IGNORECASE,
+    ),
+    "analyze": re.compile(
+        r"\b(tell me more|more (details|info(rmation)?)|details? (on|about)|explain|visas?|housing|"
+        r"accommodation|dorms?|insurance|ects|credits|buddy|orientation|living costs?|summar(y|ize)|"
+        r"what about (the|these|them))\b",
+        re.IGNORECASE,
+    ),
+}
+
+EXAMPLE_PHRASES = {
+    "filter": [
+        "my gpa is actually 78",
+        "I am a master's student",
+        "I can only go in the spring semester",
+        "I speak spanish and french",
+        "I only have an IELTS B2",
+        "I am a mechanical engineering major",
+        "I have completed 4 semesters",
+        "only erasmus universities please",
+        "I am available from february to june",
+        "change my profile, I study medicine",
+    ],
+    "rank": [
+        "I care more about the party scene",
+        "actually prefer somewhere warmer",
+        "cheaper options please",
+        "rank them by academic prestige",
+        "I want a strong jewish community",
+        "nature and hiking matter more to me",
+        "give me more social universities",
+        "focus on nightlife and culture",
+        "something with a better campus vibe",
+        "somewhere close to the beach",
+        "prioritize safety and kosher food",
+    ],
+    "analyze": [
+        "tell me more about the first one",
+        "what are the visa requirements",
+        "how does housing work there",
+        "give me more details on these universities",
+        "what is the minimum ects",
+        "is health insurance mandatory",
+        "explain the living costs",
+        "is there a buddy program",
+        "summarize the recommendations again",
+        "what about accommodation and orientation",
+    ],
+}
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9' ]+", " ", (text or "").lower()).strip()
+
+
+def embed_text(text: str) -> list:
+    """Hashed bag of words + character trigrams, L2-normalized."""
+    vec = [0.0] * EMBEDDING_DIM
+    for word in _normalize(text).split():
+        vec[zlib.crc32(word.encode()) % EMBEDDING_DIM] += 1.0
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            vec[zlib.crc32(padded[i:i + 3].encode()) % EMBEDDING_DIM] += 0.5
+    norm = math.sqrt(sum(v * v for v in vec))
+    return [v / norm for v in vec] if norm else vec
+
+
+def _build_centroids() -> dict:
+    centroids = {}
+    for label, phrases in EXAMPLE_PHRASES.items():
+        acc = [0.0] * EMBEDDING_DIM
+        for phrase in phrases:
+            for i, v in enumerate(embed_text(phrase)):
+                acc[i] += v
+        norm = math.sqrt(sum(v * v for v in acc))
+        centroids[label] = [v / norm for v in acc] if norm else acc
+    return centroids
+
+
+_CENTROIDS = _build_centroids()
+
+
+def classify_by_centroid(user_text: str) -> Tuple[str, float]:
+    """
+    Nearest-centroid classification.
+    Returns (label, confidence) where confidence is the cosine margin between the best and second-best label.
+    """
+    vec = embed_text(user_text)
+    sims = sorted(
+        ((sum(a * b for a, b in zip(vec, centroid)), label) for label, centroid in _CENTROIDS.items()),
+        reverse=True,
+    )
+    best_sim, best_label = sims[0]
+    second_sim = sims[1][0] if len(sims) > 1 else 0.0
+    return best_label, best_sim - second_sim
+
+
+def is_structured_profile(user_text: str) -> bool:
+    """True for a JSON profile prompt (see /api/agent_info), which replaces the profile and so needs a new filter."""
+    stripped = (user_text or "").strip()
+    if not (stripped.startswith("{") and stripped.endswith("}")):
+        return False
+    try:
+        parsed = json.loads(stripped)
+    except ValueError:
+        return False
+    return isinstance(parsed, dict) and any(key in parsed for key in PROFILE_KEYS)
+
+
+def route_locally(user_text: str, threshold: float = ROUTER_CONFIDENCE_THRESHOLD) -> Tuple[Optional[str], float, str]:
+    """
+    Route a follow-up request without calling the LLM.
+
+    Returns:
+        tuple: (label or None, confidence, method) where method is 'profile', 'rules', 'centroid' or 'none'.
+        A None label means the local router is not confident enough.
+    """
+    if is_structured_profile(user_text):
+        return "filter", 1.0, "profile"
+    if not _normalize(user_text):
+        return None, 0.0, "none"
+    voted = [label for label, pattern in KEYWORD_RULES.items() if pattern.search(user_text)]
+    if len(voted) == 1:
+        return voted[0], 1.0, "rules"
+    label, confidence = classify_by_centroid(user_text)
+    # When rules disagree, only trust the classifier if it agrees with one of them.
+    if voted and label not in voted:
+        return None, confidence, "none"
+    if confidence >= threshold:
+        return label, confidence, "centroid"
+    return None, confidence, "none"
@@ -1,42 +1,41 @@
-import os
 import json
-from pinecone_db.pinecone_client import query_embedding
-from utils.config import supabase
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pinecone_db.pinecone_client import hybrid_query_many
+from utils import data_version
+from utils.config import (
+    get_supabase, PRECOMPUTED_EXTRACTIONS_TTL_SECONDS, ANALYZER_BUDGET_SECONDS,
+    ANALYZER_RETRIEVAL_SHARE, ANALYZER_WIKIPEDIA_SHARE, ANALYZER_MAX_WORKERS,
+)
 from utils.llmod_client import llmod_chat
 from utils.web_enrichment import fetch_university_wikipedia
+from utils.instrumentation import span, record_cache, inc, submit
+from utils.resilience import deadline_scope, remaining_time
+from utils.shared_state import get_shared_state
+from orchestration.step_payloads import compact_prompt
+from orchestration.context_packer import pack_context
+from orchestration.cost_model import estimate_costs, with_cost_estimates
 
-def analyze_universities(top_universities, universities_fit_text=None, return_steps=False):
-    """
-    Provides a comprehensive analysis for each university by combining:
-    - Structured requirements and metadata from Supabase (universities_requirements table)
-    - RAG-based category analysis from Pinecone
-    - Fit reasoning from the ranking step (if provided)
-
-    Args:
-        top_universities (list[str]): List of university names (strings).
-        universities_fit_text (list[str], optional): List of reasoning strings from supervisor state, aligned with top_universities.
-        return_steps (bool): If True, return (analysis_results, steps) for API step logging.
+# One targeted sub-query per extraction category; each runs against Pinecone and the BM25 index, results are fused
+RAG_SUB_QUERIES = {
+    "academic": "minimum ECTS credits per semester, maximum credits, course requirements and language of instruction",
+    "costs": "evaluation cost, tuition fees, monthly living cost and expenses",
+    "visa": "visa process, residence permit, processing time in months",
+    "insurance": "mandatory health insurance coverage for exchange students",
+    "housing": "student accommodation, dormitory, campus housing guarantee and rent",
+    "integration": "buddy program, orientation week, student associations and city life",
+}
 
-    Returns:
-        list[dict] or tuple: List of analysis dicts; if return_steps, (list, steps).
-    """
-    # catch all category chunks in the vector DB
-    rag_query_keywords = (
-        "evaluation cost, minimum ECTS, course requirements, "
-        "visa process, health insurance, student accommodation, city life"
-    )
-    analysis_results = []
-    steps = []
-
-    system_prompt = """You are an expert data extraction AI for a university exchange program.
+EXTRACTION_SYSTEM_PROMPT = """You are an expert data extraction AI for a university exchange program.
     Your exact job is to read factsheet context and extract specific variables into a strict JSON format.
 
     EXTRACTION RULES:
     1. Strict Schema: You must output ONLY valid JSON matching the exact structure below. Do not add keys.
     2. Missing Data: If a detail is missing from the text, output null (do not output "N/A" or "None").
     3. Type Enforcement: Booleans must be true/false. Integers must be numbers only (e.g., output 300, not "300 euros").
-    4. Cost Estimation: Base your cost estimates on the provided text/tables. If exact figures are missing, you must still provide a brief 
-        estimated total cost based on the table, and also slightly include your own knowledge on the specific city and country the university is in.
+    4. Costs: Only report housing/living costs that the text states (converted to a monthly figure). If the text does not state them, 
+        output null; estimates are computed separately from reference data.
     5. Summaries: Keep the `_summary_notes` fields STRICTLY to 1-2 sentences. Highlight critical edge cases (e.g., "Visa requires 3 months", 
         "Housing is lottery-only", or note the local currency).
 
@@ -64,12 +63,30 @@ def analyze_universities(top_universities, universities_fit_text=None, return_st
         }
     }"""
 
-    for idx, uni_name in enumerate(top_universities):
-        filter_param = {"university": uni_name}
-        retrieved_chunks = query_embedding(rag_query_keywords, filter=filter_param)        
-        context_text = "\n".join(retrieved_chunks) if isinstance(retrieved_chunks, list) else ""
 
-        user_prompt = f"""Extract the exchange data for the following university based on the provided context.
+def retrieve_contexts(uni_names):
+    """
+    Batched hybrid (BM25 + vector) retrieval of the factsheet context for several universities:
+    one Pinecone query per sub-query covers all of them. Each context is packed to the token budget.
+
+    Returns:
+        dict: {university: context_text}
+    """
+    chunks_by_uni = hybrid_query_many(list(RAG_SUB_QUERIES.values()), uni_names)
+    return {uni: pack_context(chunks) for uni, chunks in chunks_by_uni.items()}
+
+def retrieve_context(uni_name):
+    """Hybrid retrieval of the factsheet context for one university."""
+    return retrieve_contexts([uni_name]).get(uni_name, "")
+
+def extract_from_context(uni_name, context_text):
+    """
+    LLM extraction of the logistics_and_experience JSON from retrieved context.
+
+    Returns:
+        tuple: (logistics_and_experience_dict, user_prompt)
+    """
+    user_prompt = f"""Extract the exchange data for the following university based on the provided context.
 
         TARGET UNIVERSITY: {uni_name}
 
@@ -78,37 +95,259 @@ def analyze_universities(top_universities, universities_fit_text=None, return_st
         {context_text}
         ---"""
 
-        extracted_logistics_json = llmod_chat(system_prompt, user_prompt, use_json=True)
-        try:
-            logistics_and_experience_dict = json.loads(extracted_logistics_json)
-        except json.JSONDecodeError:
-            logistics_and_experience_dict = {}
-        if not isinstance(logistics_and_experience_dict, dict):
-            logistics_and_experience_dict = {}
-        if return_steps:
-            steps.append({
-                "module": "Analyzer",
-                "prompt": {"target_university": uni_name, "user_prompt_preview": user_prompt[:300] + "..."},
-                "response": logistics_and_experience_dict
-            })
-       
-        supa_resp = supabase.table("universities_requirements").select("*").eq("name", uni_name).execute() if supabase else None
-        eligibility_and_framework = {}
-        if supa_resp and getattr(supa_resp, "data", None) and len(supa_resp.data) > 0:
-            eligibility_and_framework = supa_resp.data[0]
+    extracted_logistics_json = llmod_chat(EXTRACTION_SYSTEM_PROMPT, user_prompt, use_json=True)
+    try:
+        logistics_and_experience_dict = json.loads(extracted_logistics_json)
+    except json.JSONDecodeError:
+        logistics_and_experience_dict = {}
+    if not isinstance(logistics_and_experience_dict, dict):
+        logistics_and_experience_dict = {}
+    if logistics_and_experience_dict:
+        _remember_extraction(uni_name, logistics_and_experience_dict)
+    return logistics_and_experience_dict, user_prompt
+
+def extract_logistics(uni_name):
+    """
+    RAG retrieval + LLM extraction of the logistics_and_experience JSON for one university.
+    Depends only on the university (not on the user), so results can be shared across profiles.
+
+    Returns:
+        tuple: (logistics_and_experience_dict, user_prompt)
+    """
+    return extract_from_context(uni_name, retrieve_context(uni_name))
+
+# Last successful live extraction per university (in the shared state, so every worker can use it),
+# served (marked stale) when a new one overruns its budget
+def _remember_extraction(uni_name, logistics):
+    try:
+        get_shared_state().set_json("extraction:recent:" + uni_name, logistics)
+    except Exception:
+        pass
+
+def _stale_extraction(uni_name):
+    try:
+        return get_shared_state().get_json("extraction:recent:" + uni_name)
+    except Exception:
+        return None
+
+# Shared pool for budgeted sub-calls, sized in config for ANALYZER_CONCURRENT_RUNS agent runs. A call's upstream
+# timeouts are cut to its budget (deadline_scope), so one that overruns is abandoned by its caller and frees its
+# worker shortly after.
+_budget_executor = ThreadPoolExecutor(max_workers=ANALYZER_MAX_WORKERS, thread_name_prefix="analyzer")
+
+def _start_budgeted(seconds, fn, *args):
+    """
+    Queue fn(*args) on the analyzer pool. Its budget of `seconds` starts when it starts running; waiting for a
+    worker is bounded separately by the same budget (and the request deadline), so a saturated pool degrades the
+    call instead of stretching the stage.
+    """
+    started = {"event": threading.Event(), "at": None}
+
+    def bounded():
+        started["at"] = time.monotonic()
+        started["event"].set()
+        with deadline_scope(seconds):
+            return fn(*args)
+    return submit(_budget_executor, bounded), seconds, started
+
+def _await_budgeted(handle):
+    """Wait for a budgeted call until its budget runs out. Returns (result, None) or (None, reason) on timeout/error."""
+    future, seconds, started = handle
+    remaining = remaining_time()
+    queue_wait = seconds if remaining is None else min(remaining, seconds)
+    if not started["event"].wait(timeout=queue_wait) and future.cancel():
+        return None, f"timeout after {seconds:.1f}s (waiting for a worker)"
+    started_at = started["at"] or time.monotonic()  # cancel() lost the race: it has just started
+    try:
+        return future.result(timeout=max(0.0, started_at + seconds - time.monotonic())), None
+    except FutureTimeout:
+        return None, f"timeout after {seconds:.1f}s"
+    except Exception as e:
+        return None, f"{type(e).__name__}"
+
+def _call_with_budget(seconds, fn, *args):
+    if seconds <= 0:
+        return None, "budget exhausted"
+    return _await_budgeted(_start_budgeted(seconds, fn, *args))
 
+_precomputed = {"loaded_at": 0.0, "version": None, "rows": {}, "retry_at": 0.0}
+_precomputed_lock = threading.Lock()
+PRECOMPUTED_RETRY_SECONDS = 30  # after a failed reload, keep the last snapshot this long before trying again
+
+def get_precomputed_logistics(uni_name):
+    """
+    Look up the offline extraction for a university (see data_pipeline/analyzer_extractions.py).
+    The analyzer_extractions table is loaded into memory and reloaded when the data version moves,
+    or at the latest every PRECOMPUTED_EXTRACTIONS_TTL_SECONDS. A failed reload keeps the last good
+    snapshot (and its version) and is retried after PRECOMPUTED_RETRY_SECONDS.
+
+    Returns:
+        dict or None: {"logistics_and_experience": dict, "chunks_hash": str}, or None when missing/unavailable.
+    """
+    version = data_version.current_version()
+    with _precomputed_lock:
+        now = time.time()
+        stale = version != _precomputed["version"] or now - _precomputed["loaded_at"] > PRECOMPUTED_EXTRACTIONS_TTL_SECONDS
+        if stale and now >= _precomputed["retry_at"]:
+            try:
+                supabase = get_supabase()
+                if not supabase:
+                    raise RuntimeError("Supabase client unavailable")
+                resp = supabase.table("analyzer_extractions").select("university,chunks_hash,logistics_and_experience").execute()
+                rows = {r["university"]: r for r in (getattr(resp, "data", None) or []) if r.get("university")}
+                _precomputed.update(loaded_at=now, version=version, rows=rows, retry_at=0.0)
+            except Exception:
+                _precomputed["retry_at"] = now + PRECOMPUTED_RETRY_SECONDS
+        row = _precomputed["rows"].get(uni_name)
+    if not row or not isinstance(row.get("logistics_and_experience"), dict):
+        return None
+    return row
+
+def prefetch_contexts(uni_names, budget_seconds=None):
+    """
+    Start a single batched retrieval for the universities without a precomputed extraction.
+    Pass the returned handle to analyze_university(context_call=...); None when nothing needs retrieval.
+    """
+    names = [name for name in dict.fromkeys(uni_names) if get_precomputed_logistics(name) is None]
+    if not names:
+        return None
+    budget = budget_seconds if budget_seconds is not None else ANALYZER_BUDGET_SECONDS
+    remaining = remaining_time()
+    if remaining is not None:
+        budget = min(budget, remaining)
+    return _start_budgeted(budget * ANALYZER_RETRIEVAL_SHARE, retrieve_contexts, names)
+
+def analyze_university(uni_name, eligibility_and_framework=None, budget_seconds=None, context_call=None):
+    """
+    User-independent part of the analysis for one university: factsheet extraction,
+    universities_requirements row and Wikipedia summary.
+
+    Runs under a time budget (ANALYZER_BUDGET_SECONDS, capped by the request deadline). Each sub-call gets
+    a share of it; an overrun degrades the result (stale/empty extraction, no Wikipedia summary) instead
+    of blocking, and the step's "degraded" field says what was dropped.
+
+    Args:
+        uni_name (str): University name.
+        eligibility_and_framework (dict, optional): Prefetched universities_requirements row (skips the Supabase lookup).
+        budget_seconds (float, optional): Override of ANALYZER_BUDGET_SECONDS.
+        context_call (optional): Shared batched retrieval from prefetch_contexts (skips the per-university query).
+
+    Returns:
+        tuple: (analysis dict without fit reasoning, with "cost_estimate" from the cost model; step dict)
+    """
+    budget = budget_seconds if budget_seconds is not None else ANALYZER_BUDGET_SECONDS
+    remaining = remaining_time()
+    if remaining is not None:
+        budget = min(budget, remaining)
+    deadline = time.monotonic() + budget
+    degraded = []
+
+    with span("analyzer.university") as stats:
+        if eligibility_and_framework is None:
+            supabase = get_supabase()
+            with span("supabase.query", table="universities_requirements"):
+                supa_resp = supabase.table("universities_requirements").select("*").eq("name", uni_name).execute() if supabase else None
+            eligibility_and_framework = {}
+            if supa_resp and getattr(supa_resp, "data", None) and len(supa_resp.data) > 0:
+                eligibility_and_framework = supa_resp.data[0]
         country = eligibility_and_framework.get("country", "")
-        wikipedia_summary = fetch_university_wikipedia(uni_name, country)
-
-        uni_analysis = {
-            "university_name": uni_name,
-            "country": country,
-            **eligibility_and_framework,
-            "logistics_and_experience": logistics_and_experience_dict,
-            "general_fit_reasoning": universities_fit_text[idx] if universities_fit_text and idx < len(universities_fit_text) else None,
-            "wikipedia_summary": wikipedia_summary,
-        }
-        analysis_results.append(uni_analysis)
+
+        # Wikipedia runs alongside the extraction
+        wiki_call = _start_budgeted(budget * ANALYZER_WIKIPEDIA_SHARE, fetch_university_wikipedia, uni_name, country)
+
+        precomputed = get_precomputed_logistics(uni_name)
+        record_cache("analyzer_precomputed", hit=precomputed is not None)
+        if precomputed:
+            logistics_and_experience_dict = precomputed["logistics_and_experience"]
+            step_prompt = {"target_university": uni_name, "source": "precomputed", "chunks_hash": precomputed.get("chunks_hash")}
+        else:
+            step_prompt = {"target_university": uni_name}
+            logistics_and_experience_dict = None
+            if context_call is not None:
+                contexts, reason = _await_budgeted(context_call)
+                context_text = (contexts or {}).get(uni_name, "")
+            else:
+                context_text, reason = _call_with_budget(
+                    min(budget * ANALYZER_RETRIEVAL_SHARE, deadline - time.monotonic()), retrieve_context, uni_name
+                )
+            if reason:
+                degraded.append(f"rag_retrieval: {reason}")
+            else:
+                # At least the extraction's own share, even when retrieval waited for a worker
+                extraction_budget = max(deadline - time.monotonic(), budget * (1 - ANALYZER_RETRIEVAL_SHARE))
+                extracted, reason = _call_with_budget(extraction_budget, extract_from_context, uni_name, context_text)
+                if reason:
+                    degraded.append(f"llm_extraction: {reason}")
+                else:
+                    logistics_and_experience_dict, user_prompt = extracted
+                    step_prompt.update(compact_prompt(user_prompt))
+            if logistics_and_experience_dict is None:
+                stale = _stale_extraction(uni_name)
+                logistics_and_experience_dict = stale or {}
+                step_prompt["source"] = "stale" if stale else "unavailable"
+
+        wikipedia_summary, reason = _await_budgeted(wiki_call)
+        if reason:
+            degraded.append(f"wikipedia_summary: {reason}")
+
+    if degraded:
+        inc("analyzer_degraded_total", len(degraded))
+    step = {
+        "module": "Analyzer",
+        "prompt": step_prompt,
+        "response": logistics_and_experience_dict,
+        **stats.as_step_fields()
+    }
+    if degraded:
+        step["degraded"] = degraded
+    # Costs missing from the factsheets come from the cost model, not from the LLM
+    cost_estimate = estimate_costs(uni_name, country) if country else None
+    uni_analysis = {
+        "university_name": uni_name,
+        "country": country,
+        **eligibility_and_framework,
+        "logistics_and_experience": with_cost_estimates(logistics_and_experience_dict, cost_estimate),
+        "wikipedia_summary": wikipedia_summary,
+        "cost_estimate": cost_estimate,
+    }
+    return uni_analysis, step
+
+def with_fit_reasoning(shared_analysis, universities_fit_text, idx):
+    """Combine a shared per-university analysis with the user-specific fit reasoning."""
+    return {
+        **shared_analysis,
+        "general_fit_reasoning": universities_fit_text[idx] if universities_fit_text and idx < len(universities_fit_text) else None,
+    }
+
+def analyze_universities(top_universities, universities_fit_text=None, return_steps=False):
+    """
+    Provides a comprehensive analysis for each university by combining:
+    - Structured requirements and metadata from Supabase (universities_requirements table)
+    - RAG-based category analysis (one batched hybrid retrieval for all universities)
+    - Fit reasoning from the ranking step (if provided)
+
+    Args:
+        top_universities (list[str]): List of university names (strings).
+        universities_fit_text (list[str], optional): List of reasoning strings from supervisor state, aligned with top_universities.
+        return_steps (bool): If True, return (analysis_results, steps) for API step logging.
+
+    Returns:
+        list[dict] or tuple: List of analysis dicts; if return_steps, (list, steps).
+    """
+    analysis_results = []
+    steps = []
+    # One retrieval round trip for all universities, then analyze them concurrently within one budget
+    context_call = prefetch_contexts(top_universities)
+    with ThreadPoolExecutor(max_workers=max(1, len(top_universities))) as executor:
+        futures = [
+            submit(executor, analyze_university, uni_name, None, None, context_call)
+            for uni_name in top_universities
+        ]
+        for idx, future in enumerate(futures):
+            shared_analysis, step = future.result()
+            if return_steps:
+                steps.append(step)
+            analysis_results.append(with_fit_reasoning(shared_analysis, universities_fit_text, idx))
     if return_steps:
         return analysis_results, steps
     return analysis_results
@@ -1,4 +1,5 @@
-from utils.config import supabase
+from utils.config import get_supabase
+from utils.instrumentation import span
 
 def _safe_int(val, default=None, min_val=None, max_val=None):
     try:
@@ -11,13 +12,41 @@ def _safe_int(val, default=None, min_val=None, max_val=None):
     except (TypeError, ValueError):
         return default
 
-def filter_universities(user_input):
+def load_catalog():
+    """Load the whole universities_requirements table once (used to filter many profiles in memory)."""
+    supabase = get_supabase()
+    if not supabase:
+        raise RuntimeError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY.")
+    with span("supabase.query", table="universities_requirements"):
+        response = supabase.table("universities_requirements").select("*").execute()
+    return response.data if response and hasattr(response, "data") else []
+
+def _row_matches(row, op, column, value):
+    """In-memory equivalent of the PostgREST eq/lte predicates (NULL never matches)."""
+    row_value = row.get(column)
+    if row_value is None:
+        return False
+    if op == "eq":
+        return row_value == value
+    if op == "lte":
+        try:
+            return float(row_value) <= float(value)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def filter_universities(user_input, catalog=None):
     """
     Filters the universities_requirements table based on user input criteria.
+    Args:
+        user_input (dict): Structured user profile.
+        catalog (list[dict], optional): Preloaded universities_requirements rows (see load_catalog).
+            When given, the column predicates run in memory instead of as a Supabase query.
     Returns:
         dict: { "universities": list[dict], "traced_steps": list[str] }
     """
-    if not supabase:
+    supabase = get_supabase() if catalog is None else None
+    if catalog is None and not supabase:
         raise RuntimeError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY.")
 
     if not isinstance(user_input, dict):
@@ -36,38 +65,46 @@ def filter_universities(user_input):
     if not isinstance(preferences, dict):
         preferences = {}
 
-    query = supabase.table("universities_requirements").select("*")
+    # Column predicates: (op, column, value)
+    predicates = []
     traced_steps = []
 
     # Academic filters
     gpa = _safe_int(academic.get("gpa"), min_val=0, max_val=100) if academic.get("gpa") is not None else None
     if gpa is not None:
-        query = query.lte("min_gpa", gpa)
+        predicates.append(("lte", "min_gpa", gpa))
         traced_steps.append(f"Filtered by min_gpa <= {gpa}")
 
     study_level = str(academic.get("study_level", "")).strip().lower() if academic.get("study_level") else ""
     if study_level == "msc":
-        query = query.eq("msc_allowed", True)
+        predicates.append(("eq", "msc_allowed", True))
         traced_steps.append("Filtered by MSc allowed")
 
     semesters = _safe_int(academic.get("semesters_completed"), min_val=0) if academic.get("semesters_completed") is not None else None
     if semesters is not None:
-        query = query.lte("min_semesters_completed", semesters)
+        predicates.append(("lte", "min_semesters_completed", semesters))
         traced_steps.append(f"Filtered by min_semesters_completed <= {semesters}")
 
     # Language filters
     user_langs = language.get("non_english_languages", [])
     if not user_langs:
-        query = query.eq("english_only_possible", True)
+        predicates.append(("eq", "english_only_possible", True))
         traced_steps.append("Filtered for English-only universities")
 
     if preferences.get("must_be_erasmus") is True:
-        query = query.eq("erasmus_available", True)
+        predicates.append(("eq", "erasmus_available", True))
         traced_steps.append("Filtered by Erasmus availability")
 
-    # Execute query
-    response = query.execute()
-    rows = response.data if response and hasattr(response, "data") else []
+    if catalog is None:
+        # Execute query
+        query = supabase.table("universities_requirements").select("*")
+        for op, column, value in predicates:
+            query = getattr(query, op)(column, value)
+        with span("supabase.query", table="universities_requirements"):
+            response = query.execute()
+        rows = response.data if response and hasattr(response, "data") else []
+    else:
+        rows = [r for r in catalog if all(_row_matches(r, op, column, value) for op, column, value in predicates)]
 
     # Availability overlap filtering
     s_start_m = availability.get("start_month")
@@ -136,5 +173,5 @@ def filter_universities(user_input):
 
     return {
         "universities": university_list,
-        "traced_steps": traced_steps + ["Queried universities_requirements table"]
+        "traced_steps": traced_steps + ["Queried universities_requirements table" if catalog is None else "Filtered preloaded universities_requirements catalog"]
     }
@@ -1,7 +1,8 @@
 from utils.llmod_client import llmod_chat
 import json
 import os
-from data_pipeline.context_data import FINANCIAL_REFERENCE_TABLE, SOCIAL_SENTIMENT_TABLE
+from data_pipeline.context_data import FINANCIAL_REFERENCE_TABLE, relevant_reference_rows, format_social_rows, name_key
+from orchestration.cost_model import estimate_costs
 
 def rank_universities(valid_universities_list, user_preferences, top_k=5):
     """
@@ -38,23 +39,37 @@ def score_universities_with_llm(valid_universities_list, user_preferences, top_k
     if not valid_universities_list:
         return (empty_response, {"empty_input": True}) if return_prompt else empty_response
 
-    formatted_universities = [
-        {"university_name": uni["name"], "country": uni["country"]}
-        for uni in valid_universities_list if isinstance(uni, dict) and uni.get("name") and uni.get("country")
-    ]
+    eligible = [uni for uni in valid_universities_list if isinstance(uni, dict) and uni.get("name") and uni.get("country")]
+    formatted_universities = []
+    estimates = {}
+    for uni in eligible:
+        entry = {"university_name": uni["name"], "country": uni["country"]}
+        # Costs come from the cost model as facts; the LLM only decides whether they matter to this student
+        estimate = estimate_costs(uni["name"], uni["country"])
+        if estimate:
+            estimates[name_key(uni["name"])] = estimate
+            entry.update(estimated_semester_cost_usd=estimate["semester_usd"]["mid"], financial_score=estimate["financial_score"])
+        formatted_universities.append(entry)
     if not formatted_universities:
         return (empty_response, {"empty_input": True}) if return_prompt else empty_response
 
+    # Only the sentiment rows for these universities; the cost table only for countries the cost model does not cover
+    reference = relevant_reference_rows(eligible)
+    social_rows = format_social_rows(reference["social"]) if reference["social"] else "(no entries for these universities)"
+    cost_reference = ""
+    if reference["unmapped_countries"]:
+        cost_reference = f"""
+    Reference Data for `financial_fit` of universities without a `financial_score` (Global Semester Pure Cost - $0 Tuition):
+    {FINANCIAL_REFERENCE_TABLE.strip()}
+"""
+
     user_prompt = f"""
     Eligible Universities:
     {json.dumps(formatted_universities, ensure_ascii=False, indent=2)}
 
     Social Media Sentiment Table:
-    {SOCIAL_SENTIMENT_TABLE}
-    
-    Reference Data for `financial_fit` (Global Semester Pure Cost - $0 Tuition):
-    {FINANCIAL_REFERENCE_TABLE}
-
+    {social_rows}
+    {cost_reference}
     Student Preferences: "{user_preferences}"
 
     Rules:
@@ -66,9 +81,10 @@ def score_universities_with_llm(valid_universities_list, user_preferences, top_k
         decentralized commuter school), City Scale (immersive college town vs. sprawling megacity), and Academic Pacing (hyper-competitive "pressure-cooker" vs. balanced workload). 
         Evaluate the social atmosphere based on the party vibe, ease of making friends, and international/Erasmus presence. Use your internal knowledge alongside the provided social media sentiment table as general assistance.
     - `location_fit`: Nature/hikes, nightlife, art, culture, weather.
-    - `financial_fit`: Total cost of exchange (rent, food, travel). Base the score on the "Reference Data" table provided. 
-        Use your internal knowledge to adjust the score/estimate slightly if the specific city or country is an outlier 
-        (e.g., Zurich is more expensive than the "Western Europe" average). In the reasoning, provide a brief estimated total cost (e.g., ~$12k) for the semester.
+    - `financial_fit`: Total cost of exchange (rent, food, travel). When a university has a `financial_score`, output exactly that value; 
+        it comes from a cost model and must not be re-estimated. Otherwise base the score on the "Reference Data" table, adjusted slightly 
+        for outlier cities (e.g., Zurich is more expensive than the "Western Europe" average). In the reasoning, quote the estimated 
+        semester cost (`estimated_semester_cost_usd` when given, e.g. ~$12k).
     - `jewish_israeli_community_fit`: Evaluate EXCLUSIVELY based on current antisemitism levels on and around campus, the accessibility of the local Jewish community (e.g., Chabad, synagogues, kosher food), and the presence of Israeli students or locals. 
         STRICTLY IGNORE general city crime rates, pickpocketing, or broad safety metrics.
     - `other_preferences_fit`: Any specific user requests that do not fit into the above categories (e.g., specific sports, dietary needs, unique hobbies).
@@ -104,10 +120,19 @@ def score_universities_with_llm(valid_universities_list, user_preferences, top_k
         llm_json_response = {"scored_universities": []}
     if "scored_universities" not in llm_json_response:
         llm_json_response["scored_universities"] = []
+    _apply_financial_scores(llm_json_response, estimates)
     if return_prompt:
         return llm_json_response, {"system_prompt": system_prompt[:200] + "...", "user_prompt": user_prompt, "top_k": top_k}
     return llm_json_response
 
+def _apply_financial_scores(llm_json_response, estimates):
+    """Replace the LLM's financial_fit with the cost model's score wherever it judged costs relevant (non-null)."""
+    for uni in llm_json_response.get("scored_universities", []):
+        scores = uni.get("scores") if isinstance(uni, dict) else None
+        estimate = estimates.get(name_key(uni.get("university_name"))) if isinstance(scores, dict) else None
+        if estimate and scores.get("financial_fit") is not None:
+            scores["financial_fit"] = estimate["financial_score"]
+
 def process_llm_scores(llm_json_response, top_k=5):
     """
     Processes LLM scoring response, calculates a weighted average score, 
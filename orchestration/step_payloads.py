@@ -0,0 +1,43 @@
+"""
+Content-addressed store for large step-log payloads (e.g. the full ranker prompt).
+Steps keep a short preview plus a reference; the full text is stored once and can be fetched on demand.
+Payloads live in the shared state, so any worker can serve /api/steps/payload/{ref}.
+"""
+import hashlib
+import logging
+from typing import Optional
+
+from utils.config import STEP_PAYLOAD_PREVIEW_CHARS, STEP_PAYLOAD_TTL_SECONDS
+from utils.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+
+def store_payload(payload: str) -> str:
+    """Store payload once (keyed by content hash, expires after STEP_PAYLOAD_TTL_SECONDS) and return its reference."""
+    text = str(payload)
+    ref = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    try:
+        get_shared_state().set("step_payload:" + ref, text.encode("utf-8"), ttl=STEP_PAYLOAD_TTL_SECONDS)
+    except Exception:
+        logger.warning("Could not store step payload %s", ref, exc_info=True)  # the step keeps its preview
+    return ref
+
+
+def get_payload(ref: str) -> Optional[str]:
+    """Return the full payload for a reference, or None if unknown/expired."""
+    raw = get_shared_state().get("step_payload:" + ref)
+    return raw.decode("utf-8") if raw is not None else None
+
+
+def preview_with_ref(payload: str, preview_chars: int = STEP_PAYLOAD_PREVIEW_CHARS) -> dict:
+    """Truncated preview of payload plus a reference to the stored full text."""
+    text = str(payload)
+    preview = text if len(text) <= preview_chars else text[:preview_chars] + "..."
+    return {"preview": preview, "ref": store_payload(text), "length": len(text)}
+
+
+def compact_prompt(user_prompt: str) -> dict:
+    """Step-log fields for a prompt: a short preview and the reference to the full text."""
+    stored = preview_with_ref(user_prompt)
+    return {"user_prompt_preview": stored["preview"], "user_prompt_ref": stored["ref"]}
@@ -2,39 +2,52 @@
 Supervisor agent for orchestrating calls to other agents in the orchestration layer.
 """
 import json
-from typing import TypedDict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, List, Annotated
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
 
 from orchestration.specialists.ranker import score_universities_with_llm, process_llm_scores
 from orchestration.specialists.analyzer import analyze_universities
 from orchestration.specialists.filter import filter_universities
-from utils import config 
+from orchestration.router import route_locally
+from orchestration.step_payloads import compact_prompt
+from orchestration.checkpointer import make_checkpointer
+from utils.instrumentation import span, submit
 
 # 1. Define the State Schema
+def _append_steps(existing: list, new: list) -> list:
+    """Append-only reducer for the steps channel. Passing None clears it (start of a new request)."""
+    if new is None:
+        return []
+    return (existing or []) + new
+
 class AgentState(TypedDict, total=False):
     valid_universities_list: list
     user_iformation: dict
     user_requests: List[str]
     top_k: int
+    profile_changed: bool  # this request replaced the profile or top_k, so earlier filter results are stale
     top_universities: list
     analysis: str
     request_count: int
     universities_fit_text: List[str]
-    steps: List[dict]
+    steps: Annotated[List[dict], _append_steps]
+    catalog: list  # preloaded universities_requirements rows (batch runs only)
 
 # 2. Define the Nodes
 def filter_node(state: AgentState):
-    filtered_result = filter_universities(state["user_iformation"])
+    with span("node.filter") as stats:
+        filtered_result = filter_universities(state["user_iformation"], catalog=state.get("catalog"))
     universities = filtered_result.get("universities", [])
     step = {
         "module": "Filter",
         "prompt": {"action": "Query Supabase", "criteria": state["user_iformation"]},
-        "response": {"found_universities": len(universities), "traced_steps": filtered_result.get("traced_steps", [])}
+        "response": {"found_universities": len(universities), "traced_steps": filtered_result.get("traced_steps", [])},
+        **stats.as_step_fields()
     }
     result = {
         "valid_universities_list": universities,
-        "steps": (state.get("steps") or []) + [step]
+        "steps": [step]
     }
     return result
 
@@ -45,27 +58,32 @@ def rank_node(state: AgentState):
             "top_universities": [],
             "universities_fit_text": [],
             "analysis": "No universities match your criteria. Try looser filters (e.g. lower GPA, different availability).",
-            "steps": (state.get("steps") or [])
+            "steps": []
         }
     preferences = state["user_iformation"].get("preferences", {})
     free_language_preferences = preferences.get("free_language_preferences", "")
-    llm_json_response, rank_prompt = score_universities_with_llm(
-        state["valid_universities_list"],
-        free_language_preferences,
-        state["top_k"],
-        return_prompt=True
-    )
-    reasonings = [uni.get("reasoning", "") for uni in llm_json_response.get("scored_universities", [])]
-    top_universities = process_llm_scores(llm_json_response, top_k=state["top_k"])
+    with span("node.rank") as stats:
+        llm_json_response, rank_prompt = score_universities_with_llm(
+            state["valid_universities_list"],
+            free_language_preferences,
+            state["top_k"],
+            return_prompt=True
+        )
+        reasonings = [uni.get("reasoning", "") for uni in llm_json_response.get("scored_universities", [])]
+        top_universities = process_llm_scores(llm_json_response, top_k=state["top_k"])
+    if "user_prompt" in rank_prompt:
+        # The ranking prompt embeds both reference tables; keep a preview + ref instead of the full text
+        rank_prompt = {k: v for k, v in rank_prompt.items() if k != "user_prompt"} | compact_prompt(rank_prompt["user_prompt"])
     step = {
         "module": "Ranker",
         "prompt": rank_prompt,
-        "response": {"scored_universities": llm_json_response.get("scored_universities", []), "top_universities": top_universities}
+        "response": {"scored_universities": llm_json_response.get("scored_universities", []), "top_universities": top_universities},
+        **stats.as_step_fields()
     }
     return {
         "universities_fit_text": reasonings,
         "top_universities": top_universities,
-        "steps": (state.get("steps") or []) + [step]
+        "steps": [step]
     }
 
 def analyze_node(state: AgentState):
@@ -73,37 +91,47 @@ def analyze_node(state: AgentState):
     if not top_universities:
         return {
             "analysis": "No universities to analyze.",
-            "steps": (state.get("steps") or [])
+            "steps": []
         }
-    analysis_results, analyze_steps = analyze_universities(
-        top_universities,
-        state.get("universities_fit_text", None),
-        return_steps=True
-    )
     user_prefs = (state.get("user_iformation") or {}).get("preferences", {}) or {}
     prefs_str = str(user_prefs.get("free_language_preferences", ""))
-    exec_summary, synthesis_step = _synthesize_recommendations(analysis_results, prefs_str)
+    # The summary only needs names + preferences, so run it alongside the per-university analysis. It is only
+    # started for a non-empty top_universities (checked above), for which analyze_universities returns one result
+    # per university; if the analysis fails, the summary is not waited for.
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        with span("node.analyze"):
+            synthesis_future = submit(executor, _synthesize_recommendations, top_universities, prefs_str)
+            analysis_results, analyze_steps = analyze_universities(
+                top_universities,
+                state.get("universities_fit_text", None),
+                return_steps=True
+            )
+            exec_summary, synthesis_step = synthesis_future.result() if analysis_results else ("", None)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
     formatted = _format_analysis_as_string(analysis_results, exec_summary)
     return {
         "analysis": formatted,
-        "steps": (state.get("steps") or []) + analyze_steps + ([synthesis_step] if synthesis_step else [])
+        "steps": analyze_steps + ([synthesis_step] if synthesis_step else [])
     }
 
-def _synthesize_recommendations(analysis_results: list, user_prefs: str) -> tuple:
+def _synthesize_recommendations(top_universities: list, user_prefs: str) -> tuple:
     """Generate executive summary and alternatives via LLM. Returns (summary_text, step_dict or None)."""
-    if not analysis_results:
+    if not top_universities:
         return ("", None)
     try:
         from utils.llmod_client import llmod_chat
-        names = [u.get("university_name", u.get("name", "?")) for u in analysis_results]
+        names = [u if isinstance(u, str) else u.get("university_name", u.get("name", "?")) for u in top_universities]
         sys_prompt = "You are an expert study-abroad advisor. Write a brief, professional executive summary (2-3 sentences) and an 'Alternatives' note. Be specific and actionable."
         user_prompt = f"""Top recommendations: {', '.join(names[:5])}. User preferences: "{user_prefs}".
 
 Output JSON: {{"executive_summary": "2-3 sentences", "alternatives_note": "1-2 sentences on backup options"}}"""
-        out = llmod_chat(sys_prompt, user_prompt, use_json=True)
+        with span("analyzer.synthesis") as stats:
+            out = llmod_chat(sys_prompt, user_prompt, use_json=True)
         data = json.loads(out)
         summary = (data.get("executive_summary") or "") + "\n\n" + (data.get("alternatives_note") or "")
-        step = {"module": "Analyzer", "prompt": {"action": "Synthesize recommendations"}, "response": data}
+        step = {"module": "Analyzer", "prompt": {"action": "Synthesize recommendations"}, "response": data, **stats.as_step_fields()}
         return (summary.strip(), step)
     except Exception:
         return ("", None)
@@ -137,18 +165,29 @@ def _format_analysis_as_string(analysis_results: list, exec_summary: str = "") -
                 parts.append(f"   Academic: {ac['academic_summary_notes']}")
             if housing.get("logistics_summary_notes"):
                 parts.append(f"   Logistics: {housing['logistics_summary_notes']}")
+        estimate = uni.get("cost_estimate")
+        if estimate:
+            parts.append(
+                f"   Costs (estimate): ~€{estimate['monthly_living_eur']}/month incl. ~€{estimate['monthly_housing_eur']} rent; "
+                f"semester ≈ ${estimate['semester_usd']['mid']:,} (financial score {estimate['financial_score']}/100)"
+            )
         parts.append("")
     return "\n".join(parts).strip()
 
 # 3. Define the Routing Logic
 def choose_entry_point(state: AgentState) -> str:
     """
-    Analyzes the free-form user text to decide which task fits best using LLM, falls back to filter if LLM is unavailable.
+    Analyzes the free-form user text to decide which task fits best.
+    Tries the local router (keyword rules + nearest-centroid classifier) first and only calls the LLM
+    when it is not confident; falls back to filter if the LLM is unavailable.
     """
-    if state.get("request_count", 1) == 1:
+    if state.get("request_count", 1) == 1 or state.get("profile_changed"):
         return "filter"
     requests = state.get("user_requests", [])
     user_text = str(requests[-1]) if requests else state.get("user_iformation", {}).get("free_text", "")
+    task, _confidence, _method = route_locally(user_text)
+    if task:
+        return task
     try:
         from utils.llmod_client import llmod_chat
         system_prompt = "You are an expert workflow router for a university exchange agent. Given a user's free-form input, decide which task fits best: 'filter', 'rank', or 'analyze'. Prefer small tweaks (rank) over big changes (filter), but do whatever is required. Respond ONLY with one of: filter, rank, analyze."
@@ -161,6 +200,8 @@ def choose_entry_point(state: AgentState) -> str:
     return "filter"
 
 # 4. Build the Supervisor Graph
+PIPELINE_NODES = ["filter", "rank", "analyze"]  # cascade order, used for progress reporting
+
 class Supervisor:
     def __init__(self):
         workflow = StateGraph(AgentState)
@@ -186,19 +227,27 @@ class Supervisor:
         workflow.add_edge("rank", "analyze")
         workflow.add_edge("analyze", END)
         
-        # Compile the graph into an executable app
-        memory = MemorySaver()        
-        self.app = workflow.compile(checkpointer=memory)
+        # Compile the graph into an executable app; conversations are checkpointed in the shared state
+        # when it is shared between worker processes (SHARED_STATE_URL), in memory otherwise
+        self.app = workflow.compile(checkpointer=make_checkpointer())
 
-    def run(self, new_chat_message: str, user_profile_dict: dict = None, thread_id="user_123"):        
+    def run(self, new_chat_message: str, user_profile_dict: dict = None, thread_id="user_123", progress=None, top_k=5):
+        """
+        Run the pipeline for one request of the conversation `thread_id`.
+        user_profile_dict (dict): required for the first request; a later request that passes a different one
+            (or a different top_k) replaces the conversation's profile and is always routed to filter.
+        top_k (int): universities to rank and analyze.
+        progress (callable, optional): called as progress(stage, completed, total, steps=[...]) after each node;
+            stages skipped by the router count as completed.
+        """
         config = {"configurable": {"thread_id": thread_id}}
-        current_memory = self.app.get_state(config).values        
+        current_memory = self.app.get_state(config).values
         current_count = current_memory.get("request_count", 0)
         current_requests = current_memory.get("user_requests", [])
-        
-        new_count = current_count + 1        
-        updated_requests = current_requests + [new_chat_message] 
-        
+
+        new_count = current_count + 1
+        updated_requests = current_requests + [new_chat_message]
+
         if new_count == 1:
             if not user_profile_dict:
                 raise ValueError("user_profile_dict is required for the first request!")
@@ -206,20 +255,49 @@ class Supervisor:
                 "user_iformation": user_profile_dict, # Set the JSON profile once
                 "user_requests": updated_requests,
                 "request_count": new_count,
-                "valid_universities_list": [], 
-                "top_k": 5,
+                "valid_universities_list": [],
+                "top_k": top_k,
+                "profile_changed": False,
                 "extracted_data_dict": {},
                 "rag_factsheet_func": None,
                 "top_universities": [],
                 "analysis": "",
                 "universities_fit_text": [],
-                "steps": []
+                "steps": None  # reset the step log for this request
             }
         else:
             payload = {
                 "user_requests": updated_requests,
-                "request_count": new_count
+                "request_count": new_count,
+                "steps": None
             }
+            changed = bool(user_profile_dict) and (
+                user_profile_dict != current_memory.get("user_iformation") or top_k != current_memory.get("top_k")
+            )
+            payload["profile_changed"] = changed
+            if changed:
+                payload.update(user_iformation=user_profile_dict, top_k=top_k)
 
-        result = self.app.invoke(payload, config=config)
-        return {"analysis": result.get("analysis", ""), "steps": result.get("steps", [])}
\ No newline at end of file
+        if progress is None:
+            result = self.app.invoke(payload, config=config)
+        else:
+            # The last "values" chunk is this run's final state; reading the thread back could return a
+            # concurrent run's state when several requests share the conversation
+            result = {}
+            for mode, chunk in self.app.stream(payload, config=config, stream_mode=["updates", "values"]):
+                if mode == "values":
+                    result = chunk
+                    continue
+                for node, values in chunk.items():
+                    if node in PIPELINE_NODES:
+                        progress(node, PIPELINE_NODES.index(node) + 1, len(PIPELINE_NODES), steps=[
+                            {"module": step.get("module"), "duration_ms": step.get("duration_ms")}
+                            for step in (values or {}).get("steps") or []
+                        ])
+        return {
+            "analysis": result.get("analysis", ""),
+            "steps": result.get("steps", []),
+            # what the run actually used, so callers can tell it answered their profile
+            "user_profile": result.get("user_iformation"),
+            "top_k": result.get("top_k"),
+        }
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Local SQLite copy of factsheets_chunks keyed by stable chunk ID.
+Written at ingestion time (save_chunks); used to resolve Pinecone matches without text in their metadata
+and as the source of the BM25 index, so neither needs a network round trip per chunk.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from utils.config import CHUNK_STORE_PATH
+
+
+def chunk_id(row, default_index=0):
+    """
+    Stable chunk ID: "chk-" + sha1 of (country, university, file_name, chunk_index).
+    The fields themselves travel as metadata; the ID never has to be parsed.
+    """
+    key = "\x1f".join(str(part) for part in (
+        row["country"], row["university"], row["file_name"], row.get("chunk_index", default_index)
+    ))
+    return "chk-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+
+def legacy_chunk_id(row, default_index=0):
+    """The "country_university_filename_index" vector ID used before stable IDs (to delete those vectors)."""
+    return f"{row['country']}_{row['university']}_{row['file_name']}_{row.get('chunk_index', default_index)}"
+
+
+def legacy_chunk_id_to_stable(legacy_id):
+    """Map an old "country_university_filename_index" vector ID to its stable ID (None if it cannot be parsed)."""
+    prefix, _, idx_str = str(legacy_id).rpartition("_")
+    if not prefix or not idx_str.isdigit():
+        return None
+    subparts = prefix.split("_")
+    dot_idx = next((i for i, p in enumerate(subparts) if "." in p), None)
+    if dot_idx is None or dot_idx < 2:
+        return None
+    return chunk_id({
+        "country": subparts[0],
+        "university": "_".join(subparts[1:dot_idx]),
+        "file_name": "_".join(subparts[dot_idx:]),
+        "chunk_index": int(idx_str),
+    })
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    country TEXT NOT NULL,
+    university TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    headers TEXT
+);
+CREATE INDEX IF NOT EXISTS chunks_university ON chunks (university);
+"""
+
+_local = threading.local()
+
+
+def _connect(path):
+    # One read-only connection per thread and path, reopened when ingestion swaps in a new file
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    mtime = os.path.getmtime(path)
+    cached = connections.get(path)
+    if cached is None or cached[0] != mtime:
+        if cached is not None:
+            cached[1].close()
+        cached = connections[path] = (mtime, sqlite3.connect(f"file:{path}?mode=ro", uri=True))
+    return cached[1]
+
+
+def save_chunk_store(rows, path=CHUNK_STORE_PATH):
+    """Replace the local store with factsheets_chunks rows (written to a temp file, then swapped in)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    row.get("chunk_id") or chunk_id(row),
+                    row["country"], row["university"], row["file_name"], row.get("chunk_index", 0),
+                    row.get("text") or "", json.dumps(row.get("headers") or {}),
+                )
+                for row in rows
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+def store_exists(path=CHUNK_STORE_PATH):
+    return os.path.exists(path)
+
+
+def get_chunk_texts(ids, path=CHUNK_STORE_PATH):
+    """Texts for the given stable IDs in one lookup: {chunk_id: text} (missing IDs are left out)."""
+    ids = list(dict.fromkeys(ids))
+    if not ids or not store_exists(path):
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    try:
+        rows = _connect(path).execute(f"SELECT chunk_id, text FROM chunks WHERE chunk_id IN ({placeholders})", ids).fetchall()
+    except (OSError, sqlite3.Error):
+        return {}
+    return dict(rows)
+
+
+def load_chunks(path=CHUNK_STORE_PATH):
+    """All chunks as {"id", "country", "university", "file_name", "text", "headers"} dicts."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT chunk_id, country, university, file_name, text, headers FROM chunks").fetchall()
+    finally:
+        conn.close()
+    return [
+        {
+            "id": cid, "country": country, "university": uni, "file_name": file_name,
+            "text": text, "headers": json.loads(headers) if headers else {},
+        }
+        for cid, country, uni, file_name, text, headers in rows
+    ]
@@ -8,6 +8,8 @@ CREATE TABLE IF NOT EXISTS public.factsheets_chunks (
     headers JSONB,
     CONSTRAINT unique_chunk_per_file UNIQUE (country, university, file_name, chunk_index)
 );
+-- Stable chunk ID (sha1 of country/university/file_name/chunk_index, see pinecone_db/chunk_store.py), also the Pinecone vector ID
+ALTER TABLE public.factsheets_chunks ADD COLUMN IF NOT EXISTS chunk_id TEXT UNIQUE;
 CREATE TABLE IF NOT EXISTS public.extracted_texts (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     country TEXT NOT NULL,
@@ -40,4 +42,21 @@ CREATE TABLE IF NOT EXISTS public.universities_requirements (
     CONSTRAINT unique_uni_name_country UNIQUE (name, country)
 );
 -- Refresh the API cache
-NOTIFY pgrst, 'reload schema';
\ No newline at end of file
+NOTIFY pgrst, 'reload schema';
+CREATE TABLE IF NOT EXISTS public.analyzer_extractions (
+    university TEXT PRIMARY KEY,
+    chunks_hash TEXT NOT NULL, -- sha256 of the university's factsheets_chunks; recompute when it changes
+    logistics_and_experience JSONB NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+-- Refresh the API cache
+NOTIFY pgrst, 'reload schema';
+CREATE TABLE IF NOT EXISTS public.data_versions (
+    dataset TEXT PRIMARY KEY, -- extracted_texts, universities_requirements, factsheets_chunks, pinecone_index, analyzer_extractions
+    version BIGINT NOT NULL, -- catalog data version at the dataset's last change; the current version is the maximum
+    digest TEXT NOT NULL, -- sha256 of the dataset content (see utils/data_version.py)
+    row_count INT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+-- Refresh the API cache
+NOTIFY pgrst, 'reload schema';
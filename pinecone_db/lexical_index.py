@@ -0,0 +1,121 @@
+"""
+Local BM25 index over factsheets_chunks, used next to Pinecone for hybrid retrieval.
+Built from the local chunk store written at ingestion time (see chunk_store.py) and kept in memory.
+When no chunk store is present it is built once from the factsheets_chunks table instead.
+"""
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from utils import data_version
+from utils.config import CHUNK_STORE_PATH, RRF_K
+from pinecone_db.chunk_store import chunk_id, load_chunks
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of",
+    "on", "or", "that", "the", "this", "to", "with", "will", "you", "your", "we", "our",
+}
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over chunk documents ({"id", "university", "text", ...})."""
+
+    def __init__(self, docs, k1=1.5, b=0.75):
+        self.docs = list(docs)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc_idx, tf)]
+        self.doc_len = []
+        self.by_university = defaultdict(set)
+        for idx, doc in enumerate(self.docs):
+            counts = Counter(tokenize(doc.get("text")))
+            self.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((idx, tf))
+            self.by_university[doc.get("university")].add(idx)
+        self.avg_len = (sum(self.doc_len) / len(self.doc_len)) if self.doc_len else 0.0
+        n = len(self.docs)
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    def search(self, query, top_k=5, university=None):
+        """Top documents for query as [(doc, score)], optionally restricted to one university."""
+        allowed = self.by_university.get(university, set()) if university is not None else None
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for idx, tf in self.postings[term]:
+                if allowed is not None and idx not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[idx] / (self.avg_len or 1))
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.docs[idx], score) for idx, score in ranked]
+
+
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K):
+    """
+    Fuse several ranked lists of ids with RRF: score(id) = sum(1 / (k + rank)).
+    Returns ids ordered by fused score.
+    """
+    scores = defaultdict(float)
+    for ranked in ranked_lists:
+        for rank, doc_id in enumerate(ranked, 1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)]
+
+
+def _docs_from_supabase():
+    from utils.config import get_supabase
+    supabase = get_supabase()
+    if not supabase:
+        return []
+    r = supabase.table("factsheets_chunks").select("country, university, file_name, chunk_index, text, headers").execute()
+    rows = r.data if r and getattr(r, "data", None) else []
+    return [
+        {
+            "id": chunk_id(row), "country": row.get("country"), "university": row.get("university"),
+            "file_name": row.get("file_name"), "text": row.get("text") or "", "headers": row.get("headers"),
+        }
+        for row in rows
+    ]
+
+
+_index = {"index": None, "mtime": None, "version": None, "loaded": False}
+_index_lock = threading.Lock()
+
+
+def get_lexical_index(path=CHUNK_STORE_PATH):
+    """
+    Memory-resident BM25 index over the chunk store at `path`, rebuilt when the file changes.
+    Without a chunk store it is built from factsheets_chunks and rebuilt when the data version moves.
+    Returns None when there are no chunks.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    version = data_version.current_version() if mtime is None else None
+    with _index_lock:
+        if _index["loaded"] and _index["mtime"] == mtime and _index["version"] == version:
+            return _index["index"]
+        if mtime is not None:
+            docs = load_chunks(path)
+        else:
+            try:
+                docs = _docs_from_supabase()
+            except Exception:
+                return None  # Not cached: retried on the next call
+        _index.update(index=BM25Index(docs) if docs else None, mtime=mtime, version=version, loaded=True)
+        return _index["index"]
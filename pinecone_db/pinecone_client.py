@@ -1,14 +1,32 @@
-import os
-from pinecone import Pinecone
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from utils.llmod_client import get_embedding
-from utils.config import PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_INDEX_NAME, TOP_K_RESULTS, supabase
+from utils.instrumentation import span, submit
+from utils.config import (
+    PINECONE_API_KEY, PINECONE_INDEX_NAME, PINECONE_HOST, PINECONE_QUERY_TIMEOUT,
+    TOP_K_RESULTS, HYBRID_PER_QUERY_K, HYBRID_TOP_K, get_supabase,
+)
+from utils.resilience import call_timeout
+from pinecone_db.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from pinecone_db.chunk_store import legacy_chunk_id_to_stable, get_chunk_texts
+
+PINECONE_MAX_TOP_K = 1000  # Upper bound on top_k for queries that include metadata
+
+_index = {"handle": None}
+_index_lock = threading.Lock()
 
 def _get_index():
-    if not PINECONE_API_KEY or not PINECONE_INDEX_NAME:
-        raise ValueError("Pinecone credentials missing. Check your .env/config.")
-    
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    return pc.Index(PINECONE_INDEX_NAME)
+    """Shared index handle (one client and connection pool per process), created on first use."""
+    if _index["handle"] is None:
+        if not PINECONE_API_KEY or not PINECONE_INDEX_NAME:
+            raise ValueError("Pinecone credentials missing. Check your .env/config.")
+        with _index_lock:
+            if _index["handle"] is None:
+                from pinecone import Pinecone
+                pc = Pinecone(api_key=PINECONE_API_KEY)
+                _index["handle"] = pc.Index(host=PINECONE_HOST) if PINECONE_HOST else pc.Index(PINECONE_INDEX_NAME)
+    return _index["handle"]
 
 def upsert_embeddings(vectors, metadatas=None, namespace=None):
     """
@@ -27,33 +45,71 @@ def upsert_embeddings(vectors, metadatas=None, namespace=None):
         items.append(item)
     index.upsert(items=items, namespace=namespace)
 
-def _fetch_chunk_text_by_id(chunk_id: str) -> str:
-    """Fetch chunk text from Supabase factsheets_chunks by parsed chunk_id (country_university_filename_index)."""
-    if not supabase:
-        return ""
-    parts = chunk_id.rsplit("_", 1)
-    if len(parts) != 2:
-        return ""
-    prefix, idx_str = parts
-    try:
-        idx = int(idx_str)
-    except ValueError:
-        return ""
-    # prefix is country_university_filename; file_name contains "."
-    subparts = prefix.split("_")
-    dot_idx = next((i for i, p in enumerate(subparts) if "." in p), None)
-    if dot_idx is None or dot_idx < 1:
-        return ""
-    country = subparts[0]
-    university = "_".join(subparts[1:dot_idx])
-    file_name = "_".join(subparts[dot_idx:])
-    try:
-        r = supabase.table("factsheets_chunks").select("text").eq("country", country).eq("university", university).eq("file_name", file_name).eq("chunk_index", idx).limit(1).execute()
-        if r and getattr(r, "data", None) and len(r.data) > 0:
-            return r.data[0].get("text", "") or ""
-    except Exception:
-        pass
-    return ""
+def delete_embeddings(ids, namespace=None, batch_size=1000):
+    """Delete vectors by ID (IDs that do not exist are ignored by Pinecone)."""
+    index = _get_index()
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        index.delete(ids=ids[start:start + batch_size], namespace=namespace)
+
+def _stable_id(vector_id):
+    vector_id = str(vector_id or "")
+    if vector_id.startswith("chk-"):
+        return vector_id
+    return legacy_chunk_id_to_stable(vector_id) or vector_id  # Vectors upserted before stable IDs
+
+def resolve_chunk_texts(ids):
+    """
+    Texts for stable chunk IDs in bulk: one local chunk-store lookup, then a single Supabase
+    query for whatever is still missing. Returns {chunk_id: text}.
+    """
+    ids = list(dict.fromkeys(ids))
+    texts = get_chunk_texts(ids)
+    missing = [cid for cid in ids if cid not in texts]
+    supabase = get_supabase() if missing else None
+    if supabase:
+        try:
+            with span("supabase.query", table="factsheets_chunks"):
+                r = supabase.table("factsheets_chunks").select("chunk_id, text").in_("chunk_id", missing).execute()
+            for row in getattr(r, "data", None) or []:
+                texts[row.get("chunk_id")] = row.get("text") or ""
+        except Exception:
+            pass
+    return texts
+
+def _match_chunks(response):
+    """
+    {"id", "text", "headers", "country", "university", "file_name"} per match, keyed by stable chunk ID.
+    A legacy vector and its stable-ID copy count once (best score). Texts missing from the metadata are
+    resolved together with resolve_chunk_texts.
+    """
+    results = []
+    seen = set()
+    matches = getattr(response, "matches", []) or response.get("matches", [])
+    for m in matches:
+        meta = getattr(m, "metadata", None) or (m.get("metadata") if isinstance(m, dict) else {})
+        meta = meta if isinstance(meta, dict) else {}
+        mid = getattr(m, "id", None) or (m.get("id", "") if isinstance(m, dict) else "")
+        stable_id = _stable_id(mid)
+        if stable_id in seen:
+            continue
+        seen.add(stable_id)
+        headers = meta.get("headers")
+        results.append({
+            "id": stable_id,
+            "text": meta.get("text", "") or "",
+            "headers": headers if isinstance(headers, dict) else {},
+            "country": meta.get("country"),
+            "university": meta.get("university"),
+            "file_name": meta.get("file_name"),
+        })
+    missing = [chunk["id"] for chunk in results if not chunk["text"]]
+    if missing:
+        resolved = resolve_chunk_texts(missing)
+        for chunk in results:
+            if not chunk["text"]:
+                chunk["text"] = resolved.get(chunk["id"], "")
+    return results
 
 def query_embedding(query, top_k=TOP_K_RESULTS, namespace=None, filter=None, return_texts=True):
     """
@@ -66,17 +122,91 @@ def query_embedding(query, top_k=TOP_K_RESULTS, namespace=None, filter=None, ret
     """
     index = _get_index()
     query_vector = get_embedding(query)
-    response = index.query(vector=query_vector, top_k=top_k, namespace=namespace, filter=filter, include_metadata=True)
+    with span("pinecone.query"):
+        response = index.query(
+            vector=query_vector, top_k=top_k, namespace=namespace, filter=filter, include_metadata=True,
+            timeout=call_timeout(PINECONE_QUERY_TIMEOUT),
+        )
     if not return_texts:
         return response
-    texts = []
-    matches = getattr(response, "matches", []) or response.get("matches", [])
-    for m in matches:
-        meta = getattr(m, "metadata", None) or (m.get("metadata") if isinstance(m, dict) else {})
-        text = meta.get("text", "") if isinstance(meta, dict) else ""
-        if not text:
-            mid = getattr(m, "id", None) or m.get("id", "")
-            if mid and "_" in mid:
-                text = _fetch_chunk_text_by_id(str(mid))
-        texts.append(text or "")
-    return texts
+    return [chunk["text"] for chunk in _match_chunks(response)]
+
+@lru_cache(maxsize=256)
+def _query_vector(query):
+    # Sub-queries are fixed strings, so their embeddings are computed once per process
+    return tuple(get_embedding(query))
+
+def _vector_matches(query, top_k, namespace=None, filter=None):
+    index = _get_index()
+    query_vector = list(_query_vector(query))
+    with span("pinecone.query"):
+        response = index.query(
+            vector=query_vector, top_k=top_k, namespace=namespace, filter=filter, include_metadata=True,
+            timeout=call_timeout(PINECONE_QUERY_TIMEOUT),
+        )
+    return _match_chunks(response)
+
+_retrieval_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="retrieval")
+
+def hybrid_query_many(queries, universities, top_k=HYBRID_TOP_K, per_query_k=HYBRID_PER_QUERY_K, namespace=None):
+    """
+    Batched hybrid retrieval for several universities at once.
+    Each sub-query is one Pinecone query (all sub-queries in parallel) with a {"university": {"$in": [...]}}
+    filter and a top_k scaled to the number of universities; matches are regrouped per university and capped
+    at per_query_k. Per university, these lists and the local BM25 results are fused with reciprocal rank fusion.
+    queries: list of targeted sub-queries (e.g. one per information category)
+    universities: list of university names
+    Returns:
+        dict: {university: up to top_k {"id", "text", "headers", "country", "university", "file_name"} chunks, best first}
+    """
+    universities = list(dict.fromkeys(universities))
+    if not universities:
+        return {}
+    filter = {"university": {"$in": universities}} if len(universities) > 1 else {"university": universities[0]}
+    # Oversample so one university with many matching chunks does not crowd out the others
+    vector_k = min(PINECONE_MAX_TOP_K, per_query_k * len(universities) * (2 if len(universities) > 1 else 1))
+    futures = [submit(_retrieval_executor, _vector_matches, q, vector_k, namespace, filter) for q in queries]
+
+    ranked_lists = {uni: [] for uni in universities}
+    chunks = {uni: {} for uni in universities}
+    lexical = get_lexical_index()
+    if lexical is not None:
+        with span("lexical.query"):
+            for uni in universities:
+                for q in queries:
+                    hits = lexical.search(q, top_k=per_query_k, university=uni)
+                    ranked_lists[uni].append([doc["id"] for doc, _ in hits])
+                    for doc, _ in hits:
+                        chunks[uni].setdefault(doc["id"], {
+                            "id": doc["id"], "text": doc.get("text") or "", "headers": doc.get("headers") or {},
+                            "country": doc.get("country"), "university": uni, "file_name": doc.get("file_name"),
+                        })
+
+    vector_error = None
+    for future in futures:
+        try:
+            matches = future.result()
+        except Exception as e:
+            vector_error = vector_error or e
+            continue
+        per_uni = {uni: [] for uni in universities}
+        for chunk in matches:
+            uni = chunk["university"] if len(universities) > 1 else universities[0]
+            if uni in per_uni and len(per_uni[uni]) < per_query_k:
+                per_uni[uni].append(chunk)
+        for uni, uni_matches in per_uni.items():
+            ranked_lists[uni].append([chunk["id"] for chunk in uni_matches])
+            for chunk in uni_matches:
+                if chunk["text"]:
+                    chunks[uni].setdefault(chunk["id"], chunk)
+    if vector_error is not None and not any(any(lists) for lists in ranked_lists.values()):
+        raise vector_error
+
+    return {
+        uni: [chunks[uni][doc_id] for doc_id in reciprocal_rank_fusion(ranked_lists[uni]) if doc_id in chunks[uni]][:top_k]
+        for uni in universities
+    }
+
+def hybrid_query(queries, university, top_k=HYBRID_TOP_K, per_query_k=HYBRID_PER_QUERY_K, namespace=None):
+    """Hybrid retrieval for a single university (see hybrid_query_many)."""
+    return hybrid_query_many(queries, [university], top_k=top_k, per_query_k=per_query_k, namespace=namespace)[university]
@@ -0,0 +1,76 @@
+import time
+
+from benchmarks.replay import FakeIndex, FakeSupabase, Latency, chat_response, load_fixtures
+from benchmarks.fake_services import parse_postgrest_query
+from benchmarks.run import percentile, summarize
+from benchmarks.loadgen import capacity, poisson_arrivals, prompt_mix, run_open_loop, summarize_rate
+from orchestration.router import embed_text
+
+NO_LATENCY = Latency(scale=0.0)
+
+
+def test_percentile_and_summary():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    stats = summarize(values, wall_seconds=10.0, errors=2, timeouts=3)
+    assert stats["ok"] == 100 and stats["requests"] == 105
+    assert stats["throughput_rps"] == 10.0
+    assert stats["error_rate"] == round(5 / 105, 4)
+
+
+def test_fake_supabase_filters_like_postgrest():
+    db = FakeSupabase({"t": [{"name": "a", "gpa": 80}, {"name": "b", "gpa": 90}, {"name": "c", "gpa": None}]}, NO_LATENCY)
+    assert db.table("t").select("name").lte("gpa", 85).execute().data == [{"name": "a"}]
+    assert [r["name"] for r in db.table("t").select("*").in_("name", ["b", "c"]).execute().data] == ["b", "c"]
+    db.table("t").upsert([{"name": "a", "gpa": 70}], on_conflict="name").execute()
+    assert db.table("t").select("gpa").eq("name", "a").limit(1).execute().data == [{"gpa": 70}]
+
+
+def test_fake_index_and_chat_replay():
+    fixtures = load_fixtures()
+    chunks = fixtures["supabase"]["factsheets_chunks"]
+    index = FakeIndex(chunks, NO_LATENCY)
+    uni = chunks[0]["university"]
+    matches = index.query(vector=embed_text("visa processing months"), top_k=2, filter={"university": {"$in": [uni]}})["matches"]
+    assert len(matches) == 2 and all(m["metadata"]["university"] == uni for m in matches)
+    assert "VISA" in matches[0]["metadata"]["text"]
+    ranked = chat_response(fixtures, "You are an elite study-abroad placement API.", f'[{{"university_name": "{uni}"}}]')
+    assert uni in ranked and chunks[-1]["university"] not in ranked
+
+
+def test_parse_postgrest_query():
+    columns, filters, limit, on_conflict = parse_postgrest_query(
+        'select=name%2Ccountry&min_gpa=lte.85&msc_allowed=eq.true&chunk_id=in.(%22a%2Cb%22%2Cc)&limit=1&on_conflict=university'
+    )
+    assert columns == "name,country" and limit == 1 and on_conflict == "university"
+    assert filters == [("lte", "min_gpa", 85), ("eq", "msc_allowed", True), ("in", "chunk_id", ["a,b", "c"])]
+
+
+def test_open_loop_keeps_arriving_and_capacity_finds_saturation():
+    arrivals = poisson_arrivals(20.0, 1.0, seed=1)
+    assert 8 <= len(arrivals) <= 40 and arrivals == sorted(arrivals) and arrivals[-1] < 1.0
+    prompts = prompt_mix(len(arrivals), json_share=0.5, seed=1)
+    assert any(p.startswith("{") for p in prompts) and any(not p.startswith("{") for p in prompts)
+
+    # A server slower than the arrival gap must not slow the arrivals down (open loop)
+    start = time.perf_counter()
+    latencies, counts, wall = run_open_loop(lambda prompt, timeout: time.sleep(0.2) or "ok", prompts, arrivals, timeout=5)
+    assert counts["ok"] == len(arrivals) and time.perf_counter() - start < 1.0 + 0.5
+
+    runs = [
+        summarize_rate(1.0, 10, [100.0] * 10, {"ok": 10, "error": 0, "timeout": 0, "rate_limited": 0}, 10.0),
+        summarize_rate(2.0, 10, [150.0] * 20, {"ok": 20, "error": 0, "timeout": 0, "rate_limited": 0}, 10.0),
+        summarize_rate(4.0, 10, [900.0] * 25, {"ok": 25, "error": 0, "timeout": 15, "rate_limited": 0}, 10.0),
+    ]
+    report = capacity(runs)
+    assert report["capacity_rps"] == 2.0 and report["saturation_rps"] == 4.0 and report["saturated_by"] == "errors"
+    assert capacity(runs[:2], p95_slo_ms=120)["saturated_by"] == "latency"
+
+
+if __name__ == "__main__":
+    test_percentile_and_summary()
+    test_fake_supabase_filters_like_postgrest()
+    test_fake_index_and_chat_replay()
+    test_parse_postgrest_query()
+    test_open_loop_keeps_arriving_and_capacity_finds_saturation()
@@ -0,0 +1,43 @@
+import os
+from pinecone_db.chunk_store import chunk_id, legacy_chunk_id, legacy_chunk_id_to_stable, save_chunk_store, get_chunk_texts, load_chunks
+from pinecone_db.lexical_index import get_lexical_index
+
+ROWS = [
+    {"country": "Germany", "university": "TU Munich", "file_name": "fact_sheet.pdf", "chunk_index": 0,
+     "text": "Minimum 20 ECTS per semester.", "headers": {"Header 1": "ACADEMIC", "start_index": 0}},
+    {"country": "Germany", "university": "TU Munich", "file_name": "fact_sheet.pdf", "chunk_index": 1,
+     "text": "Visa processing takes 3 months.", "headers": {"Header 1": "VISA", "start_index": 0}},
+]
+
+
+def test_chunk_id_is_stable_and_structured():
+    first = chunk_id(ROWS[0])
+    assert first == chunk_id(dict(ROWS[0]))
+    assert first.startswith("chk-") and first != chunk_id(ROWS[1])
+    legacy_row = dict(ROWS[0], file_name="factsheet.pdf")
+    assert legacy_chunk_id(legacy_row) == "Germany_TU Munich_factsheet.pdf_0"
+    assert legacy_chunk_id_to_stable(legacy_chunk_id(legacy_row)) == chunk_id(legacy_row)
+    assert legacy_chunk_id_to_stable("not-a-chunk-id") is None
+
+
+def test_bulk_lookup_and_lexical_index_from_store(tmp_path):
+    path = str(tmp_path / "chunks.sqlite")
+    save_chunk_store(ROWS, path)
+    ids = [chunk_id(row) for row in ROWS]
+    assert get_chunk_texts(ids + ["chk-missing"], path) == {ids[0]: ROWS[0]["text"], ids[1]: ROWS[1]["text"]}
+    assert [doc["headers"]["Header 1"] for doc in load_chunks(path)] == ["ACADEMIC", "VISA"]
+    assert {doc["file_name"] for doc in load_chunks(path)} == {"fact_sheet.pdf"}
+
+    index = get_lexical_index(path)
+    assert index.search("visa months", top_k=1, university="TU Munich")[0][0]["id"] == ids[1]
+
+    # Re-ingestion swaps the file; readers pick up the new contents
+    os.utime(path, (1, 1))
+    save_chunk_store(ROWS[:1], path)
+    assert get_chunk_texts(ids, path) == {ids[0]: ROWS[0]["text"]}
+    assert len(get_lexical_index(path).docs) == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,37 @@
+from data_pipeline import context_data
+
+
+def test_tables_parse_into_typed_records():
+    index = context_data.reference_index()
+    assert len(index["costs"]) == 8 and len(index["social"]) == 20
+    eastern = index["costs"]["Eastern Europe"]
+    assert (eastern.semester_low_usd, eastern.semester_high_usd, eastern.semester_mid_usd) == (2200, 4000, 3100)
+    # The structured view round-trips to the original markdown
+    assert context_data.format_social_rows(index["social"]) == context_data.SOCIAL_SENTIMENT_TABLE.strip()
+
+
+def test_lookups_by_catalog_names():
+    assert context_data.social_record("Czech Technical University in Prague").university == "CTU (Prague)"
+    assert context_data.social_record("Tsinghua University").level == "Low/Medium"
+    assert context_data.social_record("McGill University").score == 100
+    assert context_data.social_record("CMU").university == "Carnegie Mellon (CMU)"
+    assert context_data.social_record("Polytechnique Montréal") is None  # not Ecole Polytechnique
+    assert context_data.region_for_country("czechia") == "Eastern Europe"
+    assert context_data.cost_range("Italy").region == "Western / Southern Europe"
+    assert context_data.cost_range("Atlantis") is None
+
+
+def test_relevant_rows_only_cover_the_given_universities():
+    rows = context_data.relevant_reference_rows([
+        {"name": "Technical University of Denmark", "country": "Denmark"},
+        {"name": "University of Cyprus", "country": "Cyprus"},
+        {"name": "Hebrew University", "country": "Israel"},
+    ])
+    assert [r.university for r in rows["social"]] == ["DTU"]
+    assert rows["unmapped_countries"] == ["Israel"]
+
+
+if __name__ == "__main__":
+    test_tables_parse_into_typed_records()
+    test_lookups_by_catalog_names()
+    test_relevant_rows_only_cover_the_given_universities()
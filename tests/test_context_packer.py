@@ -0,0 +1,59 @@
+import orchestration.context_packer as packer
+from orchestration.context_packer import pack_context
+from pinecone_db.chunk_store import chunk_id
+
+SECTION = {"Header 1": "COSTS"}
+
+
+def _chunk(idx, start, text, headers=SECTION, file_name="facts.pdf"):
+    row = {"country": "DE", "university": "Uni A", "file_name": file_name, "chunk_index": idx}
+    return {"id": chunk_id(row), **row, "text": text, "headers": dict(headers, start_index=start)}
+
+
+def _use_char_estimate(monkeypatch):
+    monkeypatch.setattr(packer, "_encoder", {"value": None, "loaded": True})
+
+
+def test_overlapping_chunks_are_deduplicated_by_start_index(monkeypatch):
+    _use_char_estimate(monkeypatch)
+    doc = "Rent is 400 EUR per month. Insurance costs 110 EUR per month. Visa takes 3 months."
+    first = _chunk(0, 0, doc[:45])
+    second = _chunk(1, 30, doc[30:])  # overlaps the end of the first chunk
+    assert pack_context([second, first], token_budget=1000) == doc
+    assert pack_context([first, first], token_budget=1000) == doc[:45]
+    # The same offsets in another file are a different passage
+    other_file = _chunk(0, 30, doc[30:], file_name="guide.pdf")
+    assert pack_context([first, other_file], token_budget=1000) == doc[:45] + "\n" + doc[30:]
+
+
+def test_sections_keep_relevance_order_and_document_order_within(monkeypatch):
+    _use_char_estimate(monkeypatch)
+    visa = _chunk(5, 0, "Visa section text.", {"Header 1": "VISA"})
+    costs_late = _chunk(2, 100, "Later cost text.")
+    costs_early = _chunk(1, 0, "Early cost text.")
+    packed = pack_context([costs_late, visa, costs_early], token_budget=1000)
+    assert packed.split("\n") == ["Early cost text.", "Later cost text.", "Visa section text."]
+
+
+def test_budget_is_respected(monkeypatch):
+    _use_char_estimate(monkeypatch)
+    chunks = [_chunk(i, i * 1000, str(i) * 800, {"Header 1": f"S{i}"}) for i in range(5)]
+    packed = pack_context(chunks, token_budget=450)
+    assert packer.count_tokens(packed.replace("\n", "")) <= 450
+    assert packed.startswith("0" * 800)
+    assert len(packed.split("\n")) == 3  # two full chunks + one truncated piece
+
+
+def test_chunks_without_start_index_are_kept_separate(monkeypatch):
+    _use_char_estimate(monkeypatch)
+    chunks = [{"id": "x_0", "text": "First."}, {"id": "x_1", "text": "Second."}, {"id": "x_2", "text": "First."}]
+    assert pack_context(chunks, token_budget=1000) == "First.\nSecond."
+    # Mixed with positioned chunks of the same section: positioned ones first, nothing joined to the others
+    positioned = _chunk(0, 0, "Rent is 400 EUR.")
+    unpositioned = {**_chunk(1, 0, " Unrelated."), "headers": SECTION}
+    assert pack_context([unpositioned, positioned], token_budget=1000) == "Rent is 400 EUR.\n Unrelated."
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
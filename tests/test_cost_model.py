@@ -0,0 +1,54 @@
+from orchestration import cost_model
+from utils.shared_state import MemoryBackend
+
+
+def test_estimates_are_deterministic_and_ordered_by_cost():
+    munich = cost_model.estimate_costs("Technical University of Munich", "Germany", usd_to_eur=0.9)
+    assert munich == cost_model.estimate_costs("TUM", "germany", usd_to_eur=0.9)
+    assert munich["city"] == "Munich" and munich["rate_source"] == "given"
+    assert munich["semester_usd"]["low"] <= munich["semester_usd"]["mid"] <= munich["semester_usd"]["high"]
+    assert munich["semester_eur"] == round(munich["semester_usd"]["mid"] * 0.9, -2)
+    assert munich["monthly_housing_eur"] < munich["monthly_living_eur"]
+
+    zurich = cost_model.estimate_costs("ETH Zurich", "Switzerland", usd_to_eur=0.9)
+    iasi = cost_model.estimate_costs("Alexandru Ioan Cuza University of Iasi", "Romania", usd_to_eur=0.9)
+    assert iasi["financial_score"] > munich["financial_score"] > zurich["financial_score"]
+    assert 0 <= zurich["financial_score"] and iasi["financial_score"] <= 100
+    assert cost_model.estimate_costs("Hebrew University", "Israel", usd_to_eur=0.9) is None
+
+
+def test_stated_costs_are_kept_and_missing_ones_filled():
+    estimate = cost_model.estimate_costs("University of Cyprus", "Cyprus", usd_to_eur=0.9)
+    extraction = {"housing_and_logistics": {"estimated_housing_cost_per_month": 350, "estimated_living_cost_per_month": None}}
+    filled = cost_model.with_cost_estimates(extraction, estimate)
+    housing = filled["housing_and_logistics"]
+    assert housing["estimated_housing_cost_per_month"] == 350
+    assert housing["estimated_living_cost_per_month"] == estimate["monthly_living_eur"]
+    assert housing["cost_estimates_from"]["fields"] == ["estimated_living_cost_per_month"]
+    assert extraction["housing_and_logistics"]["estimated_living_cost_per_month"] is None  # input left untouched
+    assert cost_model.with_cost_estimates(None, None) == {}
+
+
+def test_exchange_rate_is_shared_and_falls_back(monkeypatch):
+    backend = MemoryBackend()
+    calls = []
+    monkeypatch.setattr(cost_model, "get_shared_state", lambda: backend)
+    monkeypatch.setattr(cost_model, "_fx", {"rate": None, "source": None, "expires_at": 0.0})
+    monkeypatch.setattr(cost_model.web_enrichment, "fetch_exchange_rate_usd_to_eur", lambda: calls.append(1) or None)
+    assert cost_model.usd_to_eur_rate() == (cost_model.USD_TO_EUR_FALLBACK, "fallback")
+
+    monkeypatch.setattr(cost_model.web_enrichment, "fetch_exchange_rate_usd_to_eur", lambda: calls.append(1) or 0.85)
+    cost_model._fx["expires_at"] = 0.0
+    assert cost_model.usd_to_eur_rate() == (0.85, "live")
+    assert cost_model.usd_to_eur_rate() == (0.85, "live")  # served from memory until it expires
+    assert len(calls) == 2
+
+    # Another worker finds the rate in the shared state without fetching
+    cost_model._fx.update(rate=None, expires_at=0.0)
+    assert cost_model.usd_to_eur_rate() == (0.85, "cached")
+    assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
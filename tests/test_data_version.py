@@ -0,0 +1,57 @@
+import time
+
+from benchmarks.replay import FakeSupabase, Latency
+from utils import data_version
+from utils.shared_state import MemoryBackend
+
+
+def _fresh(monkeypatch, db=None, state=None):
+    db = db or FakeSupabase({}, Latency(scale=0.0))
+    state = state or MemoryBackend()
+    monkeypatch.setattr(data_version, "get_supabase", lambda: db)
+    monkeypatch.setattr(data_version, "get_shared_state", lambda: state)
+    monkeypatch.setattr(data_version, "_state", {"version": 0, "datasets": {}, "checked_at": None, "error": None})
+    return db, state
+
+
+def test_digest_ignores_row_order_and_ids():
+    rows = [{"id": 1, "name": "DTU", "min_gpa": 80}, {"id": 2, "name": "CTU", "min_gpa": 75}]
+    reordered = [{"min_gpa": 75, "name": "CTU", "id": 9}, {"name": "DTU", "min_gpa": 80, "id": 8}]
+    assert data_version.content_digest(rows) == data_version.content_digest(reordered)
+    assert data_version.content_digest(rows) != data_version.content_digest([{**rows[0], "min_gpa": 85}, rows[1]])
+
+
+def test_version_moves_only_when_content_changes(monkeypatch):
+    db, state = _fresh(monkeypatch)
+    rows = [{"name": "DTU", "min_gpa": 80}]
+    assert data_version.record_ingestion("universities_requirements", rows) == 1
+    assert data_version.record_ingestion("universities_requirements", list(rows)) == 1
+    assert data_version.record_ingestion("factsheets_chunks", [{"text": "Rent is 400 EUR"}]) == 2
+    assert data_version.record_ingestion("universities_requirements", [{"name": "DTU", "min_gpa": 85}]) == 3
+
+    # Another process: sees the table on its first check and the shared-state value without waiting for the next one
+    _fresh(monkeypatch, db=db, state=state)
+    assert data_version.current_version() == 3
+    state.set(data_version.SHARED_KEY, b"4")
+    assert data_version.current_version(max_age=3600) == 4
+    report = data_version.report()
+    assert report["datasets"]["universities_requirements"]["version"] == 3 and report["datasets"]["factsheets_chunks"]["row_count"] == 1
+
+
+
+def test_failed_precomputed_reload_keeps_the_last_snapshot(monkeypatch):
+    from orchestration.specialists import analyzer
+    row = {"university": "DTU", "chunks_hash": "h", "logistics_and_experience": {"housing": "dorms"}}
+    monkeypatch.setattr(analyzer, "_precomputed", {"loaded_at": time.time(), "version": 1, "rows": {"DTU": row}, "retry_at": 0.0})
+    monkeypatch.setattr(analyzer.data_version, "current_version", lambda: 2)
+    loads = []
+    monkeypatch.setattr(analyzer, "get_supabase", lambda: loads.append(1) or None)
+
+    assert analyzer.get_precomputed_logistics("DTU") == row
+    assert analyzer.get_precomputed_logistics("DTU") == row
+    assert len(loads) == 1  # not retried on every lookup
+    assert analyzer._precomputed["version"] == 1  # version 2 is still reloaded once the retry time passes
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
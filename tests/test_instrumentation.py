@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from utils.instrumentation import span, record_tokens, record_cache, submit, metrics_snapshot, Histogram
+
+
+def test_span_collects_nested_tokens_and_cache_hits():
+    with span("test.outer") as outer:
+        with span("test.inner") as inner:
+            record_tokens({"prompt_tokens": 10, "completion_tokens": 5})
+        record_cache("test_cache", hit=True)
+    fields = outer.as_step_fields()
+    assert fields["tokens"] == {"prompt": 10, "completion": 5, "total": 15}
+    assert fields["cache"] == {"hits": 1, "misses": 0}
+    assert inner.as_step_fields()["tokens"]["total"] == 15
+    assert fields["duration_ms"] >= 0
+
+
+def test_submit_attributes_worker_thread_work_to_caller_span():
+    with span("test.threaded") as stats, ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [submit(executor, record_tokens, {"prompt_tokens": 1, "completion_tokens": 1}) for _ in range(4)]
+        for f in futures:
+            f.result()
+    assert stats.as_step_fields()["tokens"]["total"] == 8
+
+
+def test_histogram_quantiles_and_registry():
+    hist = Histogram(buckets=(10, 100, 1000))
+    for v in (1, 2, 50, 500):
+        hist.observe(v)
+    assert hist.quantile(0.5) == 10
+    assert hist.quantile(0.99) == 1000
+    keys = [key for key in metrics_snapshot()["histograms"] if key[0] == "span_duration_ms"]
+    assert any(dict(labels).get("span") == "test.outer" for _, labels in keys)
+
+
+if __name__ == "__main__":
+    test_span_collects_nested_tokens_and_cache_hits()
+    test_submit_attributes_worker_thread_work_to_caller_span()
+    test_histogram_quantiles_and_registry()
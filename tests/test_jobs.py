@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+
+from api import jobs
+from orchestration.supervisor import AgentState, Supervisor
+
+
+def _wait(job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get_job(job_id, include_events=True)
+        if job["status"] in jobs.TERMINAL_STATUSES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_enqueue_reports_queue_wait_and_execution_separately():
+    def work(progress):
+        time.sleep(0.05)
+        progress("filter", 1, 3, steps=[])
+        return {"status": "ok"}
+
+    queued = jobs.enqueue("test", work, total=3)
+    job = _wait(queued["job_id"])
+    assert job["status"] == "done" and job["results"] == {"status": "ok"}
+    assert job["events"][0]["stage"] == "filter" and job["events"][0]["completed"] == 1
+    assert job["execution_ms"] >= 50
+    assert job["queue_wait_ms"] is not None and job["queue_wait_ms"] < job["execution_ms"]
+
+
+def test_enqueue_rejects_when_queue_is_full(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_MAX_QUEUE", 1)
+    release = threading.Event()
+    accepted, rejected = [], None
+    try:
+        for _ in range(jobs.JOB_MAX_WORKERS + 1):
+            accepted.append(jobs.enqueue("test", lambda progress: release.wait(5))["job_id"])
+        try:
+            jobs.enqueue("test", lambda progress: None)
+        except jobs.QueueFull as e:
+            rejected = e
+        assert rejected is not None and rejected.depth == 1 and rejected.retry_after >= 1
+        assert jobs.pool_stats()["waiting"] == 1
+    finally:
+        release.set()
+    for job_id in accepted:
+        assert _wait(job_id)["status"] == "done"
+    assert jobs.pool_stats()["running"] == 0
+
+
+def test_concurrent_streamed_runs_return_their_own_results():
+    def filter_node(state):
+        time.sleep(random.uniform(0, 0.02))
+        return {"analysis": state["user_requests"][-1], "steps": [{"module": "Filter"}]}
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("filter", filter_node)
+    workflow.add_edge(START, "filter")
+    workflow.add_edge("filter", END)
+    agent = Supervisor.__new__(Supervisor)  # the real graph calls the upstreams
+    agent.app = workflow.compile(checkpointer=InMemorySaver())
+
+    def run(prompt):
+        return lambda progress: agent.run(prompt, {"gpa": 90}, thread_id="shared", progress=progress)
+
+    queued = {}
+    for i in range(12):
+        queued[f"request {i}"] = jobs.enqueue("test", run(f"request {i}"))["job_id"]
+        time.sleep(0.005)
+    for prompt, job_id in queued.items():
+        job = _wait(job_id)
+        assert job["status"] == "done", job["error"]
+        assert job["results"]["analysis"] == prompt
+        assert [step["module"] for step in job["results"]["steps"]] == ["Filter"]
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
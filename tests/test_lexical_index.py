@@ -0,0 +1,40 @@
+from pinecone_db.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCS = [
+    {"id": "a", "university": "Uni A", "text": "Students must take a minimum of 20 ECTS credits per semester."},
+    {"id": "b", "university": "Uni A", "text": "The visa process takes about 3 months. Apply for a residence permit early."},
+    {"id": "c", "university": "Uni A", "text": "Housing: the dormitory is guaranteed for exchange students."},
+    {"id": "d", "university": "Uni B", "text": "Minimum ECTS load is 30 credits; visa support is provided."},
+]
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The minimum ECTS, per semester!") == ["minimum", "ects", "per", "semester"]
+
+
+def test_bm25_ranks_exact_term_matches_first():
+    index = BM25Index(DOCS)
+    hits = index.search("minimum ECTS credits", top_k=2)
+    assert [doc["id"] for doc, _ in hits][0] in ("a", "d")
+    assert index.search("visa months", top_k=1)[0][0]["id"] == "b"
+
+
+def test_bm25_university_filter():
+    index = BM25Index(DOCS)
+    hits = index.search("minimum ECTS visa", top_k=5, university="Uni B")
+    assert [doc["id"] for doc, _ in hits] == ["d"]
+    assert index.search("ECTS", university="Unknown") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "x"], ["y"]])
+    assert fused[0] == "y"
+    assert set(fused) == {"x", "y", "z"}
+    assert fused[-1] == "z"
+
+
+if __name__ == "__main__":
+    test_tokenize_drops_stopwords_and_punctuation()
+    test_bm25_ranks_exact_term_matches_first()
+    test_bm25_university_filter()
+    test_reciprocal_rank_fusion_rewards_agreement()
@@ -0,0 +1,30 @@
+import threading
+
+import pytest
+from api import readiness
+
+
+def test_hung_probe_is_not_started_again(monkeypatch):
+    release = threading.Event()
+    calls = []
+    monkeypatch.setattr(readiness, "PROBES", {"hung": lambda: calls.append(1) or release.wait(5), "fast": lambda: None})
+    monkeypatch.setattr(readiness, "READINESS_PROBE_TIMEOUT_SECONDS", 0.1)
+    monkeypatch.setattr(readiness, "_results", {})
+    monkeypatch.setattr(readiness, "_running", {})
+    try:
+        readiness.run_probes()
+        assert readiness._results["hung"]["error"] == "timeout after 0.1s"
+        readiness.run_probes()
+        assert readiness._results["hung"]["error"] == "previous probe still running"
+        assert readiness._results["fast"]["ok"]
+        assert len(calls) == 1
+        assert readiness.readiness()["status"] == "not_ready"
+    finally:
+        release.set()
+    readiness._running["hung"].result(timeout=1)
+    readiness.run_probes()
+    assert readiness._results["hung"]["ok"] and len(calls) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from utils.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, backoff_delay,
+    call_timeout, deadline_scope, hedged_call, remaining_time,
+)
+from utils import llmod_client
+
+
+def test_circuit_breaker_opens_and_recovers_after_reset_timeout():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    breaker.before_call()  # half-open trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_backoff_is_jittered_and_honors_retry_after():
+    delays = [backoff_delay(3, base=1, cap=4) for _ in range(50)]
+    assert all(0 <= d <= 4 for d in delays)
+    assert backoff_delay(0, base=1, cap=4, retry_after=7) == 7
+
+
+def test_deadline_scope_bounds_call_timeouts():
+    assert remaining_time() is None
+    assert call_timeout(90) == 90
+    with deadline_scope(2):
+        assert call_timeout(90) <= 2
+        with deadline_scope(30):
+            assert remaining_time() <= 2  # nested scopes never extend the budget
+    with deadline_scope(0.1):
+        with pytest.raises(DeadlineExceeded):
+            call_timeout(90)
+
+
+def test_hedged_call_runs_the_primary_inline_and_falls_back_to_the_duplicate():
+    caller = threading.current_thread()
+    calls = []
+
+    def primary_times_out():
+        calls.append(threading.current_thread() is caller)
+        if len(calls) == 1:
+            time.sleep(0.3)
+            raise ConnectionError("read timed out")
+        time.sleep(0.01)
+        return "duplicate"
+
+    start = time.perf_counter()
+    assert hedged_call(primary_times_out, hedge_after=0.05) == "duplicate"
+    assert time.perf_counter() - start < 0.4
+    assert calls == [True, False]
+
+    # A primary that answers before hedge_after never starts a duplicate
+    calls.clear()
+    assert hedged_call(lambda: calls.append(1) or "primary", hedge_after=0.05) == "primary"
+    time.sleep(0.1)
+    assert calls == [1]
+
+
+def _breaker_after_failures(monkeypatch, reset_timeout):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=reset_timeout)
+    breaker.before_call()
+    breaker.record_failure()
+    monkeypatch.setattr(llmod_client, "get_breaker", lambda *args: breaker)
+    return breaker
+
+
+def test_expired_deadline_does_not_leak_the_half_open_trial(monkeypatch):
+    breaker = _breaker_after_failures(monkeypatch, reset_timeout=0.0)  # next call is the half-open trial
+    reply = {"choices": [{"message": {"content": "ok"}}]}
+    monkeypatch.setattr(llmod_client, "_post", lambda *args: reply)
+    with deadline_scope(0.1):
+        with pytest.raises(DeadlineExceeded):
+            llmod_client._llmod_chat("system", "user")
+    assert llmod_client._llmod_chat("system", "user") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_expired_deadline_does_not_close_an_open_breaker(monkeypatch):
+    breaker = _breaker_after_failures(monkeypatch, reset_timeout=60)
+    monkeypatch.setattr(llmod_client, "_post", lambda *args: pytest.fail("no upstream call expected"))
+    with deadline_scope(0.1):
+        with pytest.raises(DeadlineExceeded):
+            llmod_client._get_embedding("text")
+    assert breaker.state == "open"
+
+    breaker.opened_at -= 60  # half-open: the deadline error must leave the trial slot free
+    with deadline_scope(0.1):
+        with pytest.raises(DeadlineExceeded):
+            llmod_client._get_embedding("text")
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_analyzer_budget_starts_when_the_call_runs(monkeypatch):
+    from orchestration.specialists import analyzer
+    monkeypatch.setattr(analyzer, "_budget_executor", ThreadPoolExecutor(max_workers=1))
+    busy = analyzer._start_budgeted(1.0, time.sleep, 0.3)  # occupies the only worker
+    queued = analyzer._start_budgeted(0.4, lambda: time.sleep(0.05) or "done")
+    assert analyzer._await_budgeted(queued) == ("done", None)
+    assert analyzer._await_budgeted(busy) == (None, None)
+
+    # Waiting for a worker is bounded by the budget too, and degrades like a budget timeout
+    busy = analyzer._start_budgeted(1.0, time.sleep, 0.3)
+    starved = analyzer._start_budgeted(0.1, lambda: "never runs")
+    started = time.monotonic()
+    assert analyzer._await_budgeted(starved) == (None, "timeout after 0.1s (waiting for a worker)")
+    assert time.monotonic() - started < 0.2
+    assert starved[0].cancelled()
+    analyzer._await_budgeted(busy)
+
+    overrun = analyzer._start_budgeted(0.05, time.sleep, 0.3)
+    assert analyzer._await_budgeted(overrun) == (None, "timeout after 0.1s")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,58 @@
+from orchestration import response_cache
+from utils.shared_state import MemoryBackend
+
+
+def _use_fresh_state(monkeypatch, version=None):
+    backend = MemoryBackend()
+    monkeypatch.setattr(response_cache, "get_shared_state", lambda: backend)
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_TTL_SECONDS", 60)
+    monkeypatch.setattr(response_cache.data_version, "current_version", lambda: (version or {"value": 0})["value"])
+
+
+def test_profile_hash_ignores_formatting_but_not_content():
+    a = {"academic_profile": {"gpa": 85, "major": "CS"}, "preferences": {"free_language_preferences": "party  vibe "}, "free_text": ""}
+    b = {"preferences": {"free_language_preferences": "party vibe", "must_be_erasmus": None}, "academic_profile": {"major": "CS", "gpa": 85}}
+    assert response_cache.profile_hash(a, 5) == response_cache.profile_hash(b, 5)
+    assert response_cache.profile_hash(a, 5) != response_cache.profile_hash(a, 3)
+    assert response_cache.profile_hash(a, 5) != response_cache.profile_hash({**a, "academic_profile": {"gpa": 90}}, 5)
+
+
+def test_cached_response_until_the_data_version_moves(monkeypatch):
+    version = {"value": 1}
+    _use_fresh_state(monkeypatch, version)
+    profile = {"academic_profile": {"gpa": 85}}
+    steps = [{"module": "Filter"}, {"module": "Ranker"}, {"module": "Analyzer"}]
+
+    assert response_cache.get_response(profile, 5) is None
+    response_cache.put_response(profile, 5, "analysis", steps)
+    assert response_cache.get_response(profile, 5) == {"response": "analysis", "steps": steps}
+
+    version["value"] = 2  # ingestion changed a dataset
+    assert response_cache.get_response(profile, 5) is None
+
+
+def test_run_overlapping_a_reingest_is_stored_under_its_starting_version(monkeypatch):
+    version = {"value": 1}
+    _use_fresh_state(monkeypatch, version)
+    profile = {"academic_profile": {"gpa": 85}}
+    steps = [{"module": "Filter"}, {"module": "Analyzer"}]
+
+    started_at = 1
+    assert response_cache.get_response(profile, 5, started_at) is None
+    version["value"] = 2  # re-ingest while the run is in flight
+    response_cache.put_response(profile, 5, "analysis from v1 data", steps, started_at)
+    assert response_cache.get_response(profile, 5) is None
+
+
+def test_follow_ups_and_degraded_runs_are_not_stored(monkeypatch):
+    _use_fresh_state(monkeypatch)
+    profile = {"academic_profile": {"gpa": 85}}
+    response_cache.put_response(profile, 5, "follow-up", [{"module": "Analyzer"}])
+    assert response_cache.get_response(profile, 5) is None
+    response_cache.put_response(profile, 5, "degraded", [{"module": "Filter"}, {"module": "Analyzer", "degraded": ["wikipedia"]}])
+    assert response_cache.get_response(profile, 5) is None
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
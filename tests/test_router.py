@@ -0,0 +1,65 @@
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+
+from orchestration.router import route_locally, classify_by_centroid, ROUTER_LABELS
+from orchestration.supervisor import AgentState, Supervisor, choose_entry_point
+
+
+def test_keyword_rules_route_obvious_follow_ups():
+    assert route_locally("my gpa is actually 92")[0] == "filter"
+    assert route_locally("I want more party and nightlife")[0] == "rank"
+    assert route_locally("tell me more about the visa process")[0] == "analyze"
+
+
+def test_centroid_classifier_handles_unmatched_phrasing():
+    label, confidence = classify_by_centroid("I changed my mind, I study biology")
+    assert label in ROUTER_LABELS
+    assert label == "filter"
+    assert confidence > 0
+
+
+def test_low_confidence_defers_to_llm():
+    task, confidence, method = route_locally("go again")
+    assert task is None
+    assert method == "none"
+    assert route_locally("")[0] is None
+
+
+def test_ambiguous_follow_ups_are_not_routed_locally():
+    # "may" is not a month here; low-margin centroid matches go to the LLM router
+    assert route_locally("May I see the list again?")[0] != "filter"
+    assert route_locally("Drop the French ones")[0] is None
+
+
+def test_new_profiles_always_filter():
+    example = '{"academic_profile": {"gpa": 85}, "preferences": {"free_language_preferences": "party vibe, easy to make friends"}}'
+    assert route_locally(example) == ("filter", 1.0, "profile")
+    follow_up = {"request_count": 2, "user_requests": ["first", "cheaper options please"]}
+    assert choose_entry_point(follow_up) == "rank"
+    assert choose_entry_point({**follow_up, "profile_changed": True}) == "filter"
+
+
+def test_follow_up_with_another_profile_refilters():
+    workflow = StateGraph(AgentState)
+    for node in ROUTER_LABELS:
+        workflow.add_node(node, lambda state, node=node: {"analysis": node, "steps": [{"module": node}]})
+        workflow.add_edge(node, END)
+    workflow.add_conditional_edges(START, choose_entry_point, {node: node for node in ROUTER_LABELS})
+    agent = Supervisor.__new__(Supervisor)  # the real nodes call the upstreams
+    agent.app = workflow.compile(checkpointer=InMemorySaver())
+
+    profile = {"academic_profile": {"gpa": 95}}
+    assert agent.run("first", profile, thread_id="t")["analysis"] == "filter"
+    assert agent.run("cheaper options please", profile, thread_id="t")["analysis"] == "rank"
+    other = agent.run("cheaper options please", {"academic_profile": {"gpa": 85}}, thread_id="t")
+    assert other["analysis"] == "filter" and other["user_profile"] == {"academic_profile": {"gpa": 85}}
+    assert agent.run("cheaper options please", thread_id="t")["analysis"] == "rank"
+
+
+if __name__ == "__main__":
+    test_keyword_rules_route_obvious_follow_ups()
+    test_centroid_classifier_handles_unmatched_phrasing()
+    test_low_confidence_defers_to_llm()
+    test_ambiguous_follow_ups_are_not_routed_locally()
+    test_new_profiles_always_filter()
+    test_follow_up_with_another_profile_refilters()
@@ -0,0 +1,117 @@
+import operator
+import os
+import tempfile
+import threading
+import time
+from typing import Annotated, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+from benchmarks.fake_services import _ThreadingTCPServer, _redis_handler
+from orchestration.checkpointer import SharedStateSaver
+from utils.shared_state import MemoryBackend, RedisBackend, SQLiteBackend, SharedState, create_backend, url_is_shared
+
+
+def _exercise(backend):
+    backend.set("a", b"1")
+    assert backend.get("a") == b"1" and backend.get("missing") is None
+    backend.set_json("j", {"x": [1, "é"]}, ttl=60)
+    assert backend.get_json("j") == {"x": [1, "é"]}
+    assert 55 < backend.expires_at("j") - time.time() <= 60 and backend.expires_at("a") is None
+    assert backend.incr("n", 2, ttl=60) == 2 and backend.incr("n", 3, ttl=60) == 5
+    backend.set("short", b"x", ttl=0.05)
+    time.sleep(0.1)
+    assert backend.get("short") is None and backend.incr("short", 1) == 1  # expired keys start over
+    backend.delete("a")
+    assert backend.get("a") is None and backend.ping()
+
+
+def test_backends():
+    _exercise(MemoryBackend())
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        _exercise(SQLiteBackend(path))
+        # Atomic counter across connections
+        backends = [SQLiteBackend(path) for _ in range(4)]
+        threads = [threading.Thread(target=lambda b=b: [b.incr("c") for _ in range(50)]) for b in backends]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert backends[0].get("c") == b"200"
+    server = _ThreadingTCPServer(("127.0.0.1", 0), _redis_handler(MemoryBackend()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        backend = create_backend(f"redis://127.0.0.1:{server.server_address[1]}/0")
+        assert isinstance(backend, RedisBackend)
+        _exercise(backend)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class _State(TypedDict):
+    messages: Annotated[list, operator.add]
+    count: int
+
+
+def _graph(checkpointer):
+    workflow = StateGraph(_State)
+    workflow.add_node("step", lambda state: {"messages": [f"reply {state.get('count', 0) + 1}"], "count": state.get("count", 0) + 1})
+    workflow.add_edge(START, "step")
+    workflow.add_edge("step", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def test_conversation_continues_on_another_worker():
+    backend = MemoryBackend()
+    worker_a, worker_b = _graph(SharedStateSaver(backend, history=2)), _graph(SharedStateSaver(backend, history=2))
+    config = {"configurable": {"thread_id": "t1"}}
+    worker_a.invoke({"messages": ["hi"]}, config=config)
+    worker_b.invoke({"messages": ["again"]}, config=config)
+    state = worker_a.get_state(config).values
+    assert state["count"] == 2 and state["messages"] == ["hi", "reply 1", "again", "reply 2"]
+    assert len(list(worker_b.get_state_history(config))) <= 2
+    assert worker_b.get_state({"configurable": {"thread_id": "other"}}).values == {}
+
+
+def test_pending_writes_are_stored_per_task_and_merged_on_read():
+    backend = MemoryBackend()
+    worker_a, worker_b = SharedStateSaver(backend), SharedStateSaver(backend)
+    config = {"configurable": {"thread_id": "t1"}}
+    _graph(worker_a).invoke({"messages": ["hi"]}, config=config)
+    latest = worker_a.get_tuple(config).config
+    doc = backend.get("checkpoint:t1")
+
+    worker_a.put_writes(latest, [("messages", ["from a"])], task_id="task-a")
+    worker_b.put_writes(latest, [("messages", ["from b"]), ("count", 5)], task_id="task-b")
+    worker_a.put_writes(latest, [("messages", ["ignored repeat"])], task_id="task-a")
+    assert backend.get("checkpoint:t1") == doc  # the conversation document is not rewritten
+
+    pending = SharedStateSaver(backend).get_tuple(config).pending_writes
+    assert sorted(pending) == [("task-a", "messages", ["from a"]), ("task-b", "count", 5), ("task-b", "messages", ["from b"])]
+    assert len(list(worker_b.list(config))[0].pending_writes) == 3
+
+    worker_b.delete_thread("t1")
+    assert backend.get("checkpoint-writes:t1:" + latest["configurable"]["checkpoint_id"]) is None
+
+
+def test_incomplete_backend_fails_at_construction_and_urls_classify_without_connecting():
+    class GetOnly(SharedState):
+        def get(self, key):
+            return None
+
+    try:
+        GetOnly()
+        raise AssertionError("a backend missing methods was constructed")
+    except TypeError:
+        pass
+    assert not url_is_shared("memory://") and not url_is_shared("")
+    assert url_is_shared("sqlite:////nonexistent/dir/state.db") and url_is_shared("redis://unreachable:6379/0")
+
+
+if __name__ == "__main__":
+    test_backends()
+    test_conversation_continues_on_another_worker()
+    test_pending_writes_are_stored_per_task_and_merged_on_read()
+    test_incomplete_backend_fails_at_construction_and_urls_classify_without_connecting()
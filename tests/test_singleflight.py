@@ -0,0 +1,101 @@
+import threading
+import time
+import pytest
+from utils import web_enrichment
+from utils.resilience import DeadlineExceeded, call_timeout, deadline_scope
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    group = SingleFlight("test")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("k", slow))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_errors_are_shared_and_keys_are_not_cached():
+    group = SingleFlight("test")
+    with pytest.raises(ValueError):
+        group.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert group.do("k", lambda: 1) == 1
+    assert group.do("k", lambda: 2) == 2
+
+
+def test_follower_with_more_time_makes_its_own_call_after_the_leader_runs_out():
+    group = SingleFlight("test")
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.3)
+        call_timeout(10)  # the leader's 0.6s budget is spent by now
+        return "value"
+
+    leader_errors = []
+
+    def leader():
+        with deadline_scope(0.6):
+            try:
+                group.do("k", upstream)
+            except DeadlineExceeded as e:
+                leader_errors.append(e)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    time.sleep(0.05)
+    with deadline_scope(5):
+        assert group.do("k", upstream) == "value"
+    thread.join()
+    assert len(leader_errors) == 1
+    assert len(calls) == 2
+
+
+def test_real_upstream_errors_are_shared_with_followers():
+    group = SingleFlight("test")
+    errors = []
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError("upstream said no")
+
+    def leader():
+        try:
+            group.do("k", failing)
+        except ValueError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    time.sleep(0.05)
+    with deadline_scope(5), pytest.raises(ValueError):
+        group.do("k", lambda: "not called")
+    thread.join()
+    assert len(errors) == 1
+
+
+def test_wikipedia_follower_that_runs_out_of_time_gets_none(monkeypatch):
+    monkeypatch.setattr(web_enrichment, "_fetch_wikipedia_summary", lambda title: time.sleep(0.3) or "summary")
+    leader_result = []
+    leader = threading.Thread(target=lambda: leader_result.append(web_enrichment.fetch_wikipedia_summary("ETH Zurich")))
+    leader.start()
+    time.sleep(0.05)
+    with deadline_scope(0.05):
+        assert web_enrichment.fetch_wikipedia_summary("ETH Zurich") is None
+    leader.join()
+    assert leader_result == ["summary"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
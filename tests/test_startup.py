@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+from api import startup
+
+
+def test_app_import_defers_heavy_clients():
+    code = (
+        "import sys, api.main; "
+        "print(','.join(m for m in ('langgraph', 'supabase', 'pinecone', 'orchestration.supervisor') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == ""
+
+
+def test_warmup_records_steps_and_failures():
+    calls = []
+
+    def broken():
+        raise RuntimeError("upstream down")
+
+    startup.warmup(
+        first_steps={"first": lambda: calls.append("first")},
+        steps={"ok": lambda: {"rows": 3}, "broken": broken},
+    )
+    report = startup.report()
+    assert startup.is_warm() and report["status"] == "done" and calls == ["first"]
+    assert report["steps"]["ok"]["ok"] and report["steps"]["ok"]["rows"] == 3
+    assert not report["steps"]["broken"]["ok"] and "upstream down" in report["steps"]["broken"]["error"]
+    assert report["warm_s"] is not None
+
+
+if __name__ == "__main__":
+    test_app_import_defers_heavy_clients()
+    test_warmup_records_steps_and_failures()
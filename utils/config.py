@@ -1,4 +1,5 @@
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,16 +9,35 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
 # --- Supabase Client Initialization ---
-try:
-    from supabase import create_client
-    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY) if SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY else None
-except (ImportError, Exception):
-    supabase = None
+# Created on first use: importing supabase-py is a large share of the API's cold start
+_supabase = {"client": None, "initialized": False}
+_supabase_lock = threading.Lock()
+
+def get_supabase():
+    """Shared Supabase client, created on the first call. None if not configured or the client cannot be created."""
+    if not _supabase["initialized"]:
+        with _supabase_lock:
+            if not _supabase["initialized"]:
+                try:
+                    from supabase import create_client
+                    client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY) if SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY else None
+                except (ImportError, Exception):
+                    client = None
+                _supabase.update(client=client, initialized=True)
+    return _supabase["client"]
+
+def __getattr__(name):
+    # `from utils.config import supabase` still works (scripts, tests); it creates the client at that point
+    if name == "supabase":
+        return get_supabase()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- Pinecone Setup (Vector/RAG) ---
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+PINECONE_HOST = os.getenv("PINECONE_HOST")  # Optional data-plane URL (skips the index lookup; e.g. a local fake service)
+PINECONE_QUERY_TIMEOUT = float(os.getenv("PINECONE_QUERY_TIMEOUT", "10"))  # seconds; shortened to the caller's deadline
 
 # Chunking configuration
 BASE_DIR = "data/external_universities"
@@ -25,7 +45,81 @@ CHUNK_SIZE = 2000  # characters per chunk
 CHUNK_OVERLAP = 300  # overlap between chunks
 TOP_K_RESULTS = 7  # For Pinecone queries
 
-LLMOD_BASE_URL = "https://api.llmod.ai"
+LLMOD_BASE_URL = os.getenv("LLMOD_BASE_URL", "https://api.llmod.ai")
 LLMOD_EMBEDDING_MODEL = "RPRTHPB-text-embedding-3-small"
 LLMOD_CHAT_MODEL = "RPRTHPB-gpt-5-mini"
 
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/api/rest_v1")
+
+# USD -> EUR rate for the cost model (orchestration/cost_model.py), cached in the shared state
+EXCHANGE_RATE_API_URL = os.getenv("EXCHANGE_RATE_API_URL", "https://api.exchangerate-api.com/v4/latest/USD")
+EXCHANGE_RATE_TTL_SECONDS = int(os.getenv("EXCHANGE_RATE_TTL_SECONDS", "21600"))
+USD_TO_EUR_FALLBACK = float(os.getenv("USD_TO_EUR_FALLBACK", "0.92"))  # used while the rate API is unreachable
+
+# Local stand-ins for all of the above: python -m benchmarks.fake_services (prints the env to use)
+
+
+# Local router: minimum centroid margin before falling back to the LLM router
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.25"))
+
+# Shared state for sessions, rate limits and caches across worker processes (see utils/shared_state.py):
+# memory:// (single process), sqlite:///path/to/file.db (one host) or redis://host:port/db
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+SHARED_STATE_MEMORY_MAX_KEYS = int(os.getenv("SHARED_STATE_MEMORY_MAX_KEYS", "10000"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "86400"))  # idle conversation checkpoints
+CHECKPOINT_HISTORY = int(os.getenv("CHECKPOINT_HISTORY", "8"))  # checkpoints kept per conversation in shared state
+
+# Step log payloads: large prompts are stored once and referenced from steps
+STEP_PAYLOAD_PREVIEW_CHARS = 300
+STEP_PAYLOAD_TTL_SECONDS = int(os.getenv("STEP_PAYLOAD_TTL_SECONDS", "3600"))
+
+# Batch execution (/api/execute/batch)
+BATCH_MAX_PROFILES = int(os.getenv("BATCH_MAX_PROFILES", "100"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+BATCH_BUDGET_SECONDS = float(os.getenv("BATCH_BUDGET_SECONDS", "900"))  # end-to-end time budget for one batch job
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+
+# Async execution (/api/execute/async): agent runs in flight per worker process, and how many may wait
+# before new submissions are rejected with 503 + Retry-After
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "4"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "32"))
+
+# Catalog data version (utils/data_version.py): how often readers re-check the data_versions table
+DATA_VERSION_CHECK_SECONDS = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "30"))
+
+# Whole-response cache for /api/execute (shared state), keyed on the data version; 0 disables it
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+
+# Per-client rate limits (slowapi). Only disable for load tests against a private deployment
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+# Precomputed Analyzer extractions (analyzer_extractions table): in-memory copy, also reloaded when the data version moves
+PRECOMPUTED_EXTRACTIONS_TTL_SECONDS = int(os.getenv("PRECOMPUTED_EXTRACTIONS_TTL_SECONDS", "3600"))
+
+# Readiness probes (/api/ready)
+READINESS_PROBE_INTERVAL_SECONDS = float(os.getenv("READINESS_PROBE_INTERVAL_SECONDS", "30"))
+READINESS_PROBE_TIMEOUT_SECONDS = float(os.getenv("READINESS_PROBE_TIMEOUT_SECONDS", "5"))
+READINESS_MAX_LATENCY_MS = float(os.getenv("READINESS_MAX_LATENCY_MS", "3000"))
+
+# End-to-end time budget for one /api/execute call; upstream timeouts are cut to what is left
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "55"))
+
+# Analyzer time budget per university (seconds) and the share each sub-call may use
+ANALYZER_BUDGET_SECONDS = float(os.getenv("ANALYZER_BUDGET_SECONDS", "25"))
+ANALYZER_RETRIEVAL_SHARE = float(os.getenv("ANALYZER_RETRIEVAL_SHARE", "0.3"))  # RAG retrieval; LLM extraction gets the rest
+ANALYZER_WIKIPEDIA_SHARE = float(os.getenv("ANALYZER_WIKIPEDIA_SHARE", "0.5"))  # runs alongside the extraction
+# Budgeted sub-calls per agent run: one batched retrieval plus extraction and Wikipedia per university (top_k <= 10).
+# The shared pool fits that many for each agent run a worker process executes at once
+ANALYZER_CALLS_PER_RUN = 1 + 2 * 10
+ANALYZER_CONCURRENT_RUNS = int(os.getenv("ANALYZER_CONCURRENT_RUNS", str(JOB_MAX_WORKERS)))
+ANALYZER_MAX_WORKERS = int(os.getenv("ANALYZER_MAX_WORKERS", str(ANALYZER_CONCURRENT_RUNS * ANALYZER_CALLS_PER_RUN)))
+
+# Hybrid retrieval: local BM25 index fused with Pinecone results via reciprocal rank fusion.
+# The index is built from the local chunk store (SQLite copy of factsheets_chunks written by save_chunks)
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "data/factsheets_chunks.sqlite")
+HYBRID_PER_QUERY_K = int(os.getenv("HYBRID_PER_QUERY_K", "4"))  # candidates per sub-query and per retriever
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "5"))  # fused chunks kept per university
+RRF_K = 60
+
+# Analyzer extraction prompt: token budget for the packed factsheet context (tiktoken cl100k_base)
+ANALYZER_CONTEXT_TOKEN_BUDGET = int(os.getenv("ANALYZER_CONTEXT_TOKEN_BUDGET", "1500"))
@@ -0,0 +1,149 @@
+"""
+Catalog data version: one monotonically increasing number that changes whenever ingestion writes different
+content to extracted_texts, universities_requirements, factsheets_chunks, the Pinecone index or
+analyzer_extractions. Caches put it in their keys (or reload when it moves), so they can keep entries for a
+long time and still never serve data from before a re-ingest.
+
+Each dataset has one row in the data_versions table: the version at its last change, a content digest and
+its row count. The data version is the highest of these. Ingestion calls record_ingestion() after writing a
+dataset; if the digest did not change, the version stays. Readers check the table at most every
+DATA_VERSION_CHECK_SECONDS. When ingestion shares the shared state with the API (SHARED_STATE_URL), it also
+publishes the new version there, and readers see it on their next call.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from utils.config import get_supabase, DATA_VERSION_CHECK_SECONDS
+from utils.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+TABLE = "data_versions"
+SHARED_KEY = "data_version"
+DATASETS = ("extracted_texts", "universities_requirements", "factsheets_chunks", "pinecone_index", "analyzer_extractions")
+
+_state = {"version": 0, "datasets": {}, "checked_at": None, "error": None}
+_lock = threading.Lock()
+_refreshing = threading.Lock()
+
+
+def content_digest(rows, exclude=("id",)) -> str:
+    """sha256 over the rows as canonical JSON, independent of row order; `exclude` drops volatile columns."""
+    lines = sorted(
+        json.dumps({k: v for k, v in row.items() if k not in exclude}, sort_keys=True, ensure_ascii=False, default=str)
+        for row in rows
+    )
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _fetch_datasets() -> dict:
+    supabase = get_supabase()
+    if not supabase:
+        raise RuntimeError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY.")
+    response = supabase.table(TABLE).select("*").execute()
+    return {row["dataset"]: row for row in (getattr(response, "data", None) or []) if row.get("dataset")}
+
+
+def _version_of(datasets: dict) -> int:
+    return max((int(row.get("version") or 0) for row in datasets.values()), default=0)
+
+
+def refresh():
+    """Re-read the data_versions table; on failure the last known version is kept."""
+    try:
+        datasets = _fetch_datasets()
+    except Exception as e:
+        with _lock:
+            _state.update(checked_at=time.time(), error=f"{type(e).__name__}")
+        return
+    with _lock:
+        _state.update(
+            version=max(_state["version"], _version_of(datasets)), datasets=datasets, checked_at=time.time(), error=None
+        )
+
+
+def _published_version() -> int:
+    try:
+        raw = get_shared_state().get(SHARED_KEY)
+        return int(raw) if raw is not None else 0
+    except Exception:
+        return 0
+
+
+def current_version(max_age: float = DATA_VERSION_CHECK_SECONDS) -> int:
+    """
+    The current data version (0 before the first recorded ingestion).
+    Costs one shared-state read; the data_versions table is re-read by one caller at most every max_age seconds
+    while concurrent callers keep using the last known value.
+    """
+    checked_at = _state["checked_at"]
+    if (checked_at is None or time.time() - checked_at > max_age) and _refreshing.acquire(blocking=False):
+        try:
+            refresh()
+        finally:
+            _refreshing.release()
+    published = _published_version()
+    with _lock:
+        _state["version"] = max(_state["version"], published)
+        return _state["version"]
+
+
+def record_ingestion(dataset: str, rows: list, exclude=("id",)) -> int:
+    """
+    Record that ingestion wrote `dataset` (one of DATASETS) with this content.
+    Args:
+        dataset (str): Dataset name.
+        rows (list[dict]): The dataset's rows as written (or as read back after the write).
+        exclude (tuple): Columns left out of the digest.
+    Returns:
+        int: The data version after this ingestion; unchanged when the content digest is the same as before.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}' (expected one of {', '.join(DATASETS)})")
+    digest = content_digest(rows, exclude)
+    datasets = _fetch_datasets()
+    current = max(_version_of(datasets), _published_version())
+    if datasets.get(dataset, {}).get("digest") == digest:
+        return current
+    row = {
+        "dataset": dataset,
+        "version": current + 1,
+        "digest": digest,
+        "row_count": len(rows),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    get_supabase().table(TABLE).upsert(row, on_conflict="dataset").execute()
+    try:
+        get_shared_state().set(SHARED_KEY, str(row["version"]).encode())
+    except Exception:
+        logger.warning("Could not publish data version %d to the shared state", row["version"], exc_info=True)
+    with _lock:
+        _state["datasets"] = {**datasets, dataset: row}
+        _state["version"] = max(_state["version"], row["version"])
+    logger.info("Data version %d: %s changed (%d rows, digest %s)", row["version"], dataset, len(rows), digest[:12])
+    return row["version"]
+
+
+def report() -> dict:
+    """
+    Current data version and what each dataset last recorded.
+    Returns:
+        dict: {"version", "datasets": {name: {"version", "digest", "row_count", "updated_at"}}, "checked_at", "error"}
+    """
+    version = current_version()
+    if version > _version_of(_state["datasets"]):
+        refresh()  # published by an ingestion after the last check
+    with _lock:
+        datasets = {
+            name: {k: row.get(k) for k in ("version", "digest", "row_count", "updated_at")}
+            for name, row in _state["datasets"].items()
+        }
+        return {"version": version, "datasets": datasets, "checked_at": _state["checked_at"], "error": _state["error"]}
@@ -0,0 +1,255 @@
+"""
+Lightweight in-process instrumentation.
+Timed spans feed aggregated latency histograms, and collect the token usage, retries and cache hits
+of everything that runs inside them so pipeline steps can report their own cost.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative bucket counts are derived on export)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-quantile (inf if it falls in the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        cumulative = []
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+_registry_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name: str, value: float, **labels):
+    """Add an observation to histogram `name` with the given labels."""
+    key = _key(name, labels)
+    with _registry_lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram()
+        hist.observe(value)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increment counter `name` with the given labels."""
+    key = _key(name, labels)
+    with _registry_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _registry_lock:
+        _gauges[key] = value
+
+
+def add_gauge(name: str, amount: float, **labels):
+    """Move gauge `name` up or down (e.g. +1/-1 around an in-flight request)."""
+    key = _key(name, labels)
+    with _registry_lock:
+        _gauges[key] = _gauges.get(key, 0) + amount
+
+
+def metrics_snapshot() -> dict:
+    """Copy of all aggregated metrics: {"histograms": {...}, "counters": {...}, "gauges": {...}} keyed by (name, labels)."""
+    with _registry_lock:
+        return {
+            "histograms": {key: hist.snapshot() for key, hist in _histograms.items()},
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+        }
+
+
+def histogram_quantile(name: str, q: float, **labels) -> float:
+    """Approximate quantile of an existing histogram (0.0 if it has no data yet)."""
+    with _registry_lock:
+        hist = _histograms.get(_key(name, labels))
+        return hist.quantile(q) if hist else 0.0
+
+
+class SpanStats:
+    """Totals collected while a span is open, including nested spans (also on worker threads, see submit)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.duration_ms = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+
+    def as_step_fields(self) -> dict:
+        """Fields to merge into a StepLog dict."""
+        fields = {"duration_ms": round(self.duration_ms, 1) if self.duration_ms is not None else None}
+        if self.prompt_tokens or self.completion_tokens:
+            fields["tokens"] = {
+                "prompt": self.prompt_tokens,
+                "completion": self.completion_tokens,
+                "total": self.prompt_tokens + self.completion_tokens,
+            }
+        if self.retries:
+            fields["retries"] = self.retries
+        if self.cache_hits or self.cache_misses:
+            fields["cache"] = {"hits": self.cache_hits, "misses": self.cache_misses}
+        return fields
+
+
+_active_spans = contextvars.ContextVar("active_spans", default=())
+
+
+@contextmanager
+def span(name: str, **labels):
+    """
+    Time a block of work. Records `span_duration_ms{span=name}` and `span_total{span=name,status}`,
+    and yields a SpanStats that collects tokens/retries/cache hits recorded inside the block.
+    """
+    stats = SpanStats(name)
+    token = _active_spans.set(_active_spans.get() + (stats,))
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield stats
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        stats.duration_ms = (time.perf_counter() - start) * 1000
+        _active_spans.reset(token)
+        observe("span_duration_ms", stats.duration_ms, span=name, **labels)
+        inc("span_total", span=name, status=status, **labels)
+
+
+def record_tokens(usage: dict, model: str = ""):
+    """Attribute an OpenAI-style `usage` dict to all open spans and the global token counters."""
+    if not isinstance(usage, dict):
+        return
+    prompt = int(usage.get("prompt_tokens") or 0)
+    completion = int(usage.get("completion_tokens") or 0)
+    for stats in _active_spans.get():
+        with stats._lock:
+            stats.prompt_tokens += prompt
+            stats.completion_tokens += completion
+    inc("llm_tokens_total", prompt, kind="prompt", model=model)
+    inc("llm_tokens_total", completion, kind="completion", model=model)
+
+
+def record_retry(dependency: str):
+    for stats in _active_spans.get():
+        with stats._lock:
+            stats.retries += 1
+    inc("upstream_retries_total", dependency=dependency)
+
+
+def record_cache(cache: str, hit: bool):
+    for stats in _active_spans.get():
+        with stats._lock:
+            if hit:
+                stats.cache_hits += 1
+            else:
+                stats.cache_misses += 1
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's open spans, so work on the worker thread is attributed to them."""
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args, **kwargs)
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not float(value).is_integer() else str(int(value))
+
+
+def render_prometheus(prefix: str = "fez_") -> str:
+    """Render all metrics in the Prometheus text exposition format (version 0.0.4)."""
+    snapshot = metrics_snapshot()
+    lines = []
+
+    def by_name(items):
+        grouped = {}
+        for (name, labels), value in items:
+            grouped.setdefault(name, []).append((labels, value))
+        return sorted(grouped.items())
+
+    for name, series in by_name(snapshot["counters"].items()):
+        lines.append(f"# TYPE {prefix}{name} counter")
+        for labels, value in sorted(series):
+            lines.append(f"{prefix}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    # Derived cache hit ratios (hits / lookups per cache)
+    lookups = {}
+    for (name, labels), value in snapshot["counters"].items():
+        if name == "cache_requests_total":
+            label_map = dict(labels)
+            hits, total = lookups.get(label_map.get("cache"), (0, 0))
+            lookups[label_map.get("cache")] = (hits + (value if label_map.get("result") == "hit" else 0), total + value)
+    gauges = dict(snapshot["gauges"])
+    for cache, (hits, total) in lookups.items():
+        if total:
+            gauges[("cache_hit_ratio", (("cache", cache),))] = hits / total
+
+    for name, series in by_name(gauges.items()):
+        lines.append(f"# TYPE {prefix}{name} gauge")
+        for labels, value in sorted(series):
+            lines.append(f"{prefix}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for name, series in by_name(snapshot["histograms"].items()):
+        lines.append(f"# TYPE {prefix}{name} histogram")
+        for labels, hist in sorted(series, key=lambda item: item[0]):
+            for bound, count in hist["buckets"]:
+                lines.append(f"{prefix}{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {count}")
+            lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {round(hist['sum'], 3)}")
+            lines.append(f"{prefix}{name}_count{_format_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
@@ -1,19 +1,69 @@
 import os
-import time
+import hashlib
+import json
 import requests
 from dotenv import load_dotenv
 from .config import LLMOD_BASE_URL, LLMOD_CHAT_MODEL, LLMOD_EMBEDDING_MODEL
+from .instrumentation import span, record_tokens, record_retry, histogram_quantile, metrics_snapshot
+from .singleflight import SingleFlight
+from .resilience import (
+    DeadlineExceeded, get_breaker, call_timeout, backoff_delay, parse_retry_after, sleep_within_deadline, hedged_call,
+)
 
 load_dotenv()
 
 LLMOD_API_KEY = os.getenv("LLMOD_API_KEY")
 LLMOD_TIMEOUT = int(os.getenv("LLMOD_TIMEOUT", "90"))
 LLMOD_MAX_RETRIES = int(os.getenv("LLMOD_MAX_RETRIES", "2"))
+LLMOD_BACKOFF_BASE_SECONDS = float(os.getenv("LLMOD_BACKOFF_BASE_SECONDS", "1"))
+LLMOD_BACKOFF_MAX_SECONDS = float(os.getenv("LLMOD_BACKOFF_MAX_SECONDS", "10"))
+LLMOD_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLMOD_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLMOD_CIRCUIT_RESET_SECONDS = float(os.getenv("LLMOD_CIRCUIT_RESET_SECONDS", "30"))
+# Hedging: send one duplicate chat request once the first exceeds the observed p95 latency; it answers if the first fails
+LLMOD_HEDGE_ENABLED = os.getenv("LLMOD_HEDGE_ENABLED", "false").lower() == "true"
+LLMOD_HEDGE_QUANTILE = float(os.getenv("LLMOD_HEDGE_QUANTILE", "0.95"))
+LLMOD_HEDGE_MIN_SAMPLES = int(os.getenv("LLMOD_HEDGE_MIN_SAMPLES", "20"))
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+def _status_code(e: Exception) -> int:
+    return getattr(getattr(e, "response", None), "status_code", 0) or 0
+
+def _is_upstream_failure(e: Exception) -> bool:
+    """Failures that say something about upstream health (count toward the circuit breaker)."""
+    if isinstance(e, (requests.Timeout, requests.ConnectionError)):
+        return True
+    return _status_code(e) in RETRYABLE_STATUS_CODES
+
+def _hedge_delay(span_name: str):
+    """p95 latency (seconds) of past requests, or None while hedging is off or there is too little data."""
+    if not LLMOD_HEDGE_ENABLED:
+        return None
+    key = ("span_duration_ms", (("span", span_name),))
+    hist = metrics_snapshot()["histograms"].get(key)
+    if not hist or hist["count"] < LLMOD_HEDGE_MIN_SAMPLES:
+        return None
+    p95_ms = histogram_quantile("span_duration_ms", LLMOD_HEDGE_QUANTILE, span=span_name)
+    return p95_ms / 1000 if p95_ms != float("inf") else None
+
+def _post(url: str, payload: dict, headers: dict, timeout: float, span_name: str) -> dict:
+    with span(span_name):
+        response = requests.post(url, json=payload, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+_chat_flight = SingleFlight("llmod.chat")
+_embedding_flight = SingleFlight("llmod.embedding")
 
 def llmod_chat(system_prompt: str, user_prompt: str, use_json: bool = False) -> str:
     """
     Centralized connection to LLMOD for Chat/Reasoning.
+    Identical concurrent requests are coalesced into one upstream call.
     """
+    key = hashlib.sha256(json.dumps([LLMOD_CHAT_MODEL, system_prompt, user_prompt, use_json]).encode("utf-8")).hexdigest()
+    return _chat_flight.do(key, lambda: _llmod_chat(system_prompt, user_prompt, use_json))
+
+def _llmod_chat(system_prompt: str, user_prompt: str, use_json: bool = False) -> str:
     url = f"{LLMOD_BASE_URL}/chat/completions"
     headers = {"Authorization": f"Bearer {LLMOD_API_KEY}"}
     
@@ -28,12 +78,36 @@ def llmod_chat(system_prompt: str, user_prompt: str, use_json: bool = False) ->
     if use_json:
         payload["response_format"] = {"type": "json_object"}
 
+    breaker = get_breaker("llmod.chat", LLMOD_CIRCUIT_FAILURE_THRESHOLD, LLMOD_CIRCUIT_RESET_SECONDS)
     last_err = None
-    for attempt in range(LLMOD_MAX_RETRIES + 1):
-        try:
-            response = requests.post(url, json=payload, headers=headers, timeout=LLMOD_TIMEOUT)
-            response.raise_for_status()
-            result = response.json()
+    with span("llmod.chat"):
+        for attempt in range(LLMOD_MAX_RETRIES + 1):
+            timeout = call_timeout(LLMOD_TIMEOUT)  # before taking a (half-open trial) slot that it could leak
+            breaker.before_call()
+            try:
+                result = hedged_call(
+                    lambda: _post(url, payload, headers, timeout, "llmod.chat.request"),
+                    _hedge_delay("llmod.chat.request"),
+                    name="llmod.chat",
+                )
+            except Exception as e:
+                last_err = e
+                if isinstance(e, DeadlineExceeded):
+                    breaker.release()  # local budget, says nothing about upstream health
+                    raise
+                if not _is_upstream_failure(e):
+                    breaker.record_success()  # e.g. 400/401: upstream is up, the request is wrong
+                    raise
+                breaker.record_failure()
+                if attempt >= LLMOD_MAX_RETRIES:
+                    raise
+                delay = backoff_delay(attempt, LLMOD_BACKOFF_BASE_SECONDS, LLMOD_BACKOFF_MAX_SECONDS, parse_retry_after(getattr(e, "response", None)))
+                if not sleep_within_deadline(delay):
+                    raise
+                record_retry("llmod")
+                continue
+            breaker.record_success()
+            record_tokens(result.get("usage"), model=LLMOD_CHAT_MODEL)
             choices = result.get("choices")
             if not choices or not isinstance(choices, list):
                 raise ValueError("Invalid LLM response: no choices")
@@ -42,28 +116,39 @@ def llmod_chat(system_prompt: str, user_prompt: str, use_json: bool = False) ->
             if content is None:
                 raise ValueError("Invalid LLM response: empty content")
             return str(content)
-        except Exception as e:
-            last_err = e
-            if attempt < LLMOD_MAX_RETRIES and hasattr(e, "response") and getattr(e.response, "status_code", 0) in (429, 502, 503):
-                time.sleep(2 ** attempt)
-            else:
-                raise
     raise last_err or RuntimeError("LLM request failed")
 
 
 def get_embedding(text: str) -> list[float]:
     """
     Centralized connection to LLMOD for Vector Embeddings.
+    Identical concurrent requests are coalesced into one upstream call.
     """
+    return _embedding_flight.do((LLMOD_EMBEDDING_MODEL, text), lambda: _get_embedding(text))
+
+def _get_embedding(text: str) -> list[float]:
     url = f"{LLMOD_BASE_URL}/embeddings"
     headers = {"Authorization": f"Bearer {LLMOD_API_KEY}"}
     payload = {
         "model": LLMOD_EMBEDDING_MODEL,
         "input": text
     }
-    response = requests.post(url, json=payload, headers=headers, timeout=LLMOD_TIMEOUT)
-    response.raise_for_status()
-    data = response.json().get("data") or []
+    breaker = get_breaker("llmod.embeddings", LLMOD_CIRCUIT_FAILURE_THRESHOLD, LLMOD_CIRCUIT_RESET_SECONDS)
+    timeout = call_timeout(LLMOD_TIMEOUT)
+    breaker.before_call()
+    try:
+        result = _post(url, payload, headers, timeout, "llmod.embedding")
+    except Exception as e:
+        if isinstance(e, DeadlineExceeded):
+            breaker.release()  # local budget, says nothing about upstream health
+        elif _is_upstream_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+    record_tokens(result.get("usage"), model=LLMOD_EMBEDDING_MODEL)
+    data = result.get("data") or []
     if not data:
         raise ValueError("Invalid embedding response: no data")
     return data[0].get("embedding") or []
@@ -78,7 +163,10 @@ def batch_embed_texts(texts: list[str]) -> list[list[float]]:
         "model": LLMOD_EMBEDDING_MODEL,
         "input": texts
     }
-    response = requests.post(url, json=payload, headers=headers, timeout=LLMOD_TIMEOUT)
-    response.raise_for_status()
-    data = response.json().get("data") or []
+    with span("llmod.embedding", batch="true"):
+        response = requests.post(url, json=payload, headers=headers, timeout=LLMOD_TIMEOUT)
+        response.raise_for_status()
+        result = response.json()
+    record_tokens(result.get("usage"), model=LLMOD_EMBEDDING_MODEL)
+    data = result.get("data") or []
     return [item.get("embedding") or [] for item in data]
\ No newline at end of file
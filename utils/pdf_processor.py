@@ -1,6 +1,7 @@
 import os
 import pymupdf4llm
 from utils.config import supabase
+from utils import data_version
 
 BASE_DIR = "data\external_universities"
 
@@ -182,6 +183,10 @@ def fill_full_texts_table():
                         save_text(pdf_path) 
                     else:
                         print(f"  [-] Skipping (Not a factsheet) {file_name}")
+
+    # Record the table's new content so caches keyed on the data version are refreshed
+    response = supabase.table("extracted_texts").select("country,university,file_name,text").execute()
+    print(f"Data version: {data_version.record_ingestion('extracted_texts', response.data or [])}")
                  
 
 if __name__ == "__main__":
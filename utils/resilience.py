@@ -0,0 +1,210 @@
+"""
+Resilience helpers for upstream calls: per-endpoint circuit breakers, jittered exponential backoff
+that honors Retry-After, request deadlines propagated through contextvars, and hedged requests.
+"""
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+from utils.instrumentation import inc, set_gauge, submit
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request's time budget is used up before an upstream call."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    Opens after `failure_threshold` consecutive failures, rejects calls for `reset_timeout` seconds,
+    then lets a single trial call through (half-open) to decide whether to close again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    inc("circuit_breaker_rejections_total", breaker=self.name)
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open; upstream marked unavailable")
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open":
+                if self._trial_in_flight:
+                    inc("circuit_breaker_rejections_total", breaker=self.name)
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open; trial call in flight")
+                self._trial_in_flight = True
+
+    def release(self):
+        """Give back a half-open trial slot without a verdict: the call never reached the upstream."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+        set_gauge("circuit_breaker_open", 0, breaker=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+        if self.state == "open":
+            set_gauge("circuit_breaker_open", 1, breaker=self.name)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Process-wide breaker for an upstream endpoint (created on first use)."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+        return _breakers[name]
+
+
+# --- Deadlines ---
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Run a block with a time budget. Nested scopes can only shorten the deadline."""
+    if seconds is None:
+        yield
+        return
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(min(current, new_deadline) if current is not None else new_deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left in the current deadline scope, or None when unbounded."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_timeout(default: float, minimum: float = 0.5) -> float:
+    """Per-call timeout: the default, shortened to the remaining budget. Raises DeadlineExceeded if none is left."""
+    remaining = remaining_time()
+    if remaining is None:
+        return default
+    if remaining < minimum:
+        raise DeadlineExceeded("Request time budget exhausted")
+    return min(default, remaining)
+
+
+# --- Backoff ---
+
+def parse_retry_after(response) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), if any."""
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff; a server-provided Retry-After wins when longer."""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def sleep_within_deadline(delay: float) -> bool:
+    """Sleep for delay unless that would overrun the deadline; returns False (without sleeping) in that case."""
+    remaining = remaining_time()
+    if remaining is not None and delay >= remaining:
+        return False
+    time.sleep(delay)
+    return True
+
+
+# --- Hedging ---
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")  # duplicates only
+
+
+def hedged_call(fn: Callable, hedge_after: Optional[float], name: str = "upstream"):
+    """
+    Call fn() on the caller's thread; if it has not finished after `hedge_after` seconds, start one duplicate
+    call on the hedge pool. The primary's result is returned when it succeeds; when it fails, a started
+    duplicate's result is used instead (waited for within the request deadline). With hedge_after=None this
+    is a plain call.
+    """
+    if hedge_after is None:
+        return fn()
+    hedge = {"future": None, "closed": False}
+    lock = threading.Lock()
+
+    def start_duplicate():
+        with lock:
+            if hedge["closed"]:
+                return
+            inc("hedged_requests_total", upstream=name)
+            hedge["future"] = submit(_hedge_executor, fn)
+
+    def close():
+        timer.cancel()
+        with lock:
+            hedge["closed"] = True
+            return hedge["future"]
+
+    # The timer starts the duplicate in the caller's context (spans, deadline)
+    timer = threading.Timer(hedge_after, contextvars.copy_context().run, args=(start_duplicate,))
+    timer.daemon = True
+    timer.start()
+    try:
+        result = fn()
+    except Exception as error:
+        duplicate = close()
+        if duplicate is None:
+            raise
+        remaining = remaining_time()
+        try:
+            result = duplicate.result(timeout=None if remaining is None else max(0.0, remaining))
+        except Exception:
+            raise error
+        inc("hedged_requests_won_total", upstream=name)
+        return result
+    close()
+    return result
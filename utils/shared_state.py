@@ -0,0 +1,384 @@
+"""
+Shared state for everything that must be visible to all worker processes: LangGraph checkpoints
+(conversation sessions), rate-limit counters and response caches.
+
+Backends, selected by SHARED_STATE_URL:
+- memory://                 in-process only (default; a single worker)
+- sqlite:///path/to/file    one SQLite file (WAL) shared by the workers of one host
+- redis://[:password@]host:port/db
+                            any server speaking the Redis protocol (Redis, Valkey, or the local stand-in
+                            in benchmarks/fake_services.py)
+
+All backends store bytes under string keys with an optional TTL, plus an atomic counter for rate limits.
+"""
+import abc
+import base64
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Any, Optional
+
+from utils.config import SHARED_STATE_URL, SHARED_STATE_MEMORY_MAX_KEYS
+
+
+class SharedStateError(RuntimeError):
+    """The backend is unreachable or rejected a command."""
+
+
+class SharedState(abc.ABC):
+    """Key/value interface shared by the backends (values are bytes, ttl in seconds)."""
+
+    scheme = None
+    shared = False  # True when other processes see the same state
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Value of the key; None when it is missing or expired."""
+
+    @abc.abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store the value, expiring after `ttl` seconds (never when None)."""
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the key if present."""
+
+    @abc.abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add `amount` to an integer key; `ttl` applies when the key is created. Returns the new value."""
+
+    @abc.abstractmethod
+    def expire(self, key: str, ttl: float) -> None:
+        """Reset the key's expiry to `ttl` seconds from now."""
+
+    @abc.abstractmethod
+    def expires_at(self, key: str) -> Optional[float]:
+        """Expiry as a Unix timestamp; None when the key is missing or never expires."""
+
+    @abc.abstractmethod
+    def ping(self) -> bool:
+        """True when the backend is reachable."""
+
+    def get_json(self, key: str) -> Any:
+        raw = self.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set(key, json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), ttl)
+
+
+def _to_bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+class MemoryBackend(SharedState):
+    """In-process dict with TTLs, least recently used keys evicted beyond max_keys."""
+
+    scheme = "memory"
+
+    def __init__(self, max_keys: int = SHARED_STATE_MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _put(self, key, value, expires_at):
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._put(key, _to_bytes(value), time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                value, expires_at = amount, (time.time() + ttl if ttl else None)
+            else:
+                value, expires_at = int(entry[0]) + amount, entry[1]
+            self._put(key, str(value).encode(), expires_at)
+            return value
+
+    def expire(self, key, ttl):
+        with self._lock:
+            entry = self._live(key)
+            if entry is not None:
+                self._data[key] = (entry[0], time.time() + ttl)
+
+    def expires_at(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return entry[1] if entry else None
+
+    def ping(self):
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at);
+"""
+
+
+class SQLiteBackend(SharedState):
+    """One SQLite file in WAL mode: concurrent readers, serialized writers, shared by every process on the host."""
+
+    scheme = "sqlite"
+    shared = True
+    PURGE_EVERY = 500  # writes between deletions of expired rows
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SQLITE_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql, params=()):
+        try:
+            return self._conn().execute(sql, params)
+        except sqlite3.Error as e:
+            raise SharedStateError(f"SQLite shared state: {e}") from e
+
+    def _wrote(self):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def get(self, key):
+        row = self._execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return _to_bytes(row[0])
+
+    def set(self, key, value, ttl=None):
+        self._execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, _to_bytes(value), time.time() + ttl if ttl else None),
+        )
+        self._wrote()
+
+    def delete(self, key):
+        self._execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        # One statement, so the read-modify-write is atomic across processes; an expired key starts over
+        row = self._execute(
+            """
+            INSERT INTO kv (key, value, expires_at) VALUES (?1, ?2, ?3)
+            ON CONFLICT(key) DO UPDATE SET
+                value = CASE WHEN expires_at IS NOT NULL AND expires_at <= ?4 THEN ?2 ELSE CAST(value AS INTEGER) + ?2 END,
+                expires_at = CASE WHEN expires_at IS NOT NULL AND expires_at <= ?4 THEN ?3 ELSE expires_at END
+            RETURNING value
+            """,
+            (key, amount, now + ttl if ttl else None, now),
+        ).fetchone()
+        self._wrote()
+        return int(row[0])
+
+    def expire(self, key, ttl):
+        self._execute("UPDATE kv SET expires_at = ? WHERE key = ?", (time.time() + ttl, key))
+
+    def expires_at(self, key):
+        row = self._execute("SELECT expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[0] is not None and row[0] <= time.time()):
+            return None
+        return row[0]
+
+    def ping(self):
+        self._execute("SELECT 1").fetchone()
+        return True
+
+
+class RedisBackend(SharedState):
+    """Minimal Redis protocol (RESP2) client: one connection per thread, reconnected once on failure."""
+
+    scheme = "redis"
+    shared = True
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = urllib.parse.unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", self.db)
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise SharedStateError(f"Redis: {payload.decode()}")
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise SharedStateError(f"Redis: unexpected reply {line!r}")
+
+    def _roundtrip(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = _to_bytes(arg)
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._local.sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def command(self, *args):
+        for attempt in (0, 1):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._roundtrip(*args)
+            except (OSError, ConnectionError) as e:
+                self._close()
+                if attempt:
+                    raise SharedStateError(f"Redis {self.host}:{self.port}: {e}") from e
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+        else:
+            self.command("SET", key, value)
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+    def incr(self, key, amount=1, ttl=None):
+        value = self.command("INCRBY", key, amount)
+        if ttl and value == amount:  # this call created the key
+            self.command("PEXPIRE", key, max(1, int(ttl * 1000)))
+        return value
+
+    def expire(self, key, ttl):
+        self.command("PEXPIRE", key, max(1, int(ttl * 1000)))
+
+    def expires_at(self, key):
+        ms = self.command("PTTL", key)
+        return time.time() + ms / 1000 if ms is not None and ms >= 0 else None
+
+    def ping(self):
+        return self.command("PING") == "PONG"
+
+
+def url_is_shared(url: str) -> bool:
+    """Whether a SHARED_STATE_URL is seen by other processes, without connecting to it."""
+    scheme = (url or "memory://").partition("://")[0]
+    return scheme != "memory"
+
+
+def create_backend(url: str) -> SharedState:
+    """Backend for a SHARED_STATE_URL (see module docstring)."""
+    scheme, _, rest = (url or "memory://").partition("://")
+    if scheme == "memory":
+        return MemoryBackend()
+    if scheme == "sqlite":
+        path = rest[1:] if rest.startswith("/") else rest  # sqlite:///relative.db, sqlite:////absolute.db
+        if not path:
+            raise ValueError("sqlite shared state needs a file path, e.g. sqlite:///data/shared_state.db")
+        return SQLiteBackend(path)
+    if scheme in ("redis", "valkey"):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL scheme '{scheme}' (expected memory, sqlite or redis)")
+
+
+_backend = {"instance": None}
+_backend_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    """Process-wide backend for SHARED_STATE_URL, created on first use."""
+    if _backend["instance"] is None:
+        with _backend_lock:
+            if _backend["instance"] is None:
+                _backend["instance"] = create_backend(SHARED_STATE_URL)
+    return _backend["instance"]
+
+
+def encode_bytes(data: bytes) -> str:
+    """bytes -> str for JSON values."""
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_bytes(text: str) -> bytes:
+    return base64.b64decode(text.encode("ascii"))
@@ -0,0 +1,76 @@
+"""
+Single-flight call coalescing: concurrent callers asking for the same key share one upstream call.
+Nothing is kept after the call finishes; this only removes duplicate in-flight work.
+Only the upstream's own answer (result or error) is shared: when the leader fails because of its own
+deadline or an open circuit breaker, followers with time left make their own call.
+"""
+import threading
+import time
+from typing import Callable, Hashable
+
+import requests
+
+from utils.instrumentation import inc
+from utils.resilience import CircuitOpenError, DeadlineExceeded, remaining_time
+
+MIN_RETRY_SECONDS = 0.5  # a follower with less time left than this takes the leader's error
+
+
+def _deadline() -> float:
+    remaining = remaining_time()
+    return float("inf") if remaining is None else time.monotonic() + remaining
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.deadline = _deadline()  # the leader's request deadline (inf when unbounded)
+
+    def failed_on_its_own_budget(self) -> bool:
+        """The leader's error says nothing about the upstream: its deadline, a timeout it cut short, or a breaker."""
+        if isinstance(self.error, (DeadlineExceeded, CircuitOpenError)):
+            return True
+        timed_out = isinstance(self.error, (TimeoutError, requests.Timeout))
+        return timed_out and self.deadline < _deadline()
+
+
+class SingleFlight:
+    """Group of in-flight calls keyed by request identity (one group per upstream function)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable):
+        """Run fn() for the first caller with this key; concurrent callers wait for and share its result or error."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        inc("singleflight_calls_total", group=self.name, role="leader" if leader else "follower")
+
+        if not leader:
+            if not call.done.wait(timeout=remaining_time()):
+                raise DeadlineExceeded(f"Timed out waiting for shared '{self.name}' call")
+            if call.error is not None:
+                remaining = remaining_time()
+                if call.failed_on_its_own_budget() and (remaining is None or remaining >= MIN_RETRY_SECONDS):
+                    inc("singleflight_calls_total", group=self.name, role="retry")
+                    return fn()
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
@@ -6,23 +6,41 @@ import requests
 import urllib.parse
 import logging
 from typing import Optional
+from utils.config import WIKIPEDIA_API_URL, EXCHANGE_RATE_API_URL
+from utils.instrumentation import span
+from utils.resilience import call_timeout
+from utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 REQUEST_TIMEOUT = 5
 USER_AGENT = "FezExchangeAgent/1.0 (University Exchange Recommendation; edu project)"
 
 
+_wikipedia_flight = SingleFlight("wikipedia.summary")
+
+
 def fetch_wikipedia_summary(article_title: str) -> Optional[str]:
     """
     Fetch a short Wikipedia summary for a given article title.
     Uses the public REST API - no API key required.
     Returns None on failure (network error, page not found, etc.).
+    Concurrent lookups of the same title share one request.
     """
+    try:
+        return _wikipedia_flight.do(article_title, lambda: _fetch_wikipedia_summary(article_title))
+    except Exception as e:
+        # A follower whose deadline ran out before the shared request finished, or that request's error
+        logger.debug("Wikipedia fetch failed for %s: %s", article_title, e)
+        return None
+
+
+def _fetch_wikipedia_summary(article_title: str) -> Optional[str]:
     try:
         encoded = urllib.parse.quote(article_title.replace(" ", "_"))
-        url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{encoded}"
-        resp = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
+        url = f"{WIKIPEDIA_API_URL}/page/summary/{encoded}"
+        with span("wikipedia.summary"):
+            resp = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=call_timeout(REQUEST_TIMEOUT))
+            resp.raise_for_status()
         data = resp.json()
         extract = data.get("extract")
         return (extract[:400] + "...") if extract and len(extract) > 400 else (extract or None)
@@ -50,14 +68,14 @@ def fetch_university_wikipedia(university_name: str, country: str = "") -> Optio
 
 def fetch_exchange_rate_usd_to_eur() -> Optional[float]:
     """
-    Fetch current USD to EUR rate from a free API.
-    Used for cost normalization in analysis.
+    Fetch current USD to EUR rate from a free API (EXCHANGE_RATE_API_URL).
+    Used by the cost model (orchestration/cost_model.py), which caches it.
     Falls back to None if unavailable.
     """
     try:
-        url = "https://api.exchangerate-api.com/v4/latest/USD"
-        resp = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
+        with span("exchange_rate"):
+            resp = requests.get(EXCHANGE_RATE_API_URL, headers={"User-Agent": USER_AGENT}, timeout=REQUEST_TIMEOUT)
+            resp.raise_for_status()
         data = resp.json()
         return data.get("rates", {}).get("EUR")
     except Exception as e: